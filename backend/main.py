@@ -6,8 +6,11 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.types import ASGIApp, Receive, Scope, Send
 
-from backend.routers import dashboard, historical, health, upload, records, analyst, catalog, search
+from backend.routers import dashboard, historical, health, upload, records, analyst, catalog, search, changes
 from procurement.services.database import init_db
+from procurement.services.collection_pool import collection_pool
+from procurement.services.health_monitor import health_monitor
+from procurement.services.validation import uses_process_pool
 
 
 # Filter out noisy socket.io websocket log lines from uvicorn
@@ -67,11 +70,25 @@ app.include_router(records.router)
 app.include_router(analyst.router)
 app.include_router(catalog.router)
 app.include_router(search.router)
+app.include_router(changes.router)
 
 
 @app.on_event("startup")
 async def startup():
     init_db()
+    health_monitor.start()
+    collection_pool.start()
+    if uses_process_pool():
+        from procurement.services.validation_parallel import start_pool
+        start_pool()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    health_monitor.stop()
+    collection_pool.drain()
+    from procurement.services.validation_parallel import shutdown_pool
+    shutdown_pool()
 
 
 @app.get("/api/ping")
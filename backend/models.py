@@ -61,6 +61,14 @@ class RecordUpdate(BaseModel):
     quotation_validity: Optional[str] = None
 
 
+class RecordPatch(RecordUpdate):
+    id: int
+
+
+class BulkRecordUpdateRequest(BaseModel):
+    records: list[RecordPatch]
+
+
 class UploadResponse(BaseModel):
     file_id: int
     filename: str
@@ -102,34 +110,44 @@ class HistoricalSearchParams(BaseModel):
 class PriceTrendResponse(BaseModel):
     sku: str
     data_points: list[dict] = []
+    quantiles: Optional[dict] = None
 
 
 class AnalystRequest(BaseModel):
     query: str
     context_records: Optional[list[dict]] = None
     historical_summary: Optional[dict] = None
+    conversation_id: Optional[str] = None
 
 
 class AnalystResponseModel(BaseModel):
     response: str
     suggestions: list[str] = []
     confidence: float = 0.85
+    conversation_id: Optional[str] = None
+    tool: Optional[str] = None
+    data: Optional[dict] = None
+    cache: Optional[str] = None
 
 
 class BatchApproveRequest(BaseModel):
     records: list[dict]
     source_file: str = ''
+    skip_duplicates: bool = False  # skip lines already in the historical archive
 
 
 class BatchApproveResponse(BaseModel):
     approved_count: int
     record_ids: list[int] = []
+    skipped_count: int = 0
 
 
 class HealthResponse(BaseModel):
     connected: bool
     model: Optional[str] = None
     error: Optional[str] = None
+    latency_ms: Optional[float] = None
+    checked_at: Optional[str] = None
 
 
 class CatalogEntry(BaseModel):
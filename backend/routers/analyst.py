@@ -1,6 +1,10 @@
-"""AI Analyst chat endpoint."""
+"""AI Analyst chat endpoints."""
 from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from backend.models import AnalystRequest, AnalystResponseModel
+from backend.sse import SSE_HEADERS, stream_from_thread
+from procurement.services.analyst_sessions import conversation_store
 from procurement.services.llm_service import query_analyst
 
 router = APIRouter(prefix="/api/analyst", tags=["analyst"])
@@ -13,11 +17,51 @@ async def analyst_query(request: AnalystRequest):
             query=request.query,
             context_records=request.context_records,
             historical_summary=request.historical_summary,
+            conversation_id=request.conversation_id,
         )
         return AnalystResponseModel(
             response=result.response,
             suggestions=result.suggestions,
             confidence=result.confidence,
+            conversation_id=result.conversation_id,
+            tool=result.tool,
+            data=result.data,
+            cache=result.cache,
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/stream")
+async def analyst_query_stream(request: AnalystRequest):
+    """Answer an analyst question as Server-Sent Events.
+
+    Events: "token" (response text as it arrives from H2OGPTE), then
+    "complete" (same shape as POST /api/analyst) or "error".
+    """
+    def produce(emit):
+        result = query_analyst(
+            query=request.query,
+            context_records=request.context_records,
+            historical_summary=request.historical_summary,
+            conversation_id=request.conversation_id,
+            on_token=lambda text: emit('token', {'text': text}),
+        )
+        emit('complete', AnalystResponseModel(
+            response=result.response,
+            suggestions=result.suggestions,
+            confidence=result.confidence,
+            conversation_id=result.conversation_id,
+            tool=result.tool,
+            data=result.data,
+            cache=result.cache,
+        ).model_dump())
+
+    return StreamingResponse(stream_from_thread(produce), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@router.delete("/conversations/{conversation_id}")
+async def end_conversation(conversation_id: str):
+    """End an analyst conversation and delete its chat session."""
+    ended = await run_in_threadpool(conversation_store.end, conversation_id)
+    return {"status": "ended" if ended else "not_found", "conversation_id": conversation_id}
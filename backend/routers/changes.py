@@ -0,0 +1,23 @@
+"""Change feed endpoint for cache invalidation and incremental consumers."""
+from typing import Optional
+from fastapi import APIRouter, Query, HTTPException
+from procurement.services.database import CHANGE_FEED_TABLES, get_changes
+
+router = APIRouter(prefix="/api", tags=["changes"])
+
+
+@router.get("/changes")
+async def list_changes(
+    since: int = Query(0, ge=0, description="Return changes after this sequence number"),
+    limit: int = Query(1000, ge=1, le=10000),
+    tables: Optional[str] = Query(None, description="Comma-separated feed tables to include"),
+):
+    """Row changes after `since`; resume from `next_since`, reload everything on `reset`."""
+    table_list = [t.strip() for t in tables.split(',') if t.strip()] if tables else None
+    unknown = sorted(set(table_list or []) - set(CHANGE_FEED_TABLES))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown tables: {', '.join(unknown)}")
+    try:
+        return get_changes(since=since, limit=limit, tables=table_list)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
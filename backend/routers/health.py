@@ -1,16 +1,39 @@
 """Health check endpoints."""
-from fastapi import APIRouter
+from fastapi import APIRouter, Query
+from fastapi.concurrency import run_in_threadpool
 from backend.models import HealthResponse
-from procurement.services.llm_service import get_h2ogpte_client, get_best_llm
+from procurement.services.analyst_cache import analyst_cache
+from procurement.services.collection_pool import collection_pool
+from procurement.services.health_monitor import health_monitor
+from procurement.services.ingestion import get_active_sessions
+from procurement.services.llm_service import get_h2ogpte_metrics
 
 router = APIRouter(prefix="/api/health", tags=["health"])
 
 
 @router.get("/h2ogpte", response_model=HealthResponse)
-async def h2ogpte_health():
-    try:
-        client = get_h2ogpte_client()
-        model = get_best_llm(client)
-        return HealthResponse(connected=True, model=model)
-    except Exception as e:
-        return HealthResponse(connected=False, error=str(e))
+async def h2ogpte_health(fresh: bool = Query(False, description="Probe now instead of serving the cached status")):
+    """Serve the last background probe result; `?fresh=1` forces a (coalesced) probe."""
+    if fresh:
+        snapshot = await run_in_threadpool(health_monitor.probe_now)
+    else:
+        snapshot = health_monitor.snapshot
+    return HealthResponse(
+        connected=snapshot.connected,
+        model=snapshot.model,
+        error=snapshot.error,
+        latency_ms=snapshot.latency_ms,
+        checked_at=snapshot.checked_at,
+    )
+
+
+@router.get("/h2ogpte/metrics")
+async def h2ogpte_metrics():
+    """Circuit breaker state, per-operation call, retry and rejection counters, analyst cache stats."""
+    return {**get_h2ogpte_metrics(), 'analyst_cache': analyst_cache.stats()}
+
+
+@router.get("/h2ogpte/collections")
+async def h2ogpte_collections():
+    """Temporary collection pool usage and live ingestion sessions."""
+    return {"pool": collection_pool.usage(), "sessions": get_active_sessions()}
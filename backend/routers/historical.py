@@ -1,5 +1,6 @@
 """Historical records search and price trend endpoints."""
 from fastapi import APIRouter, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
 from typing import Optional
 from backend.models import PriceTrendResponse
 from procurement.services.database import (
@@ -10,6 +11,8 @@ from procurement.services.database import (
     get_distinct_distributors,
     get_all_skus,
     get_historical_price_summaries_batch,
+    rebuild_price_rollups,
+    rebuild_price_sketches,
 )
 
 router = APIRouter(prefix="/api", tags=["historical"])
@@ -71,6 +74,16 @@ async def batch_stats(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/historical/rollups/rebuild")
+async def rebuild_rollups():
+    """Recompute the monthly price rollup and the price sketches from the raw historical archive."""
+    try:
+        groups = await run_in_threadpool(rebuild_price_rollups)
+        return {"groups": groups, "sketches": await run_in_threadpool(rebuild_price_sketches)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/historical/all-skus")
 async def all_skus():
     try:
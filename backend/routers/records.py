@@ -1,14 +1,17 @@
 """Records CRUD and validation endpoints."""
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from backend.models import RecordResponse, RecordUpdate, BatchApproveRequest, BatchApproveResponse
+from backend.models import (
+    RecordResponse, RecordUpdate, BatchApproveRequest, BatchApproveResponse, BulkRecordUpdateRequest,
+)
 from procurement.services.database import (
-    get_current_records, get_record_by_id, update_record,
+    get_current_records, get_record_by_id, update_records,
     delete_record, save_approved_records, get_all_known_skus, get_catalog_entries_batch,
     get_comments_for_record, add_comment, delete_comment, batch_delete_records,
-    get_historical_price_summaries_batch,
+    get_historical_price_summaries_batch, get_archived_fingerprints,
 )
-from procurement.services.validation import validate_records
+from procurement.services.validation import line_fingerprint, validate_records_json
 
 
 class BatchDeleteRequest(BaseModel):
@@ -30,6 +33,24 @@ async def list_records():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.patch("")
+async def bulk_update_records(request: BulkRecordUpdateRequest):
+    """Update several records in one transaction; returns the updated rows."""
+    updates = {}
+    for item in request.records:
+        fields = {k: v for k, v in item.model_dump(exclude={'id'}).items() if v is not None}
+        if fields:
+            updates[item.id] = {**updates.get(item.id, {}), **fields}
+    if not updates:
+        raise HTTPException(status_code=400, detail="No fields to update")
+    try:
+        return {"records": update_records(updates)}
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/{record_id}")
 async def get_record(record_id: int):
     record = get_record_by_id(record_id)
@@ -43,10 +64,13 @@ async def update_record_endpoint(record_id: int, updates: RecordUpdate):
     update_data = {k: v for k, v in updates.model_dump().items() if v is not None}
     if not update_data:
         raise HTTPException(status_code=400, detail="No fields to update")
-    success = update_record(record_id, update_data)
-    if not success:
+    try:
+        updated = update_records({record_id: update_data})
+    except ValueError:
+        updated = []
+    if not updated:
         raise HTTPException(status_code=400, detail="Update failed. Check field names.")
-    return get_record_by_id(record_id)
+    return updated[0]
 
 
 @router.delete("/{record_id}")
@@ -67,9 +91,11 @@ async def validate_records_endpoint(records: list[dict]):
         skus_in_batch = [r.get('sku') for r in records if r.get('sku')]
         catalog_entries = get_catalog_entries_batch(skus_in_batch)
         historical_stats = get_historical_price_summaries_batch(skus_in_batch)
+        archived_fingerprints = get_archived_fingerprints([line_fingerprint(r) for r in records])
 
-        validated = validate_records(records, known_skus=known_skus, catalog_entries=catalog_entries, historical_stats=historical_stats)
-        return validated
+        validated = validate_records_json(records, known_skus=known_skus, catalog_entries=catalog_entries,
+                                          historical_stats=historical_stats, archived_fingerprints=archived_fingerprints)
+        return StreamingResponse(validated, media_type="application/json")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -78,8 +104,10 @@ async def validate_records_endpoint(records: list[dict]):
 async def approve_batch(request: BatchApproveRequest):
     """Approve and save a batch of records to both active and historical tables."""
     try:
-        ids = save_approved_records(request.records, source_file=request.source_file)
-        return BatchApproveResponse(approved_count=len(ids), record_ids=ids)
+        ids = save_approved_records(request.records, source_file=request.source_file,
+                                    skip_duplicates=request.skip_duplicates)
+        return BatchApproveResponse(approved_count=len(ids), record_ids=ids,
+                                    skipped_count=len(request.records) - len(ids))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -1,22 +1,25 @@
 """Upload and extraction endpoints."""
 import os
 import shutil
+import threading
 from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from typing import Literal, Optional
 
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, Request, UploadFile, File, Form
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel
 from backend.models import UploadResponse
+from backend.sse import SSE_HEADERS, stream_from_thread
 from procurement.config.settings import UPLOAD_DIR, ALLOWED_EXTENSIONS
 from procurement.services.database import (
     insert_uploaded_file, update_uploaded_file, generate_historical_for_skus,
     save_draft_records, replace_draft_records, get_uploaded_files,
-    get_draft_records_by_file, delete_uploaded_file,
+    get_draft_records_by_file, delete_uploaded_file, apply_draft_operations,
 )
 from procurement.services.extraction import extract_document_with_llm
 from procurement.services.llm_service import verify_procurement_document
+from procurement.services.validation import get_validation_summary
 
 
 class StatusUpdateRequest(BaseModel):
@@ -24,6 +27,17 @@ class StatusUpdateRequest(BaseModel):
     records_extracted: Optional[int] = None
 
 
+class DraftOperation(BaseModel):
+    op: Literal['update', 'insert', 'delete']
+    id: Optional[int] = None        # update / delete
+    fields: Optional[dict] = None   # update: changed fields only
+    record: Optional[dict] = None   # insert
+
+
+class DraftPatchRequest(BaseModel):
+    operations: list[DraftOperation]
+
+
 router = APIRouter(prefix="/api/upload", tags=["upload"])
 
 
@@ -33,25 +47,7 @@ async def upload_file(
     eu_company: str = Form(default=''),
 ):
     """Upload a file and optionally extract records."""
-    ext = file.filename.rsplit('.', 1)[-1].lower() if '.' in file.filename else ''
-    if ext not in ALLOWED_EXTENSIONS:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Unsupported file type: .{ext}. Allowed: {', '.join(ALLOWED_EXTENSIONS)}",
-        )
-
-    # Save file
-    upload_dir = Path(UPLOAD_DIR)
-    upload_dir.mkdir(parents=True, exist_ok=True)
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    safe_name = f"{timestamp}_{file.filename}"
-    file_path = upload_dir / safe_name
-
-    with open(file_path, 'wb') as f:
-        shutil.copyfileobj(file.file, f)
-
-    file_size = os.path.getsize(file_path)
-    file_id = insert_uploaded_file(file.filename, ext, file_size, disk_filename=safe_name)
+    file_id, _ = _store_upload(file)
 
     return UploadResponse(
         file_id=file_id,
@@ -68,56 +64,140 @@ async def extract_records(
     eu_company: str = Form(default=''),
 ):
     """Upload and extract records from a procurement document."""
-    ext = file.filename.rsplit('.', 1)[-1].lower() if '.' in file.filename else ''
+    file_id, file_path = _store_upload(file)
+    try:
+        records = _extract_and_finalize(file_id, file_path, file.filename, eu_company)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Extraction failed: {str(e)}")
+
+    return UploadResponse(
+        file_id=file_id,
+        filename=file.filename,
+        status='uploaded',
+        records_extracted=len(records),
+        records=records,
+    )
+
+
+@router.post("/extract/stream")
+async def extract_records_stream(
+    request: Request,
+    file: UploadFile = File(...),
+    eu_company: str = Form(default=''),
+):
+    """Upload and extract records, streaming line items as Server-Sent Events.
+
+    Events: "item" (one per line item, per-record validation only),
+    "complete" (final batch-validated records, same shape as /extract,
+    plus a validation summary) or "error". The extraction stops once the
+    client disconnects.
+    """
+    file_id, file_path = _store_upload(file)
+    filename = file.filename
+
+    def produce(emit):
+        emit('started', {'file_id': file_id, 'filename': filename})
+        count = 0
+        count_lock = threading.Lock()
+
+        def on_item(rec):
+            # Chunked extraction calls this from several threads at once
+            nonlocal count
+            if eu_company and not rec.get('eu_company'):
+                rec['eu_company'] = eu_company
+            with count_lock:
+                emit('item', {'index': count, 'record': rec})
+                count += 1
+
+        try:
+            records = _extract_and_finalize(file_id, file_path, filename, eu_company, on_item=on_item)
+        except Exception as e:
+            raise RuntimeError(f"Extraction failed: {str(e)}") from e
+
+        emit('complete', {
+            'file_id': file_id,
+            'filename': filename,
+            'status': 'uploaded',
+            'records_extracted': len(records),
+            'records': records,
+            'summary': get_validation_summary(records),
+        })
+
+    return StreamingResponse(
+        stream_from_thread(produce, request),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
+
+def _save_upload(file: UploadFile, prefix: str = '') -> Path:
+    """Check the extension and save an upload to UPLOAD_DIR under a timestamped name."""
+    ext = _extension(file.filename)
     if ext not in ALLOWED_EXTENSIONS:
-        raise HTTPException(status_code=400, detail=f"Unsupported file type: .{ext}")
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported file type: .{ext}. Allowed: {', '.join(ALLOWED_EXTENSIONS)}",
+        )
 
     upload_dir = Path(UPLOAD_DIR)
     upload_dir.mkdir(parents=True, exist_ok=True)
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    safe_name = f"{timestamp}_{file.filename}"
-    file_path = upload_dir / safe_name
+    file_path = upload_dir / f"{timestamp}_{prefix}{file.filename}"
 
     with open(file_path, 'wb') as f:
         shutil.copyfileobj(file.file, f)
+    return file_path
+
+
+def _store_upload(file: UploadFile) -> tuple[int, Path]:
+    """Save an upload and record it in uploaded_files; returns (file_id, path on disk)."""
+    file_path = _save_upload(file)
+    file_id = insert_uploaded_file(file.filename, _extension(file.filename), os.path.getsize(file_path),
+                                   disk_filename=file_path.name)
+    return file_id, file_path
+
 
-    file_size = os.path.getsize(file_path)
-    file_id = insert_uploaded_file(file.filename, ext, file_size, disk_filename=safe_name)
+def _extension(filename: str) -> str:
+    return filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
 
+
+def _extract_and_finalize(file_id: int, file_path: Path, filename: str, eu_company: str = '',
+                          on_item=None) -> list[dict]:
+    """Extract a stored upload and save its drafts; marks the upload 'error' if extraction fails."""
     try:
         update_uploaded_file(file_id, 'processing')
-        records = extract_document_with_llm(str(file_path), filename=file.filename)
+        records = extract_document_with_llm(str(file_path), filename=filename, on_item=on_item)
+        _finalize_extraction(file_id, filename, records, eu_company)
+        return records
+    except Exception:
+        update_uploaded_file(file_id, 'error')
+        raise
 
-        # Add eu_company to all records if provided
-        if eu_company:
-            for rec in records:
-                if not rec.get('eu_company'):
-                    rec['eu_company'] = eu_company
 
-        update_uploaded_file(file_id, 'uploaded', len(records))
+def _finalize_extraction(file_id: int, filename: str, records: list[dict], eu_company: str = ''):
+    """Shared post-extraction steps: company backfill, status, synthetic history, draft save."""
+    # Add eu_company to all records if provided
+    if eu_company:
+        for rec in records:
+            if not rec.get('eu_company'):
+                rec['eu_company'] = eu_company
 
-        # Auto-generate historical data for extracted SKUs so benchmarking works immediately
-        try:
-            generate_historical_for_skus(records)
-        except Exception:
-            pass  # Non-critical — don't fail extraction if historical generation has issues
+    update_uploaded_file(file_id, 'uploaded', len(records))
 
-        # Auto-save records as drafts so they persist across navigation
-        try:
-            save_draft_records(records, file_id=file_id, source_file=file.filename)
-        except Exception:
-            pass  # Non-critical — records still returned to frontend
-
-        return UploadResponse(
-            file_id=file_id,
-            filename=file.filename,
-            status='uploaded',
-            records_extracted=len(records),
-            records=records,
-        )
-    except Exception as e:
-        update_uploaded_file(file_id, 'error')
-        raise HTTPException(status_code=500, detail=f"Extraction failed: {str(e)}")
+    # Auto-generate historical data for extracted SKUs so benchmarking works immediately
+    try:
+        generate_historical_for_skus(records)
+    except Exception:
+        pass  # Non-critical — don't fail extraction if historical generation has issues
+
+    # Auto-save records as drafts so they persist across navigation; the draft
+    # ids let the client autosave edits as row-level patches
+    try:
+        ids = save_draft_records(records, file_id=file_id, source_file=filename)
+        for rec, draft_id in zip(records, ids):
+            rec['id'] = draft_id
+    except Exception:
+        pass  # Non-critical — records still returned to frontend
 
 
 @router.get("/history")
@@ -172,21 +252,21 @@ async def save_drafts(filename: str, records: list[dict]):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.patch("/drafts/{filename:path}")
+async def patch_drafts(filename: str, request: DraftPatchRequest):
+    """Apply row-level draft edits (update by id, insert, delete) in one transaction."""
+    try:
+        return apply_draft_operations(filename, [op.model_dump() for op in request.operations])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/verify")
 async def verify_document(file: UploadFile = File(...)):
     """Quick check whether a document is a procurement document."""
-    ext = file.filename.rsplit('.', 1)[-1].lower() if '.' in file.filename else ''
-    if ext not in ALLOWED_EXTENSIONS:
-        raise HTTPException(status_code=400, detail=f"Unsupported file type: .{ext}")
-
-    upload_dir = Path(UPLOAD_DIR)
-    upload_dir.mkdir(parents=True, exist_ok=True)
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    safe_name = f"{timestamp}_verify_{file.filename}"
-    file_path = upload_dir / safe_name
-
-    with open(file_path, 'wb') as f:
-        shutil.copyfileobj(file.file, f)
+    file_path = _save_upload(file, prefix='verify_')
 
     try:
         is_procurement = verify_procurement_document(str(file_path), file.filename)
@@ -0,0 +1,77 @@
+"""
+Server-Sent Events helpers for streaming endpoints.
+"""
+import asyncio
+import json
+import threading
+from typing import Any, Callable
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+}
+
+# How often an idle stream checks whether the client is still connected
+DISCONNECT_POLL_SECONDS = 1.0
+
+
+class StreamCancelled(Exception):
+    """Raised by emit() once the client has gone away, so the producer stops."""
+
+
+def sse_event(event: str, data: Any) -> str:
+    """Format one SSE frame with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def stream_from_thread(producer: Callable[[Callable[[str, Any], None]], None], request=None):
+    """Run a blocking producer(emit) in the threadpool and yield an SSE frame per emit(event, data).
+
+    An exception raised by the producer is sent as a final "error" event.
+    If the client disconnects (polled on request, or the response is closed),
+    the next emit() raises StreamCancelled so the producer unwinds. The
+    request is polled at most every DISCONNECT_POLL_SECONDS, busy or idle.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    cancelled = threading.Event()
+
+    def emit(event: str, data: Any):
+        if cancelled.is_set():
+            raise StreamCancelled()
+        loop.call_soon_threadsafe(queue.put_nowait, (event, data))
+
+    def run():
+        try:
+            producer(emit)
+        except Exception as e:
+            # Producers may wrap StreamCancelled; nobody is listening either way
+            if not cancelled.is_set():
+                emit("error", {"detail": str(e)})
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, None)
+
+    worker = loop.run_in_executor(None, run)
+    next_check = loop.time() + DISCONNECT_POLL_SECONDS
+    try:
+        while True:
+            if request is None:
+                item = await queue.get()
+            else:
+                try:
+                    item = await asyncio.wait_for(queue.get(), max(0.0, next_check - loop.time()))
+                except asyncio.TimeoutError:
+                    item = ...
+                if loop.time() >= next_check:
+                    if await request.is_disconnected():
+                        return
+                    next_check = loop.time() + DISCONNECT_POLL_SECONDS
+                if item is ...:
+                    continue
+            if item is None:
+                break
+            yield sse_event(*item)
+    finally:
+        if not worker.done():
+            cancelled.set()
+    await worker
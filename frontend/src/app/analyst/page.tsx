@@ -33,6 +33,7 @@ export default function AnalystPage() {
     },
   ])
   const [suggestions, setSuggestions] = useState<string[]>(defaultSuggestions)
+  const [conversationId, setConversationId] = useState<string | null>(null)
 
   const { data: health } = useQuery({
     queryKey: ['health'],
@@ -45,14 +46,30 @@ export default function AnalystPage() {
     setMessages((prev) => [...prev, { role: 'user', content: message }])
     setSuggestions([])
 
+    // Render the answer progressively: the first token opens the assistant bubble
+    let streamed = false
+    const onToken = (text: string) => {
+      const first = !streamed
+      streamed = true
+      setMessages((prev) => {
+        if (first) return [...prev, { role: 'assistant', content: text }]
+        const last = prev[prev.length - 1]
+        return [...prev.slice(0, -1), { ...last, content: last.content + text }]
+      })
+    }
+
     try {
-      const result = await analystMutation.mutateAsync({ query: message })
-      setMessages((prev) => [...prev, { role: 'assistant', content: result.response }])
+      const result = await analystMutation.mutateAsync({ query: message, conversationId, onToken })
+      setConversationId(result.conversation_id ?? null)
+      setMessages((prev) => [
+        ...(streamed ? prev.slice(0, -1) : prev),
+        { role: 'assistant', content: result.response },
+      ])
       setSuggestions(result.suggestions || [])
     } catch (err) {
       const errorMsg = err instanceof Error ? err.message : 'Failed to get response'
       setMessages((prev) => [
-        ...prev,
+        ...(streamed ? prev.slice(0, -1) : prev),
         { role: 'assistant', content: `Sorry, I encountered an error: ${errorMsg}` },
       ])
       toast.error('Analyst query failed')
@@ -61,6 +78,10 @@ export default function AnalystPage() {
   }
 
   const handleClear = () => {
+    if (conversationId) {
+      api.analyst.endConversation(conversationId).catch(() => {})
+      setConversationId(null)
+    }
     setMessages([
       {
         role: 'assistant',
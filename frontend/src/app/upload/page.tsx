@@ -7,6 +7,7 @@ import { PageHeader } from '@/components/layout/page-header'
 import { CompanySelector } from '@/components/upload/company-selector'
 import { FileDropzone } from '@/components/upload/file-dropzone'
 import { ExtractionStatus } from '@/components/upload/extraction-status'
+import { StreamedItems } from '@/components/upload/streamed-items'
 import { VerificationWorkspace } from '@/components/upload/verification-workspace'
 import { Button } from '@/components/ui/button'
 import { Card, CardContent } from '@/components/ui/card'
@@ -15,11 +16,46 @@ import { Input } from '@/components/ui/input'
 import { useExtractRecords } from '@/lib/hooks/use-upload'
 import { useValidateRecords } from '@/lib/hooks/use-records'
 import { api } from '@/lib/api'
-import type { ProcurementRecord, UploadedFile } from '@/lib/types'
+import type { DraftOperation, ProcurementRecord, UploadedFile } from '@/lib/types'
 import { ArrowRight, RotateCcw, FileText, PanelLeftClose, PanelLeftOpen, Search, Trash2, RefreshCw } from 'lucide-react'
 
 type Step = 'upload' | 'verify'
 
+// Draft fields an autosave can change; everything else is managed by the server
+const DRAFT_FIELDS = [
+  'sku', 'distributor', 'item_description', 'brand', 'quote_currency', 'quantity', 'serial_no',
+  'start_date', 'end_date', 'unit_price', 'total_price', 'eu_company', 'comments_notes',
+  'quotation_ref_no', 'quotation_date', 'quotation_end_date', 'quotation_validity',
+  'validation_status', 'validation_message', 'field_validation',
+] as const
+
+function snapshotDrafts(records: ProcurementRecord[]): Map<number, ProcurementRecord> {
+  return new Map(records.filter((r) => r.id != null).map((r) => [r.id as number, r]))
+}
+
+// Row-level operations turning the saved drafts into `next`; null when a full save is needed
+function draftOperations(saved: Map<number, ProcurementRecord>, next: ProcurementRecord[]): DraftOperation[] | null {
+  if (saved.size === 0) return null
+  const operations: DraftOperation[] = []
+  const seen = new Set<number>()
+  for (const record of next) {
+    const prev = record.id != null ? saved.get(record.id) : undefined
+    if (!prev || record.id == null) return null
+    seen.add(record.id)
+    const fields: Record<string, unknown> = {}
+    for (const key of DRAFT_FIELDS) {
+      if (JSON.stringify(prev[key] ?? null) !== JSON.stringify(record[key] ?? null)) {
+        fields[key] = record[key] ?? null
+      }
+    }
+    if (Object.keys(fields).length > 0) {
+      operations.push({ op: 'update', id: record.id, fields: fields as Partial<ProcurementRecord> })
+    }
+  }
+  saved.forEach((_, id) => { if (!seen.has(id)) operations.push({ op: 'delete', id }) })
+  return operations
+}
+
 export default function UploadPage() {
   const router = useRouter()
   const [step, setStep] = useState<Step>('upload')
@@ -28,10 +64,16 @@ export default function UploadPage() {
   const [records, setRecords] = useState<ProcurementRecord[]>([])
   const [extractionStatus, setExtractionStatus] = useState<'idle' | 'uploading' | 'extracting' | 'completed' | 'error'>('idle')
   const [errorMessage, setErrorMessage] = useState('')
+  // Line items received so far from the extraction stream, shown before the final result
+  const [streamedRecords, setStreamedRecords] = useState<ProcurementRecord[]>([])
   const [fileId, setFileId] = useState<number | null>(null)
   const [sourceFileName, setSourceFileName] = useState('')
   const markedValidatingRef = useRef(false)
   const userEdited = useRef(false)
+  // Drafts as last saved, by id, so autosave only sends the rows that changed
+  const savedDraftsRef = useRef<Map<number, ProcurementRecord>>(new Map())
+  // Autosaves run one after another, each diffed against the previous save's snapshot
+  const saveQueueRef = useRef<Promise<void>>(Promise.resolve())
 
   // Processed documents state
   const [uploads, setUploads] = useState<UploadedFile[]>([])
@@ -90,11 +132,18 @@ export default function UploadPage() {
     if (!file) return
     setExtractionStatus('uploading')
     setErrorMessage('')
+    setStreamedRecords([])
 
     try {
       setExtractionStatus('extracting')
-      const result = await extractMutation.mutateAsync({ file, euCompany })
+      const result = await extractMutation.mutateAsync({
+        file,
+        euCompany,
+        onItem: (record) => setStreamedRecords((prev) => [...prev, record]),
+      })
       setRecords(result.records)
+      setStreamedRecords([])
+      savedDraftsRef.current = snapshotDrafts(result.records)
       setFileId(result.file_id)
       setExtractionStatus('completed')
       toast.success(`Extracted ${result.records_extracted} records`)
@@ -109,11 +158,31 @@ export default function UploadPage() {
     }
   }
 
-  const saveRecords = async (updated: ProcurementRecord[]) => {
+  // Save drafts as a row-level patch, or in full when rows have no known draft id
+  const persistDrafts = async (fname: string, updated: ProcurementRecord[]) => {
+    const operations = draftOperations(savedDraftsRef.current, updated)
+    if (operations === null) {
+      const { ids } = await api.uploads.saveDrafts(fname, updated)
+      const withIds = updated.map((r, i) => ({ ...r, id: ids[i] }))
+      savedDraftsRef.current = snapshotDrafts(withIds)
+      setRecords((current) => (current === updated ? withIds : current))
+    } else if (operations.length > 0) {
+      await api.uploads.patchDrafts(fname, operations)
+      savedDraftsRef.current = snapshotDrafts(updated)
+    }
+  }
+
+  const saveRecords = (updated: ProcurementRecord[]) => {
+    const run = saveQueueRef.current.then(() => saveRecordsNow(updated))
+    saveQueueRef.current = run
+    return run
+  }
+
+  const saveRecordsNow = async (updated: ProcurementRecord[]) => {
     const fname = file?.name || sourceFileName
     if (!fname || updated.length === 0) return
     try {
-      await api.uploads.saveDrafts(fname, updated)
+      await persistDrafts(fname, updated)
     } catch (e) { console.error('[saveRecords] saveDrafts FAILED:', e) }
     if (fileId) {
       try {
@@ -141,7 +210,9 @@ export default function UploadPage() {
   const handleProceed = async () => {
     const fname = file?.name || sourceFileName || ''
     if (fname) {
-      await api.uploads.saveDrafts(fname, records).catch(e => console.error('[proceed] saveDrafts failed:', e))
+      const save = saveQueueRef.current.then(() => persistDrafts(fname, records))
+      saveQueueRef.current = save.catch(() => {})
+      await save.catch(e => console.error('[proceed] saveDrafts failed:', e))
     }
     if (fileId) {
       await api.uploads.updateStatus(fileId, 'validating').catch(e => console.error('[proceed] updateStatus failed:', e))
@@ -154,6 +225,7 @@ export default function UploadPage() {
 
   const handleDiscard = () => {
     setRecords([])
+    savedDraftsRef.current = new Map()
     setFile(null)
     setExtractionStatus('idle')
     setStep('upload')
@@ -172,10 +244,13 @@ export default function UploadPage() {
         setUploads((prev) => prev.map((u) => u.id === upload.id ? { ...u, records_extracted: 0 } : u))
         return
       }
+      // Drafts keep their field-level validation; only older drafts need a round trip
       let validated = drafts
-      try {
-        validated = await api.records.validate(drafts)
-      } catch { /* fall back to unvalidated */ }
+      if (drafts.some((d) => !d.field_validation)) {
+        try {
+          validated = await api.records.validate(drafts)
+        } catch { /* fall back to unvalidated */ }
+      }
       // Sync record count if it drifted (e.g. some were approved separately)
       if (upload.records_extracted !== drafts.length) {
         await api.uploads.updateStatus(upload.id, undefined, drafts.length).catch(() => {})
@@ -186,6 +261,7 @@ export default function UploadPage() {
         setUploads((prev) => prev.map((u) => u.id === upload.id ? { ...u, upload_status: 'validating' } : u))
       }
       setRecords(validated)
+      savedDraftsRef.current = snapshotDrafts(drafts)
       setSourceFileName(originalName)
       setFileId(upload.id)
       setExtractionStatus('completed')
@@ -286,10 +362,17 @@ export default function UploadPage() {
 
             <ExtractionStatus
               status={extractionStatus}
-              message={errorMessage || undefined}
+              message={
+                errorMessage ||
+                (extractionStatus === 'extracting' && streamedRecords.length > 0
+                  ? `Extracting via H2OGPTe... ${streamedRecords.length} line item${streamedRecords.length !== 1 ? 's' : ''} received`
+                  : undefined)
+              }
               recordCount={records.length}
             />
 
+            {extractionStatus === 'extracting' && <StreamedItems records={streamedRecords} />}
+
             <div className="flex justify-end gap-2">
               {extractionStatus === 'error' && (
                 <Button variant="outline" onClick={() => setExtractionStatus('idle')}>
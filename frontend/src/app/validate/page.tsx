@@ -365,7 +365,11 @@ export default function ValidatePage() {
       if (sourceFileId) {
         await api.uploads.updateStatus(sourceFileId, 'approved').catch(() => {})
       }
-      toast.success(`Approved ${result.approved_count} records`)
+      toast.success(
+        result.skipped_count
+          ? `Approved ${result.approved_count} records (${result.skipped_count} already approved, skipped)`
+          : `Approved ${result.approved_count} records`
+      )
       sessionStorage.removeItem('pendingRecords')
       sessionStorage.removeItem('sourceFile')
       sessionStorage.removeItem('sourceFileId')
@@ -0,0 +1,51 @@
+'use client'
+
+import { Table, TableBody, TableCell, TableHead, TableHeader, TableRow } from '@/components/ui/table'
+import { ValidationBadge } from '@/components/records/validation-badge'
+import type { ProcurementRecord } from '@/lib/types'
+
+interface StreamedItemsProps {
+  records: ProcurementRecord[]
+}
+
+function formatNumber(value: number | null) {
+  return value == null ? '—' : value.toLocaleString(undefined, { maximumFractionDigits: 2 })
+}
+
+// Read-only preview of line items as they stream in, before the batch-validated result arrives
+export function StreamedItems({ records }: StreamedItemsProps) {
+  if (records.length === 0) return null
+
+  return (
+    <div className="rounded-lg border border-border max-h-80 overflow-auto">
+      <Table>
+        <TableHeader>
+          <TableRow>
+            <TableHead className="w-10">#</TableHead>
+            <TableHead>SKU</TableHead>
+            <TableHead>Description</TableHead>
+            <TableHead className="text-right">Qty</TableHead>
+            <TableHead className="text-right">Unit Price</TableHead>
+            <TableHead>Status</TableHead>
+          </TableRow>
+        </TableHeader>
+        <TableBody>
+          {records.map((record, i) => (
+            <TableRow key={i}>
+              <TableCell className="text-xs text-muted-foreground">{i + 1}</TableCell>
+              <TableCell className="font-mono text-xs">{record.sku || '—'}</TableCell>
+              <TableCell className="text-xs max-w-xs truncate">{record.item_description || '—'}</TableCell>
+              <TableCell className="text-right text-xs">{formatNumber(record.quantity)}</TableCell>
+              <TableCell className="text-right text-xs">
+                {formatNumber(record.unit_price)} {record.quote_currency || ''}
+              </TableCell>
+              <TableCell>
+                <ValidationBadge status={record.validation_status || 'pending'} />
+              </TableCell>
+            </TableRow>
+          ))}
+        </TableBody>
+      </Table>
+    </div>
+  )
+}
@@ -15,6 +15,9 @@ import type {
   RecordComment,
   SearchResults,
   ReferenceDocument,
+  DraftOperation,
+  DraftPatchResponse,
+  ChangeFeedPage,
 } from './types'
 
 const API_BASE = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000'
@@ -38,6 +41,32 @@ async function fetchAPI<T>(path: string, options?: RequestInit): Promise<T> {
   return res.json()
 }
 
+// Read a Server-Sent Events response, calling onEvent for each frame; throws on an "error" event
+// eslint-disable-next-line @typescript-eslint/no-explicit-any
+async function readSSE(res: Response, onEvent: (event: string, payload: any) => void): Promise<void> {
+  if (!res.ok || !res.body) throw new APIError(res.status, await res.text())
+
+  const reader = res.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+  for (;;) {
+    const { done, value } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true })
+    let sep: number
+    while ((sep = buffer.indexOf('\n\n')) !== -1) {
+      const frame = buffer.slice(0, sep)
+      buffer = buffer.slice(sep + 2)
+      const event = frame.match(/^event: (.*)$/m)?.[1]
+      const data = frame.match(/^data: (.*)$/m)?.[1]
+      if (!event || data === undefined) continue
+      const payload = JSON.parse(data)
+      if (event === 'error') throw new APIError(500, payload.detail)
+      onEvent(event, payload)
+    }
+  }
+}
+
 export const api = {
   dashboard: {
     getMetrics: () => fetchAPI<DashboardMetrics>('/api/dashboard/metrics'),
@@ -68,6 +97,27 @@ export const api = {
       return res.json()
     },
 
+    extractRecordsStream: async (
+      file: File,
+      euCompany: string = '',
+      onItem?: (record: ProcurementRecord, index: number) => void
+    ): Promise<UploadResponse> => {
+      const formData = new FormData()
+      formData.append('file', file)
+      formData.append('eu_company', euCompany)
+      const res = await fetch(`${API_BASE}/api/upload/extract/stream`, {
+        method: 'POST',
+        body: formData,
+      })
+      let result = null as UploadResponse | null
+      await readSSE(res, (event, payload) => {
+        if (event === 'item') onItem?.(payload.record, payload.index)
+        else if (event === 'complete') result = payload
+      })
+      if (!result) throw new APIError(500, 'Extraction stream ended unexpectedly')
+      return result
+    },
+
     verifyDocument: async (file: File): Promise<{ is_procurement_document: boolean; confidence: number }> => {
       const formData = new FormData()
       formData.append('file', file)
@@ -88,6 +138,11 @@ export const api = {
         method: 'PUT',
         body: JSON.stringify(updates),
       }),
+    updateMany: (updates: (Partial<ProcurementRecord> & { id: number })[]) =>
+      fetchAPI<{ records: ProcurementRecord[] }>('/api/records', {
+        method: 'PATCH',
+        body: JSON.stringify({ records: updates }),
+      }),
     delete: (id: number) =>
       fetchAPI<{ status: string; id: number }>(`/api/records/${id}`, { method: 'DELETE' }),
     validate: (records: ProcurementRecord[]) =>
@@ -98,7 +153,7 @@ export const api = {
     approveBatch: (records: ProcurementRecord[], sourceFile: string = '') =>
       fetchAPI<BatchApproveResponse>('/api/records/approve-batch', {
         method: 'POST',
-        body: JSON.stringify({ records, source_file: sourceFile }),
+        body: JSON.stringify({ records, source_file: sourceFile, skip_duplicates: true }),
       }),
     batchDelete: (ids: number[]) =>
       fetchAPI<{ deleted: number }>('/api/records/batch-delete', {
@@ -153,7 +208,8 @@ export const api = {
     query: (
       query: string,
       contextRecords?: ProcurementRecord[],
-      historicalSummary?: Record<string, unknown>
+      historicalSummary?: Record<string, unknown>,
+      conversationId?: string | null
     ) =>
       fetchAPI<AnalystResponse>('/api/analyst', {
         method: 'POST',
@@ -161,8 +217,41 @@ export const api = {
           query,
           context_records: contextRecords,
           historical_summary: historicalSummary,
+          conversation_id: conversationId ?? undefined,
         }),
       }),
+
+    queryStream: async (
+      query: string,
+      onToken: (text: string) => void,
+      contextRecords?: ProcurementRecord[],
+      historicalSummary?: Record<string, unknown>,
+      conversationId?: string | null
+    ): Promise<AnalystResponse> => {
+      const res = await fetch(`${API_BASE}/api/analyst/stream`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+          query,
+          context_records: contextRecords,
+          historical_summary: historicalSummary,
+          conversation_id: conversationId ?? undefined,
+        }),
+      })
+      let result = null as AnalystResponse | null
+      await readSSE(res, (event, payload) => {
+        if (event === 'token') onToken(payload.text)
+        else if (event === 'complete') result = payload
+      })
+      if (!result) throw new APIError(500, 'Analyst stream ended unexpectedly')
+      return result
+    },
+
+    endConversation: (conversationId: string) =>
+      fetchAPI<{ status: string; conversation_id: string }>(
+        `/api/analyst/conversations/${encodeURIComponent(conversationId)}`,
+        { method: 'DELETE' }
+      ),
   },
 
   health: {
@@ -228,10 +317,15 @@ export const api = {
     getDrafts: (filename: string) =>
       fetchAPI<ProcurementRecord[]>(`/api/upload/drafts/${encodeURIComponent(filename)}`),
     saveDrafts: (filename: string, records: ProcurementRecord[]) =>
-      fetchAPI<{ saved: number }>(`/api/upload/drafts/${encodeURIComponent(filename)}`, {
+      fetchAPI<{ saved: number; ids: number[] }>(`/api/upload/drafts/${encodeURIComponent(filename)}`, {
         method: 'PUT',
         body: JSON.stringify(records),
       }),
+    patchDrafts: (filename: string, operations: DraftOperation[]) =>
+      fetchAPI<DraftPatchResponse>(`/api/upload/drafts/${encodeURIComponent(filename)}`, {
+        method: 'PATCH',
+        body: JSON.stringify({ operations }),
+      }),
     updateStatus: (fileId: number, status?: string, recordsExtracted?: number) =>
       fetchAPI<{ ok: boolean }>(`/api/upload/${fileId}/status`, {
         method: 'PATCH',
@@ -247,4 +341,11 @@ export const api = {
     global: (q: string) =>
       fetchAPI<SearchResults>(`/api/search?q=${encodeURIComponent(q)}`),
   },
+
+  changes: {
+    since: (seq: number, tables?: string[]) =>
+      fetchAPI<ChangeFeedPage>(
+        `/api/changes?since=${seq}${tables?.length ? `&tables=${encodeURIComponent(tables.join(','))}` : ''}`
+      ),
+  },
 }
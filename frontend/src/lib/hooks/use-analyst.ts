@@ -10,10 +10,17 @@ export function useAnalystQuery() {
       query,
       contextRecords,
       historicalSummary,
+      conversationId,
+      onToken,
     }: {
       query: string
       contextRecords?: ProcurementRecord[]
       historicalSummary?: Record<string, unknown>
-    }) => api.analyst.query(query, contextRecords, historicalSummary),
+      conversationId?: string | null
+      onToken?: (text: string) => void
+    }) =>
+      onToken
+        ? api.analyst.queryStream(query, onToken, contextRecords, historicalSummary, conversationId)
+        : api.analyst.query(query, contextRecords, historicalSummary, conversationId),
   })
 }
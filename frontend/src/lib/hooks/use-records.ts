@@ -22,6 +22,16 @@ export function useUpdateRecord() {
   })
 }
 
+export function useUpdateRecords() {
+  const queryClient = useQueryClient()
+  return useMutation({
+    mutationFn: (updates: (Partial<ProcurementRecord> & { id: number })[]) => api.records.updateMany(updates),
+    onSuccess: () => {
+      queryClient.invalidateQueries({ queryKey: ['records'] })
+    },
+  })
+}
+
 export function useDeleteRecord() {
   const queryClient = useQueryClient()
   return useMutation({
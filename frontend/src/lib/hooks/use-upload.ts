@@ -2,6 +2,7 @@
 
 import { useMutation } from '@tanstack/react-query'
 import { api } from '@/lib/api'
+import type { ProcurementRecord } from '@/lib/types'
 
 export function useUploadFile() {
   return useMutation({
@@ -12,8 +13,15 @@ export function useUploadFile() {
 
 export function useExtractRecords() {
   return useMutation({
-    mutationFn: ({ file, euCompany }: { file: File; euCompany: string }) =>
-      api.upload.extractRecords(file, euCompany),
+    mutationFn: ({
+      file,
+      euCompany,
+      onItem,
+    }: {
+      file: File
+      euCompany: string
+      onItem?: (record: ProcurementRecord, index: number) => void
+    }) => api.upload.extractRecordsStream(file, euCompany, onItem),
   })
 }
 
@@ -35,6 +35,18 @@ export interface ProcurementRecord {
   updated_at?: string | null
 }
 
+export type DraftOperation =
+  | { op: 'update'; id: number; fields: Partial<ProcurementRecord> }
+  | { op: 'insert'; record: ProcurementRecord }
+  | { op: 'delete'; id: number }
+
+export interface DraftPatchResponse {
+  updated: number
+  inserted: number[]
+  deleted: number
+  ids: number[]
+}
+
 export interface UploadedFile {
   id: number
   filename: string
@@ -78,6 +90,10 @@ export interface AnalystResponse {
   response: string
   suggestions: string[]
   confidence: number
+  conversation_id?: string | null
+  tool?: string | null
+  data?: Record<string, unknown> | null
+  cache?: 'hit' | 'miss' | null
 }
 
 export interface HistoricalStats {
@@ -103,20 +119,31 @@ export interface PriceTrendPoint {
   record_count: number
 }
 
+export interface PriceQuantiles {
+  p10_price: number | null
+  median_price: number | null
+  p90_price: number | null
+  mad_price: number | null
+}
+
 export interface PriceTrendResponse {
   sku: string
   data_points: PriceTrendPoint[]
+  quantiles?: PriceQuantiles | null
 }
 
 export interface HealthStatus {
   connected: boolean
   model: string | null
   error: string | null
+  latency_ms?: number | null
+  checked_at?: string | null
 }
 
 export interface BatchApproveResponse {
   approved_count: number
   record_ids: number[]
+  skipped_count?: number
 }
 
 export interface SkuPriceSummary {
@@ -125,6 +152,10 @@ export interface SkuPriceSummary {
   max_price: number
   avg_quantity: number
   record_count: number
+  median_price?: number | null
+  p10_price?: number | null
+  p90_price?: number | null
+  mad_price?: number | null
 }
 
 export type BatchStatsResult = Record<string, SkuPriceSummary>
@@ -167,6 +198,21 @@ export interface SearchResults {
   historical: ProcurementRecord[]
 }
 
+export interface ChangeFeedEntry {
+  seq: number
+  table_name: 'records' | 'drafts' | 'historical_archive' | 'catalog' | 'uploaded_files' | 'record_comments' | 'reference_documents'
+  row_id: number
+  op: 'insert' | 'update' | 'delete'
+  changed_at: string
+}
+
+export interface ChangeFeedPage {
+  changes: ChangeFeedEntry[]
+  next_since: number
+  has_more: boolean
+  reset: boolean
+}
+
 export interface ReferenceDocument {
   id: number
   filename: string
@@ -15,6 +15,63 @@ DATABASE_PATH = os.getenv('DATABASE_PATH', str(BASE_DIR / 'data' / 'document_int
 H2OGPTE_API_KEY = os.getenv('H2OGPTE_API_KEY', '')
 H2OGPTE_ADDRESS = os.getenv('H2OGPTE_ADDRESS', '')
 
+# Client mode: 'live' (real server), 'fake' (offline stand-in), 'record' (live, saving
+# responses to H2OGPTE_RECORD_DIR) or 'replay' (offline, answering from recordings)
+H2OGPTE_MODE = os.getenv('H2OGPTE_MODE', 'live').lower()
+H2OGPTE_RECORD_DIR = os.getenv('H2OGPTE_RECORD_DIR', str(BASE_DIR / 'data' / 'h2ogpte_recordings'))
+# Fake client tuning, e.g. "query=lognormal:0.5:0.4,ingest=uniform:0.5:2" and "0.05" or "query=0.1"
+H2OGPTE_FAKE_LATENCY = os.getenv('H2OGPTE_FAKE_LATENCY', '')
+H2OGPTE_FAKE_FAILURE_RATE = os.getenv('H2OGPTE_FAKE_FAILURE_RATE', '')
+H2OGPTE_FAKE_SEED = os.getenv('H2OGPTE_FAKE_SEED', '')
+
+# Resilience around H2OGPTE calls: concurrency caps (global and per operation,
+# e.g. "query=6,ingest=2"), retries with jittered backoff and a circuit breaker
+H2OGPTE_MAX_CONCURRENCY = int(os.getenv('H2OGPTE_MAX_CONCURRENCY', '8'))
+H2OGPTE_OP_CONCURRENCY = {
+    op.strip(): int(n)
+    for op, _, n in (part.partition('=') for part in os.getenv('H2OGPTE_OP_CONCURRENCY', 'query=6,ingest=2').split(','))
+    if op.strip() and n
+}
+H2OGPTE_ACQUIRE_TIMEOUT_SECONDS = float(os.getenv('H2OGPTE_ACQUIRE_TIMEOUT_SECONDS', '30'))
+H2OGPTE_RETRY_ATTEMPTS = int(os.getenv('H2OGPTE_RETRY_ATTEMPTS', '3'))
+H2OGPTE_RETRY_BASE_DELAY = float(os.getenv('H2OGPTE_RETRY_BASE_DELAY', '0.5'))
+H2OGPTE_RETRY_MAX_DELAY = float(os.getenv('H2OGPTE_RETRY_MAX_DELAY', '8'))
+H2OGPTE_BREAKER_THRESHOLD = int(os.getenv('H2OGPTE_BREAKER_THRESHOLD', '5'))
+H2OGPTE_BREAKER_RESET_SECONDS = float(os.getenv('H2OGPTE_BREAKER_RESET_SECONDS', '30'))
+
+# Shared ingestion sessions (verify + extract reuse one collection per document)
+INGESTION_TIMEOUT_SECONDS = int(os.getenv('INGESTION_TIMEOUT_SECONDS', '120'))
+INGESTION_LEASE_SECONDS = int(os.getenv('INGESTION_LEASE_SECONDS', '600'))
+# Pooled temporary collections: max idle collections kept, and how many are pre-created at startup
+COLLECTION_POOL_SIZE = int(os.getenv('COLLECTION_POOL_SIZE', '4'))
+COLLECTION_POOL_WARM = int(os.getenv('COLLECTION_POOL_WARM', '2'))
+# Lease on each pooled collection, renewed by its owning process; other processes reap it once expired
+COLLECTION_POOL_LEASE_SECONDS = int(os.getenv('COLLECTION_POOL_LEASE_SECONDS', '600'))
+
+# Model discovery: cached model list TTL and optional per-task model overrides
+MODEL_CACHE_TTL_SECONDS = int(os.getenv('MODEL_CACHE_TTL_SECONDS', '300'))
+MODEL_OVERRIDES = {
+    task: os.getenv(f'H2OGPTE_MODEL_{task.upper()}', '') or os.getenv('H2OGPTE_MODEL', '')
+    for task in ('extraction', 'verification', 'catalog', 'analyst')
+}
+
+# Analyst conversations: chat sessions reused across turns, evicted when idle
+ANALYST_SESSION_IDLE_SECONDS = int(os.getenv('ANALYST_SESSION_IDLE_SECONDS', '900'))
+ANALYST_MAX_CONVERSATIONS = int(os.getenv('ANALYST_MAX_CONVERSATIONS', '200'))
+
+# Deterministic analytics tools for aggregate analyst questions: 'template' answers
+# from the computed result directly, 'llm' has the LLM phrase it, 'off' disables them
+ANALYST_TOOLS = os.getenv('ANALYST_TOOLS', 'template').lower()
+# Analyst answer cache (LRU with TTL), keyed by question, context and data version
+ANALYST_CACHE_SIZE = int(os.getenv('ANALYST_CACHE_SIZE', '256'))
+ANALYST_CACHE_TTL_SECONDS = int(os.getenv('ANALYST_CACHE_TTL_SECONDS', '3600'))
+# Approximate token budget for the data context of an analyst prompt
+ANALYST_CONTEXT_TOKEN_BUDGET = int(os.getenv('ANALYST_CONTEXT_TOKEN_BUDGET', '3000'))
+
+# Background H2OGPTE health probe
+HEALTH_PROBE_INTERVAL_SECONDS = int(os.getenv('HEALTH_PROBE_INTERVAL_SECONDS', '30'))
+HEALTH_PROBE_TIMEOUT_SECONDS = int(os.getenv('HEALTH_PROBE_TIMEOUT_SECONDS', '10'))
+
 # File uploads
 UPLOAD_DIR = os.getenv('UPLOAD_DIR', str(BASE_DIR / 'data' / 'uploads'))
 ALLOWED_EXTENSIONS = {'pdf', 'xlsx', 'xls', 'csv', 'doc', 'docx'}
@@ -28,5 +85,29 @@ COMPULSORY_FIELDS = {
 
 SUPPORTED_CURRENCIES = {'SGD', 'USD', 'EUR', 'GBP', 'JPY', 'CNY', 'MYR', 'AUD', 'ALL'}
 
+# Validation engine: 'auto' uses the NumPy columnar engine from
+# VALIDATION_COLUMNAR_MIN_BATCH records; 'python' / 'columnar' force one.
+# Batches of VALIDATION_PARALLEL_MIN_BATCH records or more left to the Python
+# engine ('auto' without NumPy, or 'parallel') are sharded across a process pool
+# on multi-core hosts; below that the pickling overhead outweighs the gain
+VALIDATION_ENGINE = os.getenv('VALIDATION_ENGINE', 'auto').lower()
+VALIDATION_COLUMNAR_MIN_BATCH = int(os.getenv('VALIDATION_COLUMNAR_MIN_BATCH', '1000'))
+VALIDATION_PARALLEL_MIN_BATCH = int(os.getenv('VALIDATION_PARALLEL_MIN_BATCH', '5000'))
+# Worker processes of the parallel validation pool, started with the app (0 = one per CPU)
+VALIDATION_WORKERS = int(os.getenv('VALIDATION_WORKERS', '0'))
+
+# Compression of the per-SKU t-digest price sketches (higher = more accurate, larger)
+PRICE_SKETCH_COMPRESSION = int(os.getenv('PRICE_SKETCH_COMPRESSION', '100'))
+
+# Days of history kept in the change feed (GET /api/changes); 0 keeps everything
+CHANGE_FEED_RETENTION_DAYS = int(os.getenv('CHANGE_FEED_RETENTION_DAYS', '30'))
+
 # Extraction prompt
 EXTRACTION_PROMPT_PATH = str(BASE_DIR / 'extraction_prompt.txt')
+
+# Chunked extraction: PDFs longer than EXTRACTION_CHUNK_PAGES pages and spreadsheets,
+# CSV and Word files with more than EXTRACTION_CHUNK_ROWS rows are queried one page or
+# row range at a time, concurrently, against the document's single ingested collection
+EXTRACTION_CHUNK_PAGES = int(os.getenv('EXTRACTION_CHUNK_PAGES', '4'))
+EXTRACTION_CHUNK_ROWS = int(os.getenv('EXTRACTION_CHUNK_ROWS', '200'))
+EXTRACTION_MAX_CONCURRENCY = int(os.getenv('EXTRACTION_MAX_CONCURRENCY', '4'))
@@ -0,0 +1,81 @@
+"""
+Response cache for the AI analyst.
+Buyers ask the same suggested questions against the same data; answers are
+cached by normalized question, a digest of the context the question was asked
+with, and the database data version. Approvals and catalog changes bump the
+data version (see database.get_data_version), so stale answers are never
+served; they age out through LRU eviction and the TTL.
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from procurement.config.settings import ANALYST_CACHE_SIZE, ANALYST_CACHE_TTL_SECONDS
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    return re.sub(r'\s+', ' ', (query or '').lower()).strip().rstrip('?!. ')
+
+
+def context_digest(context_records: list[dict] = None, historical_summary: dict = None) -> str:
+    """Digest of the context scope, independent of record order."""
+    rows = sorted(json.dumps(r, sort_keys=True, default=str) for r in context_records or [])
+    payload = json.dumps([rows, historical_summary], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def cache_key(query: str, context_records: list[dict] = None, historical_summary: dict = None,
+              data_version: str = '') -> tuple:
+    return normalize_query(query), context_digest(context_records, historical_summary), data_version
+
+
+class AnalystCache:
+    """Thread-safe LRU cache with a per-entry TTL."""
+
+    def __init__(self, max_entries: int = ANALYST_CACHE_SIZE, ttl_seconds: float = ANALYST_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[tuple, tuple[float, object]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl_seconds > 0
+
+    def get(self, key: tuple):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: tuple, value):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+analyst_cache = AnalystCache()
@@ -0,0 +1,204 @@
+"""
+Context assembly for analyst prompts.
+Picks the records relevant to a question (SKU, company and distributor
+mentions, then the largest line items by spend), encodes them as a compact
+pipe-separated table and adds precomputed aggregates, all within a token
+budget.
+"""
+import json
+import re
+from dataclasses import dataclass, field
+
+from procurement.config.settings import ANALYST_CONTEXT_TOKEN_BUDGET
+from procurement.services.database import (
+    get_current_records, get_distinct_distributors, get_distinct_eu_companies,
+    get_historical_price_summaries_batch, get_spend_by_distributor,
+)
+
+# Columns of the compact record table, in order
+TABLE_COLUMNS = [
+    ('id', 'id'), ('sku', 'sku'), ('item_description', 'desc'), ('distributor', 'distributor'),
+    ('eu_company', 'company'), ('quote_currency', 'ccy'), ('quantity', 'qty'),
+    ('unit_price', 'unit'), ('total_price', 'total'), ('quotation_date', 'quoted'),
+]
+
+_DESCRIPTION_CHARS = 40
+_MIN_MENTION_CHARS = 3
+
+
+@dataclass
+class AnalystContext:
+    text: str = ''
+    keys: set = field(default_factory=set)
+    records: list = field(default_factory=list)
+    tokens: int = 0
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token)."""
+    return (len(text) + 3) // 4
+
+
+def record_key(record: dict) -> str:
+    """Stable identity of a context record (database id, else content hash)."""
+    if record.get('id') is not None:
+        return f"id:{record['id']}"
+    return 'row:' + json.dumps(record, sort_keys=True, default=str)
+
+
+def _spend(record: dict) -> float:
+    total = record.get('total_price')
+    if total is None and record.get('unit_price') is not None:
+        total = record['unit_price'] * (record.get('quantity') or 1)
+    try:
+        return float(total or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _cell(value, column: str) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, float):
+        value = f"{value:.2f}".rstrip('0').rstrip('.')
+    text = str(value).replace('|', '/').replace('\n', ' ')
+    if column == 'item_description' and len(text) > _DESCRIPTION_CHARS:
+        text = text[:_DESCRIPTION_CHARS - 1] + '…'
+    return text
+
+
+TABLE_HEADER = '|'.join(label for _, label in TABLE_COLUMNS)
+
+
+def encode_row(record: dict) -> str:
+    return '|'.join(_cell(record.get(col), col) for col, _ in TABLE_COLUMNS)
+
+
+def encode_table(records: list[dict]) -> list[str]:
+    """Header plus one pipe-separated line per record."""
+    return [TABLE_HEADER] + [encode_row(r) for r in records]
+
+
+def find_mentions(question: str, records: list[dict]) -> dict[str, set]:
+    """SKUs, companies and distributors named in the question."""
+    q = question.lower()
+
+    def _mentioned(values) -> set:
+        found = set()
+        for v in values:
+            if v and len(v) >= _MIN_MENTION_CHARS and re.search(
+                    r'(?<![\w-])' + re.escape(v.lower()) + r'(?![\w-])', q):
+                found.add(v)
+        return found
+
+    skus = {r.get('sku') for r in records if r.get('sku')}
+    return {
+        'sku': _mentioned(skus),
+        'eu_company': _mentioned(get_distinct_eu_companies()),
+        'distributor': _mentioned(get_distinct_distributors()),
+    }
+
+
+def select_records(records: list[dict], mentions: dict[str, set]) -> list[dict]:
+    """Records matching question mentions first, then the rest, each by spend descending."""
+    def _relevant(r: dict) -> bool:
+        return any(r.get(f) in values for f, values in mentions.items() if values)
+
+    ranked = sorted(records, key=_spend, reverse=True)
+    if not any(mentions.values()):
+        return ranked
+    return [r for r in ranked if _relevant(r)] + [r for r in ranked if not _relevant(r)]
+
+
+def _aggregate_sections(records: list[dict], mentioned_skus: set, exclude: set) -> list[tuple[str, list[str]]]:
+    """(key, lines) blocks of precomputed aggregates, most relevant first."""
+    sections = []
+
+    skus = list(mentioned_skus) + [r.get('sku') for r in records[:20] if r.get('sku')]
+    skus = [s for s in dict.fromkeys(skus) if f"agg:sku:{s}" not in exclude]
+    stats = get_historical_price_summaries_batch(skus) if skus else {}
+    for sku in skus:
+        if sku in stats:
+            s = stats[sku]
+            sections.append((f"agg:sku:{sku}", [
+                f"{sku}|{s['record_count']}|{s['avg_price']}|{s['min_price']}|{s['max_price']}"
+            ]))
+
+    if 'agg:distributors' not in exclude:
+        rows = get_spend_by_distributor()
+        if rows:
+            sections.append(('agg:distributors', [
+                f"{r['distributor']}|{r['quote_currency'] or ''}|{r['record_count']}|{r['spend']}" for r in rows
+            ]))
+    return sections
+
+
+def build_analyst_context(
+    question: str,
+    context_records: list[dict] = None,
+    historical_summary: dict = None,
+    exclude: set = None,
+    token_budget: int = ANALYST_CONTEXT_TOKEN_BUDGET,
+) -> AnalystContext:
+    """Assemble prompt context for a question within token_budget.
+
+    context_records (if given) is the record pool, otherwise active records
+    from the database. Keys in `exclude` (records and aggregates the chat
+    session has already seen) are skipped; the returned keys are what this
+    context adds.
+    """
+    exclude = exclude or set()
+    pool = context_records if context_records is not None else get_current_records()
+    mentions = find_mentions(question, pool)
+    ranked = select_records(pool, mentions)
+
+    ctx = AnalystContext()
+    parts: list[str] = []
+    used = 0
+
+    if historical_summary:
+        line = 'Historical summary: ' + json.dumps(historical_summary, separators=(',', ':'), default=str)
+        if estimate_tokens(line) <= token_budget // 4:
+            parts.append(line)
+            used += estimate_tokens(line)
+
+    # Aggregates may use up to half the budget; the rest is for record rows
+    aggregate_budget = token_budget // 2
+    sku_lines, dist_lines = [], []
+    for key, lines in _aggregate_sections(ranked, mentions['sku'], exclude):
+        target = dist_lines if key == 'agg:distributors' else sku_lines
+        if used + estimate_tokens('\n'.join(lines)) > aggregate_budget:
+            continue
+        target.extend(lines)
+        used += estimate_tokens('\n'.join(lines))
+        ctx.keys.add(key)
+    if sku_lines:
+        parts.append('Historical price stats (sku|n|avg|min|max):')
+        parts.extend(sku_lines)
+    if dist_lines:
+        parts.append('Spend by distributor (distributor|ccy|records|spend):')
+        parts.extend(dist_lines)
+
+    new_records = [r for r in ranked if record_key(r) not in exclude]
+    if new_records:
+        rows = []
+        used += estimate_tokens(TABLE_HEADER) + 10
+        for rec in new_records:
+            line = encode_row(rec)
+            cost = estimate_tokens(line) + 1
+            if used + cost > token_budget:
+                break
+            rows.append(line)
+            used += cost
+            ctx.records.append(rec)
+            ctx.keys.add(record_key(rec))
+        if rows:
+            omitted = len(new_records) - len(rows)
+            parts.append(f"Records ({len(rows)} of {len(pool)}"
+                         + (f", {omitted} less relevant omitted" if omitted else '') + "):")
+            parts.append(TABLE_HEADER)
+            parts.extend(rows)
+
+    ctx.text = '\n'.join(parts)
+    ctx.tokens = estimate_tokens(ctx.text)
+    return ctx
@@ -0,0 +1,165 @@
+"""
+Server-side analyst conversations.
+Each conversation keeps one H2OGPTE chat session across turns, so the system
+prompt and context records are sent once and later turns only carry what
+changed. Conversations idle for ANALYST_SESSION_IDLE_SECONDS are evicted and
+their chat sessions deleted.
+"""
+import hashlib
+import json
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from procurement.config.settings import ANALYST_SESSION_IDLE_SECONDS, ANALYST_MAX_CONVERSATIONS
+from procurement.services.llm_service import get_h2ogpte_client
+
+
+def _digest(value) -> str:
+    return hashlib.sha1(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+
+
+@dataclass
+class AnalystConversation:
+    conversation_id: str
+    chat_session_id: str = None
+    sent_keys: set = field(default_factory=set)
+    summary_digest: str = None
+    notes: list = field(default_factory=list)
+    turns: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def summary_delta(self, summary: dict = None) -> "dict | None":
+        """The summary, unless the chat session has already seen it."""
+        return summary if summary and _digest(summary) != self.summary_digest else None
+
+    def mark_sent(self, keys: set, summary: dict = None):
+        """Remember the context keys (records, aggregates) and summary sent this turn."""
+        self.sent_keys.update(keys)
+        if summary:
+            self.summary_digest = _digest(summary)
+
+
+class ConversationStore:
+    """In-memory conversations with idle eviction."""
+
+    def __init__(self, idle_seconds: float = ANALYST_SESSION_IDLE_SECONDS,
+                 max_conversations: int = ANALYST_MAX_CONVERSATIONS):
+        self.idle_seconds = idle_seconds
+        self.max_conversations = max_conversations
+        self._lock = threading.Lock()
+        self._conversations: dict[str, AnalystConversation] = {}
+        self._reaper = None
+
+    def _get_or_create(self, conversation_id: str = None) -> AnalystConversation:
+        with self._lock:
+            conv = self._conversations.get(conversation_id) if conversation_id else None
+            if conv is None:
+                conv = AnalystConversation(conversation_id=conversation_id or secrets.token_hex(16))
+                self._conversations[conv.conversation_id] = conv
+            conv.last_used = time.monotonic()
+        return conv
+
+    def add_note(self, conversation_id: str = None, note: str = '') -> str:
+        """Record an exchange answered outside the chat session (e.g. by an analytics tool).
+
+        Notes are prepended to the next LLM turn so follow-ups keep the context.
+        Returns the conversation id, creating the conversation if needed.
+        """
+        conv = self._get_or_create(conversation_id)
+        with conv.lock:
+            conv.notes.append(note)
+        return conv.conversation_id
+
+    def is_fresh(self, conversation_id: str = None) -> bool:
+        """True if the conversation has no history an answer could depend on."""
+        with self._lock:
+            conv = self._conversations.get(conversation_id) if conversation_id else None
+        return conv is None or (conv.turns == 0 and not conv.notes)
+
+    @contextmanager
+    def turn(self, conversation_id: str = None, client=None):
+        """Run one question/answer turn; turns of a conversation are serialized.
+
+        A failed turn ends the conversation so the next one starts clean.
+        """
+        client = client or get_h2ogpte_client()
+        conv = self._get_or_create(conversation_id)
+        self._ensure_reaper()
+        with conv.lock:
+            try:
+                if conv.chat_session_id is None:
+                    conv.chat_session_id = client.create_chat_session()
+                yield conv
+                conv.turns += 1
+            except Exception:
+                self.end(conv.conversation_id, client)
+                raise
+            finally:
+                conv.last_used = time.monotonic()
+        self._evict_overflow(client)
+
+    def end(self, conversation_id: str, client=None) -> bool:
+        """Forget a conversation and delete its chat session."""
+        with self._lock:
+            conv = self._conversations.pop(conversation_id, None)
+        if conv is None:
+            return False
+        _delete_chat_sessions(client, [conv.chat_session_id])
+        return True
+
+    def evict_idle(self, client=None) -> int:
+        """End conversations idle for longer than idle_seconds."""
+        cutoff = time.monotonic() - self.idle_seconds
+        with self._lock:
+            idle = [c for c in self._conversations.values() if c.last_used <= cutoff and not c.lock.locked()]
+            for conv in idle:
+                self._conversations.pop(conv.conversation_id, None)
+        _delete_chat_sessions(client, [c.chat_session_id for c in idle])
+        return len(idle)
+
+    def _evict_overflow(self, client):
+        with self._lock:
+            excess = len(self._conversations) - self.max_conversations
+            if excess <= 0:
+                return
+            oldest = sorted(self._conversations.values(), key=lambda c: c.last_used)[:excess]
+            for conv in oldest:
+                self._conversations.pop(conv.conversation_id, None)
+        _delete_chat_sessions(client, [c.chat_session_id for c in oldest])
+
+    def _ensure_reaper(self):
+        if self._reaper is not None and self._reaper.is_alive():
+            return
+
+        def _loop():
+            interval = max(5, min(60, self.idle_seconds // 2))
+            while True:
+                time.sleep(interval)
+                self.evict_idle()
+
+        self._reaper = threading.Thread(target=_loop, name='analyst-session-reaper', daemon=True)
+        self._reaper.start()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'conversations': len(self._conversations),
+                'turns': sum(c.turns for c in self._conversations.values()),
+            }
+
+
+def _delete_chat_sessions(client, chat_session_ids: list[str]):
+    ids = [i for i in chat_session_ids if i]
+    if not ids:
+        return
+    try:
+        (client or get_h2ogpte_client()).delete_chat_sessions(ids)
+    except Exception:
+        pass
+
+
+conversation_store = ConversationStore()
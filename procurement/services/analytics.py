@@ -0,0 +1,410 @@
+"""
+Deterministic analytics tools for the AI analyst.
+The analyst's suggestion chips (price variance, distributor comparison, spend
+impact, trends, negotiation targets, data quality) are answered with exact SQL
+over records, historical_archive and price_rollup_monthly instead of an LLM
+round trip. match_tool maps a chip question to a tool; anything else goes to
+the LLM. Each tool is scoped to the records the question was asked with (all
+active records when none are given) and returns a ToolResult with a
+plain-text summary and the underlying numbers.
+"""
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Callable
+
+from procurement.services.analyst_cache import normalize_query
+from procurement.services.database import get_db_connection
+
+# Current records priced this far above their historical average are negotiation targets
+NEGOTIATION_THRESHOLD_PCT = 5.0
+
+
+@dataclass
+class ToolResult:
+    tool: str
+    summary: str
+    data: dict = field(default_factory=dict)
+
+
+def _fmt(value: float) -> str:
+    return f"{value:,.2f}"
+
+
+def _price(value) -> "float | None":
+    try:
+        return float(value) if value is not None and value != '' else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _sku_filter(records: "list[dict] | None", column: str = 'sku') -> tuple[str, list]:
+    """SQL condition (with a leading AND) limiting column to the SKUs of records; empty for no scope."""
+    if records is None:
+        return '', []
+    skus = sorted({r['sku'] for r in records if r.get('sku')})
+    if not skus:
+        return ' AND 0', []
+    return f" AND {column} IN ({', '.join('?' * len(skus))})", skus
+
+
+def price_variance_by_sku(limit: int = 10, records: list[dict] = None) -> ToolResult:
+    """SKUs with the highest historical unit price variation (coefficient of variation)."""
+    scope, params = _sku_filter(records)
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute(
+            f"""SELECT sku, quote_currency, COUNT(*) as n,
+                      AVG(unit_price) as avg_price, MIN(unit_price) as min_price, MAX(unit_price) as max_price,
+                      AVG(unit_price * unit_price) - AVG(unit_price) * AVG(unit_price) as variance
+               FROM historical_archive
+               WHERE sku IS NOT NULL AND sku != '' AND unit_price IS NOT NULL{scope}
+               GROUP BY sku, quote_currency
+               HAVING n >= 2 AND avg_price > 0""",
+            params,
+        )
+        rows = []
+        for r in cursor.fetchall():
+            std = max(r['variance'], 0) ** 0.5
+            rows.append({
+                'sku': r['sku'], 'currency': r['quote_currency'], 'records': r['n'],
+                'avg_price': round(r['avg_price'], 2), 'min_price': round(r['min_price'], 2),
+                'max_price': round(r['max_price'], 2), 'std_dev': round(std, 2),
+                'cv_pct': round(std / r['avg_price'] * 100, 1),
+            })
+    finally:
+        conn.close()
+
+    rows.sort(key=lambda r: r['cv_pct'], reverse=True)
+    rows = rows[:limit]
+    if not rows:
+        return ToolResult('price_variance', "There is not enough historical pricing to measure variance.")
+    lines = [f"SKUs with the highest price variance (coefficient of variation, {len(rows)} shown):"]
+    lines += [
+        f"- {r['sku']}: {r['cv_pct']}% (avg {_fmt(r['avg_price'])} {r['currency'] or ''}, "
+        f"range {_fmt(r['min_price'])}–{_fmt(r['max_price'])}, {r['records']} quotes)"
+        for r in rows
+    ]
+    return ToolResult('price_variance', '\n'.join(lines), {'skus': rows})
+
+
+def distributor_price_comparison(sku: str = None, limit: int = 10, records: list[dict] = None) -> ToolResult:
+    """Average unit price per distributor for SKUs quoted by more than one distributor.
+
+    Prices come from the archive plus records (active records when records is None).
+    """
+    scope, params = _sku_filter(records)
+    current = "UNION ALL SELECT sku, distributor, quote_currency, unit_price FROM records WHERE is_current = 1"
+    conn = get_db_connection()
+    try:
+        sql = f"""
+            SELECT sku, distributor, quote_currency, SUM(unit_price) as price_sum, COUNT(*) as n
+            FROM (
+                SELECT sku, distributor, quote_currency, unit_price FROM historical_archive
+                {current if records is None else ''}
+            )
+            WHERE sku IS NOT NULL AND sku != '' AND distributor IS NOT NULL AND distributor != ''
+              AND unit_price IS NOT NULL{scope}
+        """
+        if sku:
+            sql += " AND sku = ?"
+            params.append(sku)
+        sql += " GROUP BY sku, distributor, quote_currency"
+        totals = {(r['sku'], r['quote_currency'], r['distributor']): [r['price_sum'], r['n']]
+                  for r in conn.execute(sql, params).fetchall()}
+    finally:
+        conn.close()
+
+    for r in records or []:
+        price = _price(r.get('unit_price'))
+        if r.get('sku') and r.get('distributor') and price is not None and (not sku or r['sku'] == sku):
+            total = totals.setdefault((r['sku'], r.get('quote_currency'), r['distributor']), [0.0, 0])
+            total[0] += price
+            total[1] += 1
+
+    by_sku: dict[tuple, list[dict]] = {}
+    for (s, ccy, distributor), (price_sum, n) in totals.items():
+        by_sku.setdefault((s, ccy), []).append({
+            'distributor': distributor, 'avg_price': round(price_sum / n, 2), 'records': n,
+        })
+
+    comparisons = []
+    for (s, ccy), dists in by_sku.items():
+        if len(dists) < 2:
+            continue
+        dists.sort(key=lambda d: d['avg_price'])
+        cheapest, dearest = dists[0]['avg_price'], dists[-1]['avg_price']
+        spread = round((dearest - cheapest) / cheapest * 100, 1) if cheapest else 0.0
+        comparisons.append({'sku': s, 'currency': ccy, 'spread_pct': spread, 'distributors': dists})
+    comparisons.sort(key=lambda c: c['spread_pct'], reverse=True)
+    comparisons = comparisons[:limit]
+
+    if not comparisons:
+        target = f" for {sku}" if sku else ''
+        return ToolResult('distributor_comparison', f"No SKU{target} has been quoted by more than one distributor.")
+    lines = ["Price spread across distributors (cheapest first):"]
+    for c in comparisons:
+        quotes = ', '.join(f"{d['distributor']} {_fmt(d['avg_price'])}" for d in c['distributors'])
+        lines.append(f"- {c['sku']} ({c['currency'] or ''}, spread {c['spread_pct']}%): {quotes}")
+    return ToolResult('distributor_comparison', '\n'.join(lines), {'skus': comparisons})
+
+
+def _current_vs_history(records: list[dict] = None) -> list[dict]:
+    """Records (active records when None) joined with the historical average price of their SKU and currency."""
+    if records is not None:
+        return _records_vs_history(records)
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute(
+            """SELECT r.id, r.sku, r.quote_currency, r.quantity, r.unit_price, h.avg_price, h.n
+               FROM records r
+               JOIN (
+                   SELECT sku, quote_currency, AVG(unit_price) as avg_price, COUNT(*) as n
+                   FROM historical_archive
+                   WHERE unit_price IS NOT NULL
+                   GROUP BY sku, quote_currency
+               ) h ON h.sku = r.sku AND COALESCE(h.quote_currency, '') = COALESCE(r.quote_currency, '')
+               WHERE r.is_current = 1 AND r.unit_price IS NOT NULL AND h.avg_price > 0""",
+        )
+        return [dict(row) for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+
+def _records_vs_history(records: list[dict]) -> list[dict]:
+    scope, params = _sku_filter(records)
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute(
+            f"""SELECT sku, quote_currency, AVG(unit_price) as avg_price, COUNT(*) as n
+                FROM historical_archive
+                WHERE unit_price IS NOT NULL{scope}
+                GROUP BY sku, quote_currency""",
+            params,
+        )
+        history = {(r['sku'], r['quote_currency'] or ''): r for r in cursor.fetchall()}
+    finally:
+        conn.close()
+
+    rows = []
+    for r in records:
+        price, hist = _price(r.get('unit_price')), history.get((r.get('sku'), r.get('quote_currency') or ''))
+        if price is not None and hist is not None and hist['avg_price'] > 0:
+            rows.append({'id': r.get('id'), 'sku': r['sku'], 'quote_currency': r.get('quote_currency'),
+                         'quantity': _price(r.get('quantity')), 'unit_price': price,
+                         'avg_price': hist['avg_price'], 'n': hist['n']})
+    return rows
+
+
+def total_spend_impact(limit: int = 5, records: list[dict] = None) -> ToolResult:
+    """Difference between quoted spend and the same quantities at historical average prices."""
+    rows = _current_vs_history(records)
+    if not rows:
+        return ToolResult('spend_impact', "No records in scope have historical prices to compare against.")
+
+    by_ccy: dict[str, dict] = {}
+    for r in rows:
+        qty = r['quantity'] or 1
+        impact = (r['unit_price'] - r['avg_price']) * qty
+        agg = by_ccy.setdefault(r['quote_currency'] or '', {'current': 0.0, 'historical': 0.0, 'items': []})
+        agg['current'] += r['unit_price'] * qty
+        agg['historical'] += r['avg_price'] * qty
+        agg['items'].append({'id': r['id'], 'sku': r['sku'], 'impact': round(impact, 2)})
+
+    lines = ["Spend impact of current quotes versus historical average prices:"]
+    data = {}
+    for ccy, agg in sorted(by_ccy.items()):
+        delta = agg['current'] - agg['historical']
+        pct = delta / agg['historical'] * 100 if agg['historical'] else 0.0
+        top = sorted(agg['items'], key=lambda i: abs(i['impact']), reverse=True)[:limit]
+        data[ccy] = {'current': round(agg['current'], 2), 'historical': round(agg['historical'], 2),
+                     'impact': round(delta, 2), 'impact_pct': round(pct, 1), 'top_items': top}
+        direction = 'over' if delta >= 0 else 'under'
+        lines.append(f"- {ccy or 'n/a'}: {_fmt(agg['current'])} quoted vs {_fmt(agg['historical'])} "
+                     f"at historical prices, {_fmt(abs(delta))} ({abs(pct):.1f}%) {direction}")
+        lines += [f"  - {i['sku']}: {'+' if i['impact'] >= 0 else '-'}{_fmt(abs(i['impact']))}" for i in top]
+    return ToolResult('spend_impact', '\n'.join(lines), {'currencies': data})
+
+
+def negotiation_candidates(
+    threshold_pct: float = NEGOTIATION_THRESHOLD_PCT, limit: int = 10, records: list[dict] = None,
+) -> ToolResult:
+    """Records (active records when None) priced above their historical average by more than threshold_pct."""
+    candidates = []
+    for r in _current_vs_history(records):
+        premium = (r['unit_price'] - r['avg_price']) / r['avg_price'] * 100
+        if premium > threshold_pct:
+            qty = r['quantity'] or 1
+            candidates.append({
+                'id': r['id'], 'sku': r['sku'], 'currency': r['quote_currency'],
+                'unit_price': r['unit_price'], 'historical_avg': round(r['avg_price'], 2),
+                'premium_pct': round(premium, 1),
+                'potential_saving': round((r['unit_price'] - r['avg_price']) * qty, 2),
+            })
+    candidates.sort(key=lambda c: c['potential_saving'], reverse=True)
+    candidates = candidates[:limit]
+
+    if not candidates:
+        return ToolResult('negotiation', f"No quoted item is more than {threshold_pct:g}% above its historical average.")
+    lines = [f"Items priced more than {threshold_pct:g}% above their historical average:"]
+    lines += [
+        f"- {c['sku']}: {_fmt(c['unit_price'])} vs avg {_fmt(c['historical_avg'])} {c['currency'] or ''} "
+        f"(+{c['premium_pct']}%, potential saving {_fmt(c['potential_saving'])})"
+        for c in candidates
+    ]
+    return ToolResult('negotiation', '\n'.join(lines), {'items': candidates})
+
+
+def _monthly_rollup(conn, records: list[dict] = None, sku: str = None) -> list:
+    """(sku, month, price_sum, price_count) per SKU and month from price_rollup_monthly."""
+    scope, params = _sku_filter(records)
+    if sku:
+        scope += " AND sku = ?"
+        params.append(sku)
+    return conn.execute(
+        f"""SELECT sku, month, SUM(price_sum) as price_sum, SUM(price_count) as price_count
+            FROM price_rollup_monthly
+            WHERE sku != '' AND month != '' AND price_count > 0{scope}
+            GROUP BY sku, month
+            ORDER BY sku, month""",
+        params,
+    ).fetchall()
+
+
+def price_trend(sku: str = None, months: int = 12, records: list[dict] = None) -> ToolResult:
+    """Monthly average unit price (one SKU, or an index across SKUs) and the change over the period."""
+    conn = get_db_connection()
+    try:
+        rows = _monthly_rollup(conn, records, sku)
+    finally:
+        conn.close()
+
+    if sku:
+        monthly = {r['month']: r['price_sum'] / r['price_count'] for r in rows}
+    else:
+        # Price index: each record relative to its SKU's overall average, averaged per month
+        sku_totals: dict[str, list] = {}
+        for r in rows:
+            total = sku_totals.setdefault(r['sku'], [0.0, 0])
+            total[0] += r['price_sum']
+            total[1] += r['price_count']
+        index: dict[str, list] = {}
+        for r in rows:
+            price_sum, price_count = sku_totals[r['sku']]
+            if price_sum > 0:
+                acc = index.setdefault(r['month'], [0.0, 0])
+                acc[0] += r['price_sum'] / (price_sum / price_count)
+                acc[1] += r['price_count']
+        monthly = {month: ratio_sum / n * 100 for month, (ratio_sum, n) in index.items()}
+    points = [{'month': month, 'value': round(value, 2)} for month, value in sorted(monthly.items())][-months:]
+
+    subject = sku or f"{'all' if records is None else 'the quoted'} SKUs (price index, 100 = SKU average)"
+    if len(points) < 2:
+        return ToolResult('price_trend', f"Not enough monthly history to show a trend for {subject}.", {'points': points})
+    first, last = points[0]['value'], points[-1]['value']
+    change = (last - first) / first * 100 if first else 0.0
+    direction = 'up' if change > 0 else 'down' if change < 0 else 'flat'
+    summary = (f"Price trend for {subject}, {points[0]['month']} to {points[-1]['month']}: "
+               f"{_fmt(first)} → {_fmt(last)} ({direction} {abs(change):.1f}%).")
+    return ToolResult('price_trend', summary, {'sku': sku, 'change_pct': round(change, 1), 'points': points})
+
+
+def price_changes_by_sku(limit: int = 10, records: list[dict] = None) -> ToolResult:
+    """SKUs whose average unit price rose the most between their first and latest month of history."""
+    conn = get_db_connection()
+    try:
+        rows = _monthly_rollup(conn, records)
+    finally:
+        conn.close()
+    series: dict[str, list] = {}
+    for r in rows:
+        series.setdefault(r['sku'], []).append((r['month'], r['price_sum'] / r['price_count']))
+
+    changes = []
+    for s, pts in series.items():
+        if len(pts) < 2 or not pts[0][1]:
+            continue
+        (m0, p0), (m1, p1) = pts[0], pts[-1]
+        changes.append({'sku': s, 'from_month': m0, 'to_month': m1,
+                        'from_price': round(p0, 2), 'to_price': round(p1, 2),
+                        'change_pct': round((p1 - p0) / p0 * 100, 1)})
+    changes.sort(key=lambda c: c['change_pct'], reverse=True)
+    changes = changes[:limit]
+
+    if not changes:
+        return ToolResult('price_changes', "Not enough monthly history to compare SKU prices over time.")
+    lines = ["SKUs with the largest price increases (first vs latest month):"]
+    lines += [
+        f"- {c['sku']}: {_fmt(c['from_price'])} → {_fmt(c['to_price'])} "
+        f"({c['change_pct']:+.1f}%, {c['from_month']} to {c['to_month']})"
+        for c in changes
+    ]
+    return ToolResult('price_changes', '\n'.join(lines), {'skus': changes})
+
+
+def validation_issue_summary(limit: int = 5, records: list[dict] = None) -> ToolResult:
+    """Validation status counts and the most common messages (active records when records is None)."""
+    if records is not None:
+        counts = dict(Counter(r.get('validation_status') for r in records))
+        issues = Counter(r['validation_message'] for r in records
+                         if r.get('validation_status') in ('error', 'warning') and r.get('validation_message'))
+        messages = [{'message': m, 'n': n} for m, n in issues.most_common(limit)]
+    else:
+        conn = get_db_connection()
+        try:
+            counts = {r['validation_status']: r['n'] for r in conn.execute(
+                "SELECT validation_status, COUNT(*) as n FROM records WHERE is_current = 1 GROUP BY validation_status"
+            ).fetchall()}
+            cursor = conn.execute(
+                """SELECT validation_message as message, COUNT(*) as n FROM records
+                   WHERE is_current = 1 AND validation_status IN ('error', 'warning')
+                     AND validation_message IS NOT NULL AND validation_message != ''
+                   GROUP BY validation_message ORDER BY n DESC LIMIT ?""",
+                (limit,),
+            )
+            messages = [dict(r) for r in cursor.fetchall()]
+        finally:
+            conn.close()
+
+    subject = 'Active records' if records is None else 'Records'
+    lines = [f"{subject}: {counts.get('valid', 0)} valid, {counts.get('warning', 0)} warnings, "
+             f"{counts.get('error', 0)} errors."]
+    if messages:
+        lines.append("Most common issues:")
+        lines += [f"- {m['message']} ({m['n']})" for m in messages]
+    return ToolResult('validation_issues', '\n'.join(lines), {'status_counts': counts, 'top_messages': messages})
+
+
+# Suggestion chips (llm_service._generate_suggestions) answered by a tool. Matching is on the
+# whole normalized question: open-ended questions that merely mention a topic go to the LLM.
+_CHIP_TOOLS: dict[str, Callable[..., ToolResult]] = {
+    normalize_query(question): tool for question, tool in [
+        ("Which SKUs have the highest price variance?", price_variance_by_sku),
+        ("Show price stability analysis", price_variance_by_sku),
+        ("Compare prices across distributors", distributor_price_comparison),
+        ("What's the total spend impact?", total_spend_impact),
+        ("Which items should I negotiate on?", negotiation_candidates),
+        ("Which items have increased in price the most?", price_changes_by_sku),
+        ("What's the overall price trend over the past year?", price_trend),
+        ("Summarize pricing trends for top SKUs", price_trend),
+        ("What are the most common validation errors?", validation_issue_summary),
+        ("Which records need immediate attention?", validation_issue_summary),
+        ("Summarize data quality issues", validation_issue_summary),
+    ]
+}
+
+
+def match_tool(question: str, records: list[dict] = None) -> "Callable[[], ToolResult] | None":
+    """Return a zero-argument callable answering a suggestion chip question, or None if no tool applies.
+
+    The tool is scoped to records when given, and to all active records otherwise.
+    """
+    tool = _CHIP_TOOLS.get(normalize_query(question.replace('\u2019', "'")))
+    if tool is None:
+        return None
+    return lambda: tool(records=records)
+
+
+def answer_with_tools(question: str, records: list[dict] = None) -> "ToolResult | None":
+    """Answer a suggestion chip question deterministically, or None to fall back to the LLM."""
+    tool = match_tool(question, records)
+    return tool() if tool else None
@@ -0,0 +1,245 @@
+"""
+Pool of temporary H2OGPTE collections for extraction and verification.
+Collections are pre-created and reused: a released collection has its
+documents cleared in the background and goes back to the idle list, so a
+document costs no create/delete round trips on the request path.
+
+Several processes (workers, replicas) share one H2OGPTE account, so every
+pooled collection carries its owner and a lease in its description; the owner
+renews the leases of its collections in the background. At startup only pooled
+collections whose lease has expired, and per-request collections of earlier
+versions (extraction_* / verify_*), are reaped.
+"""
+import os
+import re
+import secrets
+import socket
+import threading
+import time
+from collections import deque
+
+from procurement.config.settings import COLLECTION_POOL_LEASE_SECONDS, COLLECTION_POOL_SIZE, COLLECTION_POOL_WARM
+from procurement.services.llm_service import get_h2ogpte_client
+
+POOL_PREFIX = 'docpool_'
+# Name prefixes of per-request temporary collections created by earlier versions
+TEMPORARY_PREFIXES = ('extraction_', 'verify_')
+
+_LEASE_RE = re.compile(r'\blease_until=(\d+)')
+
+_PAGE_SIZE = 100
+
+
+class CollectionPool:
+    """Thread-safe pool of reusable temporary collections."""
+
+    def __init__(self, max_idle: int = COLLECTION_POOL_SIZE, warm: int = COLLECTION_POOL_WARM,
+                 lease_seconds: int = COLLECTION_POOL_LEASE_SECONDS):
+        self.max_idle = max_idle
+        self.warm = warm
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}-{os.getpid()}-{secrets.token_hex(2)}"
+        self._lock = threading.Lock()
+        self._idle: deque[str] = deque()
+        self._in_use: set[str] = set()
+        self._cleaning: set[str] = set()
+        self._names: dict[str, str] = {}
+        self._renewer = None
+        self.stats = {'created': 0, 'reused': 0, 'recycled': 0, 'discarded': 0, 'reaped': 0}
+
+    def _description(self) -> str:
+        lease_until = int(time.time() + self.lease_seconds)
+        return f"Pooled temporary collection for document extraction; owner={self.owner}; lease_until={lease_until}"
+
+    def _create(self, client) -> str:
+        name = f"{POOL_PREFIX}{secrets.token_hex(4)}"
+        collection_id = client.create_collection(name=name, description=self._description())
+        with self._lock:
+            self._names[collection_id] = name
+            self.stats['created'] += 1
+        self._ensure_renewer()
+        return collection_id
+
+    def renew_leases(self, client=None) -> int:
+        """Extend the lease of every collection this pool owns."""
+        with self._lock:
+            owned = [(cid, name) for cid, name in self._names.items()]
+        if not owned:
+            return 0
+        client = client or get_h2ogpte_client()
+        description = self._description()
+        renewed = 0
+        for collection_id, name in owned:
+            try:
+                client.update_collection(collection_id, name, description)
+                renewed += 1
+            except Exception:
+                pass  # retried on the next round, well before the lease runs out
+        return renewed
+
+    def _ensure_renewer(self):
+        """Start the background lease renewal once per pool."""
+        with self._lock:
+            if self._renewer is not None and self._renewer.is_alive():
+                return
+
+            def _loop():
+                while True:
+                    time.sleep(max(1, self.lease_seconds // 3))
+                    try:
+                        self.renew_leases()
+                    except Exception:
+                        pass
+
+            self._renewer = threading.Thread(target=_loop, name='collection-pool-lease', daemon=True)
+            self._renewer.start()
+
+    def acquire(self, client=None) -> str:
+        """Return an empty collection, reusing an idle one when available."""
+        with self._lock:
+            if self._idle:
+                collection_id = self._idle.popleft()
+                self._in_use.add(collection_id)
+                self.stats['reused'] += 1
+                return collection_id
+
+        collection_id = self._create(client or get_h2ogpte_client())
+        with self._lock:
+            self._in_use.add(collection_id)
+        return collection_id
+
+    def release(self, collection_id: str, client=None, wait: bool = False):
+        """Hand a collection back; its documents are cleared before reuse."""
+        if not collection_id:
+            return
+        with self._lock:
+            self._in_use.discard(collection_id)
+            self._cleaning.add(collection_id)
+
+        client = client or get_h2ogpte_client()
+        if wait:
+            self._recycle(client, collection_id)
+        else:
+            threading.Thread(target=self._recycle, args=(client, collection_id),
+                             name='collection-pool-recycle', daemon=True).start()
+
+    def _recycle(self, client, collection_id: str):
+        keep = False
+        try:
+            with self._lock:
+                keep = len(self._idle) < self.max_idle
+            if keep:
+                _clear_documents(client, collection_id)
+        except Exception:
+            keep = False
+
+        with self._lock:
+            self._cleaning.discard(collection_id)
+            if keep and len(self._idle) < self.max_idle:
+                self._idle.append(collection_id)
+                self.stats['recycled'] += 1
+                return
+            self.stats['discarded'] += 1
+            self._names.pop(collection_id, None)
+        _delete_collections(client, [collection_id])
+
+    def reap_leaked(self, client=None) -> int:
+        """Delete temporary collections left over from crashed processes.
+
+        Pooled collections of other processes are only deleted once their lease
+        has expired, i.e. their owner stopped renewing it.
+        """
+        client = client or get_h2ogpte_client()
+        with self._lock:
+            owned = set(self._names)
+
+        now = time.time()
+        leaked = []
+        offset = 0
+        while True:
+            page = client.list_recent_collections(offset, _PAGE_SIZE)
+            for coll in page:
+                if coll.id in owned:
+                    continue
+                if coll.name.startswith(TEMPORARY_PREFIXES):
+                    leaked.append(coll.id)
+                elif coll.name.startswith(POOL_PREFIX):
+                    lease = _LEASE_RE.search(coll.description or '')
+                    if lease is None or int(lease.group(1)) <= now:
+                        leaked.append(coll.id)
+            if len(page) < _PAGE_SIZE:
+                break
+            offset += _PAGE_SIZE
+
+        if leaked:
+            _delete_collections(client, leaked)
+            with self._lock:
+                self.stats['reaped'] += len(leaked)
+        return len(leaked)
+
+    def fill(self, client=None, count: int = None):
+        """Pre-create collections until `count` (default: warm size) are idle."""
+        client = client or get_h2ogpte_client()
+        target = min(self.max_idle, self.warm if count is None else count)
+        while True:
+            with self._lock:
+                if len(self._idle) >= target:
+                    return
+            collection_id = self._create(client)
+            with self._lock:
+                self._idle.append(collection_id)
+
+    def start(self):
+        """Reap leaked collections and warm the pool in the background."""
+        def _run():
+            try:
+                client = get_h2ogpte_client()
+                self.reap_leaked(client)
+                self.fill(client)
+            except Exception:
+                pass  # H2OGPTE unavailable; the pool fills on demand
+
+        threading.Thread(target=_run, name='collection-pool-start', daemon=True).start()
+
+    def drain(self, client=None):
+        """Delete all idle collections (shutdown)."""
+        with self._lock:
+            idle = list(self._idle)
+            self._idle.clear()
+            for collection_id in idle:
+                self._names.pop(collection_id, None)
+        if idle:
+            try:
+                _delete_collections(client or get_h2ogpte_client(), idle)
+            except Exception:
+                pass
+
+    def usage(self) -> dict:
+        with self._lock:
+            return {
+                'idle': len(self._idle),
+                'in_use': len(self._in_use),
+                'cleaning': len(self._cleaning),
+                'max_idle': self.max_idle,
+                **self.stats,
+            }
+
+
+def _clear_documents(client, collection_id: str):
+    while True:
+        docs = client.list_documents_in_collection(collection_id, 0, _PAGE_SIZE)
+        if not docs:
+            return
+        client.delete_documents_from_collection(collection_id, [d.id for d in docs])
+        if len(docs) < _PAGE_SIZE:
+            return
+
+
+def _delete_collections(client, collection_ids: list[str]):
+    try:
+        client.delete_collections(collection_ids)
+    except Exception:
+        pass
+
+
+collection_pool = CollectionPool()
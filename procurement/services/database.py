@@ -4,10 +4,12 @@ Handles all CRUD, historical archiving, search, and dashboard metrics.
 """
 import random
 import sqlite3
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta, timezone
 from pathlib import Path
 from typing import Optional
-from procurement.config.settings import DATABASE_PATH
+from procurement.config.settings import CHANGE_FEED_RETENTION_DAYS, DATABASE_PATH
+from procurement.services.price_sketch import TDigest
+from procurement.services.validation import line_fingerprint, parse_date
 
 ALLOWED_UPDATE_COLUMNS = {
     'sku', 'distributor', 'item_description', 'brand', 'quote_currency',
@@ -24,6 +26,182 @@ _RECORD_COLUMNS = [
 ]
 
 
+# Free-form date columns and their normalized epoch-day (days since 1970-01-01)
+# INTEGER shadow columns, filled on write by _date_days() and used for range filters.
+_DATE_DAY_COLUMNS = {
+    'start_date': 'start_day',
+    'end_date': 'end_day',
+    'quotation_date': 'quotation_day',
+    'quotation_end_date': 'quotation_end_day',
+}
+_ARCHIVE_DATE_DAY_COLUMNS = {**_DATE_DAY_COLUMNS, 'archived_at': 'archived_day'}
+_EPOCH = date(1970, 1, 1)
+
+
+def to_epoch_day(value) -> "int | None":
+    """Days since 1970-01-01 for a date string in any format parse_date accepts."""
+    if isinstance(value, datetime):
+        value = value.date()
+    if not isinstance(value, date):
+        value = parse_date(value)
+        if value is None:
+            return None
+        value = value.date()
+    return (value - _EPOCH).days
+
+
+def _date_days(data: dict, columns: dict = _DATE_DAY_COLUMNS) -> dict:
+    """Shadow epoch-day values for the date fields present in data."""
+    return {day_col: to_epoch_day(data[col]) for col, day_col in columns.items() if col in data}
+
+
+def _utc_timestamp() -> str:
+    """Current UTC time in SQLite CURRENT_TIMESTAMP format."""
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+# Monthly per-(sku, eu_company, distributor) price rollup over historical_archive.
+# NULL keys are stored as '' so groups can be upserted; quantity figures cover
+# priced rows only, matching the per-SKU summaries built from them.
+_ROLLUP_COLUMNS = (
+    "sku, eu_company, distributor, month, record_count, price_count, "
+    "price_sum, price_sumsq, price_min, price_max, qty_count, qty_sum"
+)
+_ROLLUP_SELECT = """
+    SELECT IFNULL(sku, ''), IFNULL(eu_company, ''), IFNULL(distributor, ''),
+           IFNULL(strftime('%Y-%m', archived_at), ''),
+           COUNT(*), COUNT(unit_price), TOTAL(unit_price), TOTAL(unit_price * unit_price),
+           MIN(unit_price), MAX(unit_price),
+           COUNT(CASE WHEN unit_price IS NOT NULL THEN quantity END),
+           TOTAL(CASE WHEN unit_price IS NOT NULL THEN quantity END)
+    FROM historical_archive
+"""
+_ROLLUP_GROUP_BY = " GROUP BY 1, 2, 3, 4"
+
+
+def _rollup_refresh_sql(ref: str) -> str:
+    """Trigger statements recomputing the rollup group of the OLD or NEW archive row."""
+    match = (
+        f"IFNULL(sku, '') = IFNULL({ref}.sku, '') AND IFNULL(eu_company, '') = IFNULL({ref}.eu_company, '') "
+        f"AND IFNULL(distributor, '') = IFNULL({ref}.distributor, '') "
+        f"AND IFNULL(strftime('%Y-%m', archived_at), '') = IFNULL(strftime('%Y-%m', {ref}.archived_at), '')"
+    )
+    return (
+        f"DELETE FROM price_rollup_monthly WHERE sku = IFNULL({ref}.sku, '') "
+        f"AND eu_company = IFNULL({ref}.eu_company, '') AND distributor = IFNULL({ref}.distributor, '') "
+        f"AND month = IFNULL(strftime('%Y-%m', {ref}.archived_at), '');\n"
+        f"INSERT INTO price_rollup_monthly ({_ROLLUP_COLUMNS}) {_ROLLUP_SELECT} WHERE {match}{_ROLLUP_GROUP_BY};"
+    )
+
+
+# Tables published in change_feed. Rows of records are split by is_current:
+# approved rows are reported as 'records' (soft deletion as a 'delete') and
+# draft rows as 'drafts'.
+CHANGE_FEED_TABLES = ('records', 'drafts', 'historical_archive', 'catalog', 'uploaded_files',
+                      'record_comments', 'reference_documents')
+
+_RECORDS_FEED_TRIGGERS = (
+    # (name, event, condition, feed table, row reference, op)
+    ('ins', 'INSERT', 'NEW.is_current = 1', 'records', 'NEW', 'insert'),
+    ('upd', 'UPDATE', 'OLD.is_current = 1 AND NEW.is_current = 1', 'records', 'NEW', 'update'),
+    ('softdel', 'UPDATE', 'OLD.is_current = 1 AND NEW.is_current = 0', 'records', 'NEW', 'delete'),
+    ('promote', 'UPDATE', 'OLD.is_current = 0 AND NEW.is_current = 1', 'records', 'NEW', 'insert'),
+    ('del', 'DELETE', 'OLD.is_current = 1', 'records', 'OLD', 'delete'),
+    ('draft_ins', 'INSERT', 'NEW.is_current = 0', 'drafts', 'NEW', 'insert'),
+    ('draft_upd', 'UPDATE', 'OLD.is_current = 0 AND NEW.is_current = 0', 'drafts', 'NEW', 'update'),
+    ('draft_del', 'DELETE', 'OLD.is_current = 0', 'drafts', 'OLD', 'delete'),
+)
+
+
+def _change_feed_trigger_sql() -> str:
+    """Triggers appending every row change of the CHANGE_FEED_TABLES to change_feed."""
+    triggers = [
+        (f"records_{name}", event, condition, 'records', table, ref, op)
+        for name, event, condition, table, ref, op in _RECORDS_FEED_TRIGGERS
+    ]
+    for table in CHANGE_FEED_TABLES[2:]:
+        for event, ref in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD')):
+            triggers.append((f"{table}_{event.lower()}", event, None, table, table, ref, event.lower()))
+    return '\n'.join(
+        f"CREATE TRIGGER IF NOT EXISTS trg_feed_{name} AFTER {event} ON {source}"
+        + (f" WHEN {condition}" if condition else '')
+        + f"\n    BEGIN INSERT INTO change_feed (table_name, row_id, op) VALUES ('{table}', {ref}.id, '{op}'); END;"
+        for name, event, condition, source, table, ref, op in triggers
+    )
+
+
+# Field-level validation of drafts, stored compactly: field_status packs 3 bits
+# per field in _RECORD_COLUMNS order (a 2-bit status code, 0 = no entry, plus
+# the acknowledged flag); field_notes lists "field:message:suggestion" ids into
+# the interned validation_text table (0 = empty) for fields that have text.
+_FIELD_STATUS_CODES = {'valid': 1, 'warning': 2, 'error': 3}
+_FIELD_STATUS_NAMES = {code: name for name, code in _FIELD_STATUS_CODES.items()}
+_FIELD_ACKNOWLEDGED = 4
+
+
+def _field_validation_texts(records: list[dict]) -> set[str]:
+    texts = set()
+    for record in records:
+        for entry in (record.get('field_validation') or {}).values():
+            if isinstance(entry, dict):
+                texts.add(str(entry.get('message') or ''))
+                texts.add(str(entry.get('suggestion') or ''))
+    texts.discard('')
+    return texts
+
+
+def _intern_texts(conn, texts: set[str]) -> dict[str, int]:
+    """IDs of the given texts in validation_text, adding the missing ones."""
+    texts = list(texts)
+    conn.executemany("INSERT OR IGNORE INTO validation_text (text) VALUES (?)", [(t,) for t in texts])
+    ids = {}
+    for start in range(0, len(texts), 500):
+        chunk = texts[start:start + 500]
+        placeholders = ', '.join(['?'] * len(chunk))
+        for row in conn.execute(f"SELECT id, text FROM validation_text WHERE text IN ({placeholders})", chunk):
+            ids[row['text']] = row['id']
+    return ids
+
+
+def _encode_field_validation(field_validation, text_ids: dict[str, int]) -> tuple:
+    """(field_status, field_notes) for a field_validation map; (None, None) when there is none."""
+    if not isinstance(field_validation, dict) or not field_validation:
+        return None, None
+    bits = 0
+    notes = []
+    for i, name in enumerate(_RECORD_COLUMNS):
+        entry = field_validation.get(name)
+        if not isinstance(entry, dict):
+            continue
+        code = _FIELD_STATUS_CODES.get(entry.get('status'), _FIELD_STATUS_CODES['valid'])
+        if entry.get('acknowledged'):
+            code |= _FIELD_ACKNOWLEDGED
+        bits |= code << (3 * i)
+        message_id = text_ids.get(str(entry.get('message') or ''), 0)
+        suggestion_id = text_ids.get(str(entry.get('suggestion') or ''), 0)
+        if message_id or suggestion_id:
+            notes.append(f"{i}:{message_id}:{suggestion_id}")
+    return bits, ';'.join(notes) or None
+
+
+def _decode_field_validation(bits: int, notes: "str | None", texts: dict[int, str]) -> dict:
+    text = {}
+    for note in (notes or '').split(';') if notes else []:
+        i, message_id, suggestion_id = (int(part) for part in note.split(':'))
+        text[i] = (texts.get(message_id, ''), texts.get(suggestion_id, ''))
+    field_validation = {}
+    for i, name in enumerate(_RECORD_COLUMNS):
+        code = (bits >> (3 * i)) & 7
+        if not code & 3:
+            continue
+        message, suggestion = text.get(i, ('', ''))
+        entry = {'status': _FIELD_STATUS_NAMES[code & 3], 'message': message, 'suggestion': suggestion}
+        if code & _FIELD_ACKNOWLEDGED:
+            entry['acknowledged'] = True
+        field_validation[name] = entry
+    return field_validation
+
+
 def get_db_connection():
     """Return a connection to the SQLite database."""
     path = Path(DATABASE_PATH)
@@ -38,7 +216,7 @@ def init_db():
     """Create all required tables if they don't exist."""
     conn = get_db_connection()
     try:
-        conn.executescript("""
+        conn.executescript(f"""
             CREATE TABLE IF NOT EXISTS records (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 sku TEXT,
@@ -95,6 +273,8 @@ def init_db():
             CREATE INDEX IF NOT EXISTS idx_hist_distributor ON historical_archive(distributor);
             CREATE INDEX IF NOT EXISTS idx_hist_eu_company ON historical_archive(eu_company);
             CREATE INDEX IF NOT EXISTS idx_hist_archived_at ON historical_archive(archived_at);
+            CREATE INDEX IF NOT EXISTS idx_hist_sku_ccy_price ON historical_archive(sku, quote_currency, unit_price);
+            CREATE INDEX IF NOT EXISTS idx_records_current_sku ON records(is_current, sku);
 
             CREATE TABLE IF NOT EXISTS uploaded_files (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -164,8 +344,445 @@ def init_db():
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             );
             CREATE INDEX IF NOT EXISTS idx_pdf_cache_sku ON catalog_pdf_cache(sku);
+
+            -- Write counters bumped by triggers; see get_data_version()
+            CREATE TABLE IF NOT EXISTS data_version (
+                name TEXT PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0
+            );
+            INSERT OR IGNORE INTO data_version (name) VALUES ('records'), ('historical_archive'), ('catalog');
+
+            CREATE TRIGGER IF NOT EXISTS trg_records_version_ins AFTER INSERT ON records
+                WHEN NEW.is_current = 1
+                BEGIN UPDATE data_version SET version = version + 1 WHERE name = 'records'; END;
+            CREATE TRIGGER IF NOT EXISTS trg_records_version_upd AFTER UPDATE ON records
+                WHEN NEW.is_current = 1 OR OLD.is_current = 1
+                BEGIN UPDATE data_version SET version = version + 1 WHERE name = 'records'; END;
+            CREATE TRIGGER IF NOT EXISTS trg_records_version_del AFTER DELETE ON records
+                WHEN OLD.is_current = 1
+                BEGIN UPDATE data_version SET version = version + 1 WHERE name = 'records'; END;
+            CREATE TRIGGER IF NOT EXISTS trg_hist_version_ins AFTER INSERT ON historical_archive
+                BEGIN UPDATE data_version SET version = version + 1 WHERE name = 'historical_archive'; END;
+            CREATE TRIGGER IF NOT EXISTS trg_hist_version_upd AFTER UPDATE ON historical_archive
+                BEGIN UPDATE data_version SET version = version + 1 WHERE name = 'historical_archive'; END;
+            CREATE TRIGGER IF NOT EXISTS trg_hist_version_del AFTER DELETE ON historical_archive
+                BEGIN UPDATE data_version SET version = version + 1 WHERE name = 'historical_archive'; END;
+            CREATE TRIGGER IF NOT EXISTS trg_catalog_version_ins AFTER INSERT ON catalog
+                BEGIN UPDATE data_version SET version = version + 1 WHERE name = 'catalog'; END;
+            CREATE TRIGGER IF NOT EXISTS trg_catalog_version_upd AFTER UPDATE ON catalog
+                BEGIN UPDATE data_version SET version = version + 1 WHERE name = 'catalog'; END;
+            CREATE TRIGGER IF NOT EXISTS trg_catalog_version_del AFTER DELETE ON catalog
+                BEGIN UPDATE data_version SET version = version + 1 WHERE name = 'catalog'; END;
+
+            -- Interned field_validation messages and suggestions of draft records
+            CREATE TABLE IF NOT EXISTS validation_text (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                text TEXT NOT NULL UNIQUE
+            );
+
+            CREATE TABLE IF NOT EXISTS price_rollup_monthly (
+                sku TEXT NOT NULL,
+                eu_company TEXT NOT NULL,
+                distributor TEXT NOT NULL,
+                month TEXT NOT NULL,
+                record_count INTEGER NOT NULL DEFAULT 0,
+                price_count INTEGER NOT NULL DEFAULT 0,
+                price_sum REAL NOT NULL DEFAULT 0,
+                price_sumsq REAL NOT NULL DEFAULT 0,
+                price_min REAL,
+                price_max REAL,
+                qty_count INTEGER NOT NULL DEFAULT 0,
+                qty_sum REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (sku, eu_company, distributor, month)
+            );
+
+            CREATE TRIGGER IF NOT EXISTS trg_hist_rollup_ins AFTER INSERT ON historical_archive
+            BEGIN
+                INSERT INTO price_rollup_monthly ({_ROLLUP_COLUMNS})
+                VALUES (
+                    IFNULL(NEW.sku, ''), IFNULL(NEW.eu_company, ''), IFNULL(NEW.distributor, ''),
+                    IFNULL(strftime('%Y-%m', NEW.archived_at), ''),
+                    1, NEW.unit_price IS NOT NULL, IFNULL(NEW.unit_price, 0),
+                    IFNULL(NEW.unit_price * NEW.unit_price, 0), NEW.unit_price, NEW.unit_price,
+                    NEW.unit_price IS NOT NULL AND NEW.quantity IS NOT NULL,
+                    CASE WHEN NEW.unit_price IS NOT NULL THEN IFNULL(NEW.quantity, 0) ELSE 0 END
+                )
+                ON CONFLICT (sku, eu_company, distributor, month) DO UPDATE SET
+                    record_count = record_count + 1,
+                    price_count = price_count + excluded.price_count,
+                    price_sum = price_sum + excluded.price_sum,
+                    price_sumsq = price_sumsq + excluded.price_sumsq,
+                    price_min = MIN(IFNULL(price_min, excluded.price_min), IFNULL(excluded.price_min, price_min)),
+                    price_max = MAX(IFNULL(price_max, excluded.price_max), IFNULL(excluded.price_max, price_max)),
+                    qty_count = qty_count + excluded.qty_count,
+                    qty_sum = qty_sum + excluded.qty_sum;
+            END;
+            -- Updates and deletes are rare (the archive is append-only in normal use): recompute the group
+            CREATE TRIGGER IF NOT EXISTS trg_hist_rollup_upd
+                AFTER UPDATE OF sku, eu_company, distributor, unit_price, quantity, archived_at ON historical_archive
+            BEGIN
+                {_rollup_refresh_sql('OLD')}
+                {_rollup_refresh_sql('NEW')}
+            END;
+            CREATE TRIGGER IF NOT EXISTS trg_hist_rollup_del AFTER DELETE ON historical_archive
+            BEGIN
+                {_rollup_refresh_sql('OLD')}
+            END;
+
+            -- Per-SKU t-digest price sketches, overall ('' dimension) and per distributor / company.
+            -- Maintained in Python (refresh_price_sketches): archive rows past last_archive_id are
+            -- folded in, SKUs whose rows were updated or deleted are marked dirty and rebuilt.
+            CREATE TABLE IF NOT EXISTS price_sketch (
+                sku TEXT NOT NULL,
+                dimension TEXT NOT NULL DEFAULT '',
+                dim_value TEXT NOT NULL DEFAULT '',
+                digest BLOB NOT NULL,
+                price_count INTEGER NOT NULL,
+                p10 REAL,
+                p50 REAL,
+                p90 REAL,
+                mad REAL,
+                PRIMARY KEY (sku, dimension, dim_value)
+            );
+            CREATE TABLE IF NOT EXISTS price_sketch_state (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                last_archive_id INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS price_sketch_dirty (sku TEXT PRIMARY KEY);
+            CREATE TRIGGER IF NOT EXISTS trg_hist_sketch_upd
+                AFTER UPDATE OF sku, distributor, eu_company, unit_price ON historical_archive
+            BEGIN
+                INSERT OR IGNORE INTO price_sketch_dirty (sku) VALUES (IFNULL(OLD.sku, '')), (IFNULL(NEW.sku, ''));
+            END;
+            CREATE TRIGGER IF NOT EXISTS trg_hist_sketch_del AFTER DELETE ON historical_archive
+            BEGIN
+                INSERT OR IGNORE INTO price_sketch_dirty (sku) VALUES (IFNULL(OLD.sku, ''));
+            END;
+
+            -- Append-only feed of row changes, written by triggers; see get_changes()
+            CREATE TABLE IF NOT EXISTS change_feed (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                table_name TEXT NOT NULL,
+                row_id INTEGER NOT NULL,
+                op TEXT NOT NULL,
+                changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            {_change_feed_trigger_sql()}
         """)
         conn.commit()
+
+        _migrate_date_days(conn)
+        _migrate_line_fingerprints(conn)
+        _migrate_draft_validation(conn)
+
+        if CHANGE_FEED_RETENTION_DAYS > 0:
+            conn.execute(
+                "DELETE FROM change_feed WHERE changed_at < datetime('now', ?)",
+                (f"-{CHANGE_FEED_RETENTION_DAYS} days",),
+            )
+            conn.commit()
+
+        # Backfill rollups for archives created before the rollup table existed
+        has_rollups = conn.execute("SELECT 1 FROM price_rollup_monthly LIMIT 1").fetchone()
+        if not has_rollups and conn.execute("SELECT 1 FROM historical_archive LIMIT 1").fetchone():
+            _rebuild_price_rollups(conn)
+
+        # Fold in archive changes whose refresh failed or that were written outside the service
+        _refresh_price_sketches_quietly(conn)
+    finally:
+        conn.close()
+
+
+def _migrate_date_days(conn):
+    """Add the epoch-day shadow columns and their indexes, backfilling rows that lack them.
+
+    The backfill runs on every start, so rows written outside the service (seed_demo.py,
+    manual imports) get their shadow values too. Dates that do not parse stay NULL.
+    """
+    for table, columns in (('records', _DATE_DAY_COLUMNS), ('historical_archive', _ARCHIVE_DATE_DAY_COLUMNS)):
+        existing = {row['name'] for row in conn.execute(f"PRAGMA table_info({table})")}
+        for day_col in columns.values():
+            if day_col not in existing:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {day_col} INTEGER")
+        missing = ' OR '.join(f"({day_col} IS NULL AND {col} IS NOT NULL)" for col, day_col in columns.items())
+        rows = conn.execute(f"SELECT id, {', '.join(columns)} FROM {table} WHERE {missing}").fetchall()
+        updates = []
+        for row in rows:
+            days = _date_days(dict(row), columns)
+            if any(v is not None for v in days.values()):
+                updates.append(list(days.values()) + [row['id']])
+        if updates:
+            set_clause = ', '.join(f"{day_col} = IFNULL({day_col}, ?)" for day_col in columns.values())
+            conn.executemany(f"UPDATE {table} SET {set_clause} WHERE id = ?", updates)
+    conn.executescript("""
+        CREATE INDEX IF NOT EXISTS idx_records_start_day ON records(start_day);
+        CREATE INDEX IF NOT EXISTS idx_records_quotation_day ON records(quotation_day);
+        CREATE INDEX IF NOT EXISTS idx_hist_archived_day ON historical_archive(archived_day);
+        CREATE INDEX IF NOT EXISTS idx_hist_start_day ON historical_archive(start_day);
+
+        -- archived_at is a SQLite timestamp, so date() parses it; anything else is left to the backfill
+        CREATE TRIGGER IF NOT EXISTS trg_hist_archived_day
+            AFTER UPDATE OF archived_at ON historical_archive
+            WHEN NEW.archived_at IS NOT OLD.archived_at
+        BEGIN
+            UPDATE historical_archive
+            SET archived_day = CAST(julianday(date(NEW.archived_at)) - 2440587.5 AS INTEGER)
+            WHERE id = NEW.id;
+        END;
+    """)
+    conn.commit()
+
+
+def _migrate_line_fingerprints(conn):
+    """Add the archive line_fingerprint column and its index, fingerprinting rows that lack one."""
+    existing = {row['name'] for row in conn.execute("PRAGMA table_info(historical_archive)")}
+    if 'line_fingerprint' not in existing:
+        conn.execute("ALTER TABLE historical_archive ADD COLUMN line_fingerprint TEXT")
+    rows = conn.execute("SELECT * FROM historical_archive WHERE line_fingerprint IS NULL").fetchall()
+    if rows:
+        conn.executemany(
+            "UPDATE historical_archive SET line_fingerprint = ? WHERE id = ?",
+            [(line_fingerprint(dict(row)), row['id']) for row in rows],
+        )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_hist_line_fingerprint ON historical_archive(line_fingerprint)")
+    conn.commit()
+
+
+def _migrate_draft_validation(conn):
+    """Add the packed field-level validation columns of draft records."""
+    existing = {row['name'] for row in conn.execute("PRAGMA table_info(records)")}
+    for column, col_type in (('field_status', 'INTEGER'), ('field_notes', 'TEXT')):
+        if column not in existing:
+            conn.execute(f"ALTER TABLE records ADD COLUMN {column} {col_type}")
+    conn.commit()
+
+
+def _archived_fingerprints(conn, fingerprints) -> set[str]:
+    found = set()
+    fingerprints = list(set(fingerprints))
+    for start in range(0, len(fingerprints), 900):
+        chunk = fingerprints[start:start + 900]
+        placeholders = ', '.join(['?'] * len(chunk))
+        rows = conn.execute(
+            f"SELECT DISTINCT line_fingerprint FROM historical_archive WHERE line_fingerprint IN ({placeholders})",
+            chunk,
+        ).fetchall()
+        found.update(row[0] for row in rows)
+    return found
+
+
+def get_archived_fingerprints(fingerprints: list[str]) -> set[str]:
+    """The subset of the given line fingerprints already present in the historical archive."""
+    if not fingerprints:
+        return set()
+    conn = get_db_connection()
+    try:
+        return _archived_fingerprints(conn, fingerprints)
+    finally:
+        conn.close()
+
+
+def _rebuild_price_rollups(conn) -> int:
+    conn.execute("DELETE FROM price_rollup_monthly")
+    conn.execute(f"INSERT INTO price_rollup_monthly ({_ROLLUP_COLUMNS}) {_ROLLUP_SELECT}{_ROLLUP_GROUP_BY}")
+    conn.commit()
+    return conn.execute("SELECT COUNT(*) FROM price_rollup_monthly").fetchone()[0]
+
+
+def rebuild_price_rollups() -> int:
+    """Recompute the monthly price rollup from the raw archive. Returns the number of groups."""
+    conn = get_db_connection()
+    try:
+        return _rebuild_price_rollups(conn)
+    finally:
+        conn.close()
+
+
+_SKETCH_ROWS_SQL = """
+    SELECT sku, distributor, eu_company, unit_price FROM historical_archive
+    WHERE IFNULL(sku, '') != '' AND typeof(unit_price) IN ('integer', 'real')
+"""
+
+
+def _fold_price_sketches(conn, rows, fresh: bool = False):
+    """Add archive rows to the sketches of their SKU, distributor and company groups."""
+    groups: dict[tuple, list[float]] = {}
+    for row in rows:
+        keys = [(row['sku'], '', '')]
+        for dimension in ('distributor', 'eu_company'):
+            if row[dimension]:
+                keys.append((row['sku'], dimension, row[dimension]))
+        for key in keys:
+            groups.setdefault(key, []).append(row['unit_price'])
+
+    for key, prices in groups.items():
+        existing = None if fresh else conn.execute(
+            "SELECT digest FROM price_sketch WHERE sku = ? AND dimension = ? AND dim_value = ?", key
+        ).fetchone()
+        digest = TDigest.from_bytes(existing['digest']) if existing else TDigest()
+        for price in prices:
+            digest.add(price)
+        conn.execute(
+            """INSERT OR REPLACE INTO price_sketch
+               (sku, dimension, dim_value, digest, price_count, p10, p50, p90, mad)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (*key, digest.to_bytes(), int(digest.count), digest.quantile(0.1), digest.quantile(0.5),
+             digest.quantile(0.9), digest.mad()),
+        )
+
+
+def _price_sketches_pending(conn) -> bool:
+    row = conn.execute("""
+        SELECT (SELECT IFNULL(MAX(id), 0) FROM historical_archive)
+                   > IFNULL((SELECT last_archive_id FROM price_sketch_state WHERE id = 1), 0)
+               OR EXISTS (SELECT 1 FROM price_sketch_dirty)
+    """).fetchone()
+    return bool(row[0])
+
+
+def _refresh_price_sketches(conn) -> int:
+    """Bring the sketches up to date with the archive. Returns the number of rows folded in."""
+    if not _price_sketches_pending(conn):
+        return 0
+    conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        state = conn.execute("SELECT last_archive_id FROM price_sketch_state WHERE id = 1").fetchone()
+        last_id = state['last_archive_id'] if state else 0
+        max_id = conn.execute("SELECT IFNULL(MAX(id), 0) FROM historical_archive").fetchone()[0]
+        rows = conn.execute(_SKETCH_ROWS_SQL + " AND id > ? AND id <= ?", (last_id, max_id)).fetchall()
+        _fold_price_sketches(conn, rows)
+        processed = len(rows)
+
+        # Updated or deleted rows cannot be taken out of a digest: rebuild those SKUs
+        dirty = [row['sku'] for row in conn.execute("SELECT sku FROM price_sketch_dirty")]
+        for start in range(0, len(dirty), 500):
+            chunk = dirty[start:start + 500]
+            placeholders = ', '.join(['?'] * len(chunk))
+            conn.execute(f"DELETE FROM price_sketch WHERE sku IN ({placeholders})", chunk)
+            rows = conn.execute(_SKETCH_ROWS_SQL + f" AND sku IN ({placeholders})", chunk).fetchall()
+            _fold_price_sketches(conn, rows, fresh=True)
+            processed += len(rows)
+        conn.execute("DELETE FROM price_sketch_dirty")
+
+        conn.execute("INSERT OR REPLACE INTO price_sketch_state (id, last_archive_id) VALUES (1, ?)", (max_id,))
+        conn.commit()
+        return processed
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def _refresh_price_sketches_quietly(conn):
+    """Refresh after an archive write; on failure the next archive write (or init_db) catches up."""
+    try:
+        _refresh_price_sketches(conn)
+    except Exception:
+        pass
+
+
+def refresh_price_sketches() -> int:
+    """Fold new and changed archive rows into the price sketches."""
+    conn = get_db_connection()
+    try:
+        return _refresh_price_sketches(conn)
+    finally:
+        conn.close()
+
+
+def rebuild_price_sketches() -> int:
+    """Recompute every price sketch from the raw archive. Returns the number of sketches."""
+    conn = get_db_connection()
+    try:
+        conn.execute("DELETE FROM price_sketch")
+        conn.execute("DELETE FROM price_sketch_state")
+        conn.commit()
+        _refresh_price_sketches(conn)
+        return conn.execute("SELECT COUNT(*) FROM price_sketch").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _price_quantiles(conn, skus: list[str], dimension: str = '', dim_value: str = '') -> dict[str, dict]:
+    # Read-only: sketches are refreshed by the archive writers, so a reader never
+    # takes the write lock and may see the state before a failed refresh
+    result = {}
+    for start in range(0, len(skus), 500):
+        chunk = skus[start:start + 500]
+        placeholders = ', '.join(['?'] * len(chunk))
+        cursor = conn.execute(
+            f"""SELECT sku, p10, p50, p90, mad FROM price_sketch
+                WHERE dimension = ? AND dim_value = ? AND sku IN ({placeholders})""",
+            [dimension, dim_value, *chunk],
+        )
+        for row in cursor.fetchall():
+            result[row['sku']] = {
+                'p10_price': row['p10'], 'median_price': row['p50'],
+                'p90_price': row['p90'], 'mad_price': row['mad'],
+            }
+    return result
+
+
+def get_price_quantiles(sku: str, distributor: str = None, eu_company: str = None) -> "dict | None":
+    """Approximate p10 / median / p90 price and MAD for a SKU from its t-digest sketch.
+
+    Scoped to one distributor or one company when given (distributor wins).
+    """
+    dimension, dim_value = ('distributor', distributor) if distributor else \
+        ('eu_company', eu_company) if eu_company else ('', '')
+    conn = get_db_connection()
+    try:
+        return _price_quantiles(conn, [sku], dimension, dim_value).get(sku)
+    finally:
+        conn.close()
+
+
+def get_data_version() -> str:
+    """Version of the approved data (current records, archive, catalog).
+
+    Built from write counters maintained by triggers, so it changes on every
+    approval, edit, deletion or catalog change and never goes backwards. Draft
+    records do not affect it.
+    """
+    conn = get_db_connection()
+    try:
+        rows = conn.execute("SELECT name, version FROM data_version ORDER BY name").fetchall()
+        return '.'.join(f"{row['name'][0]}{row['version']}" for row in rows)
+    finally:
+        conn.close()
+
+
+def get_changes(since: int = 0, limit: int = 1000, tables: "list[str] | None" = None) -> dict:
+    """Row changes recorded in change_feed after sequence number `since`.
+
+    Returns the changes in order with `next_since`, the sequence to resume
+    from, and `has_more` when the page is full. `reset` is set when changes
+    after `since` have been pruned (or `since` is ahead of the feed), in which
+    case the consumer must reload from scratch before resuming at next_since.
+    """
+    conn = get_db_connection()
+    try:
+        # One read transaction, so `latest` and the page see the same commits
+        conn.execute("BEGIN")
+        row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_feed'").fetchone()
+        latest = row['seq'] if row else 0
+        oldest = conn.execute("SELECT MIN(seq) FROM change_feed").fetchone()[0] or latest + 1
+        reset = since > latest or since < oldest - 1
+
+        query = "SELECT seq, table_name, row_id, op, changed_at FROM change_feed WHERE seq > ?"
+        params = [since]
+        if tables:
+            query += f" AND table_name IN ({', '.join(['?'] * len(tables))})"
+            params.extend(tables)
+        query += " ORDER BY seq LIMIT ?"
+        params.append(limit)
+        changes = [dict(r) for r in conn.execute(query, params).fetchall()]
+
+        conn.rollback()
+
+        has_more = len(changes) == limit
+        next_since = changes[-1]['seq'] if has_more else latest
+        return {'changes': changes, 'next_since': next_since, 'has_more': has_more, 'reset': reset}
     finally:
         conn.close()
 
@@ -174,6 +791,7 @@ def insert_record(record: dict) -> int:
     """Insert a record and return its ID."""
     conn = get_db_connection()
     try:
+        record = {**record, **_date_days(record)}
         cols = [c for c in record if c != 'id']
         placeholders = ', '.join(['?'] * len(cols))
         col_names = ', '.join(cols)
@@ -211,39 +829,70 @@ def get_current_records() -> list[dict]:
         conn.close()
 
 
-def update_record(record_id: int, updates: dict) -> bool:
-    """Update a record. Only allowed columns may be updated. Returns True on success."""
-    filtered = {k: v for k, v in updates.items() if k in ALLOWED_UPDATE_COLUMNS}
+def update_records(updates: dict[int, dict]) -> list[dict]:
+    """Update several records in one transaction. Returns the updated rows.
+
+    updates maps record IDs to field values; only allowed columns are applied
+    and records without any are left alone. Old values are read in bulk and
+    changes logged in one batch. Raises ValueError, updating nothing, if a
+    record does not exist.
+    """
+    filtered = {}
+    for record_id, fields in updates.items():
+        allowed = {k: v for k, v in fields.items() if k in ALLOWED_UPDATE_COLUMNS}
+        if allowed:
+            filtered[record_id] = allowed
     if not filtered:
-        return False
+        return []
 
     conn = get_db_connection()
     try:
-        # Log changes
-        existing = get_record_by_id(record_id)
-        if not existing:
-            return False
-
-        for field, new_val in filtered.items():
-            old_val = existing.get(field)
-            if str(old_val) != str(new_val):
-                conn.execute(
-                    "INSERT INTO change_log (record_id, field_name, old_value, new_value) VALUES (?, ?, ?, ?)",
-                    (record_id, field, str(old_val), str(new_val)),
-                )
-
-        set_clause = ', '.join([f"{k} = ?" for k in filtered])
-        values = list(filtered.values()) + [datetime.now().isoformat(), record_id]
-        conn.execute(
-            f"UPDATE records SET {set_clause}, updated_at = ?, user_modified = 1 WHERE id = ?",
-            values,
+        ids = list(filtered)
+        existing = {}
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            placeholders = ', '.join(['?'] * len(chunk))
+            for row in conn.execute(f"SELECT * FROM records WHERE id IN ({placeholders})", chunk):
+                existing[row['id']] = row
+        missing = [record_id for record_id in ids if record_id not in existing]
+        if missing:
+            raise ValueError(f"Records not found: {', '.join(map(str, missing))}")
+
+        now = datetime.now().isoformat()
+        changes = []
+        updated = []
+        for record_id, fields in filtered.items():
+            old = existing[record_id]
+            changes.extend(
+                (record_id, field, str(old[field]), str(new_val))
+                for field, new_val in fields.items() if str(old[field]) != str(new_val)
+            )
+            data = {**fields, **_date_days(fields)}
+            set_clause = ', '.join([f"{k} = ?" for k in data])
+            row = conn.execute(
+                f"UPDATE records SET {set_clause}, updated_at = ?, user_modified = 1 WHERE id = ? RETURNING *",
+                [*data.values(), now, record_id],
+            ).fetchone()
+            updated.append(dict(row))
+
+        conn.executemany(
+            "INSERT INTO change_log (record_id, field_name, old_value, new_value) VALUES (?, ?, ?, ?)",
+            changes,
         )
         conn.commit()
-        return True
+        return updated
     finally:
         conn.close()
 
 
+def update_record(record_id: int, updates: dict) -> bool:
+    """Update a record. Only allowed columns may be updated. Returns True on success."""
+    try:
+        return bool(update_records({record_id: updates}))
+    except ValueError:
+        return False
+
+
 def delete_record(record_id: int):
     """Soft-delete a record by setting is_current = 0."""
     conn = get_db_connection()
@@ -257,8 +906,14 @@ def delete_record(record_id: int):
         conn.close()
 
 
-def save_approved_records(records: list[dict], source_file: str = '') -> list[int]:
-    """Save records to both active records table and historical archive."""
+def save_approved_records(records: list[dict], source_file: str = '', skip_duplicates: bool = False) -> list[int]:
+    """Save records to both active records table and historical archive.
+
+    With skip_duplicates, lines whose fingerprint is already in the archive are
+    not saved again, so re-approving a quote is a no-op. Repeats within the
+    batch are kept (they are flagged as possible duplicates during validation).
+    Returns the IDs of the records saved.
+    """
     # Clean up any drafts for this source file first
     if source_file:
         delete_draft_records_by_file(source_file)
@@ -266,11 +921,16 @@ def save_approved_records(records: list[dict], source_file: str = '') -> list[in
     conn = get_db_connection()
     ids = []
     try:
-        for record in records:
+        fingerprints = [line_fingerprint(record) for record in records]
+        archived = _archived_fingerprints(conn, fingerprints) if skip_duplicates else set()
+        for record, fingerprint in zip(records, fingerprints):
+            if fingerprint in archived:
+                continue
             record_data = {c: record.get(c) for c in _RECORD_COLUMNS}
             record_data['source_file'] = source_file
             record_data['is_current'] = 1
             record_data['validation_status'] = record.get('validation_status', 'valid')
+            record_data.update(_date_days(record_data))
 
             # Insert into records
             cols = list(record_data.keys())
@@ -286,6 +946,9 @@ def save_approved_records(records: list[dict], source_file: str = '') -> list[in
             archive_data = {c: record.get(c) for c in _RECORD_COLUMNS}
             archive_data['source_file'] = source_file
             archive_data['archive_reason'] = 'approved'
+            archive_data['archived_at'] = _utc_timestamp()
+            archive_data['line_fingerprint'] = fingerprint
+            archive_data.update(_date_days(archive_data, _ARCHIVE_DATE_DAY_COLUMNS))
             a_cols = list(archive_data.keys())
             a_placeholders = ', '.join(['?'] * len(a_cols))
             a_col_names = ', '.join(a_cols)
@@ -296,6 +959,7 @@ def save_approved_records(records: list[dict], source_file: str = '') -> list[in
             )
 
         conn.commit()
+        _refresh_price_sketches_quietly(conn)
         return ids
     finally:
         conn.close()
@@ -325,12 +989,16 @@ def search_historical_records(
         if distributor:
             sql += " AND distributor LIKE ?"
             params.append(f"%{distributor}%")
+        # Whole-day bounds on the normalized archive date; unparseable bounds
+        # fall back to comparing the raw text
         if date_from:
-            sql += " AND archived_at >= ?"
-            params.append(date_from)
+            day = to_epoch_day(date_from)
+            sql += " AND archived_day >= ?" if day is not None else " AND archived_at >= ?"
+            params.append(day if day is not None else date_from)
         if date_to:
-            sql += " AND archived_at <= ?"
-            params.append(date_to)
+            day = to_epoch_day(date_to)
+            sql += " AND archived_day <= ?" if day is not None else " AND archived_at <= ?"
+            params.append(day if day is not None else date_to)
         if query:
             sql += " AND (sku LIKE ? OR item_description LIKE ? OR distributor LIKE ?)"
             params.extend([f"%{query}%"] * 3)
@@ -348,18 +1016,18 @@ def get_historical_stats(
     sku: str = None,
     eu_company: str = None,
 ) -> dict:
-    """Get aggregate statistics from historical archive."""
+    """Get aggregate statistics from historical archive (read from the monthly rollup)."""
     conn = get_db_connection()
     try:
         sql = """
             SELECT
-                COUNT(*) as total_records,
-                COUNT(DISTINCT sku) as unique_skus,
-                COUNT(DISTINCT distributor) as unique_distributors,
-                AVG(unit_price) as avg_unit_price,
-                MIN(unit_price) as min_unit_price,
-                MAX(unit_price) as max_unit_price
-            FROM historical_archive WHERE 1=1
+                IFNULL(SUM(record_count), 0) as total_records,
+                COUNT(DISTINCT NULLIF(sku, '')) as unique_skus,
+                COUNT(DISTINCT NULLIF(distributor, '')) as unique_distributors,
+                SUM(price_sum) / NULLIF(SUM(price_count), 0) as avg_unit_price,
+                MIN(price_min) as min_unit_price,
+                MAX(price_max) as max_unit_price
+            FROM price_rollup_monthly WHERE 1=1
         """
         params = []
         if sku:
@@ -460,11 +1128,11 @@ def get_records_added_this_month() -> int:
     """Count records created in the current month."""
     conn = get_db_connection()
     try:
-        now = datetime.now()
-        start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        # created_at is a UTC CURRENT_TIMESTAMP ('YYYY-MM-DD HH:MM:SS'); compare in that format
+        start_of_month = datetime.now(timezone.utc).strftime('%Y-%m-01 00:00:00')
         cursor = conn.execute(
             "SELECT COUNT(*) as cnt FROM records WHERE is_current = 1 AND created_at >= ?",
-            (start_of_month.isoformat(),),
+            (start_of_month,),
         )
         return cursor.fetchone()['cnt']
     finally:
@@ -472,23 +1140,26 @@ def get_records_added_this_month() -> int:
 
 
 def get_price_trend_by_sku(sku: str) -> dict:
-    """Get monthly price trend data for a specific SKU."""
+    """Get monthly price trend data for a specific SKU (read from the monthly rollup).
+
+    quantiles holds the approximate p10/median/p90 price and MAD over all time.
+    """
     conn = get_db_connection()
     try:
         cursor = conn.execute("""
             SELECT
-                strftime('%Y-%m', archived_at) as month,
-                AVG(unit_price) as avg_price,
-                MIN(unit_price) as min_price,
-                MAX(unit_price) as max_price,
-                COUNT(*) as record_count
-            FROM historical_archive
-            WHERE sku = ? AND unit_price IS NOT NULL
-            GROUP BY strftime('%Y-%m', archived_at)
+                NULLIF(month, '') as month,
+                SUM(price_sum) / SUM(price_count) as avg_price,
+                MIN(price_min) as min_price,
+                MAX(price_max) as max_price,
+                SUM(price_count) as record_count
+            FROM price_rollup_monthly
+            WHERE sku = ? AND price_count > 0
+            GROUP BY month
             ORDER BY month
         """, (sku,))
         data_points = [dict(row) for row in cursor.fetchall()]
-        return {'sku': sku, 'data_points': data_points}
+        return {'sku': sku, 'data_points': data_points, 'quantiles': _price_quantiles(conn, [sku]).get(sku)}
     finally:
         conn.close()
 
@@ -525,18 +1196,45 @@ def get_distinct_distributors() -> list[str]:
         conn.close()
 
 
+def get_spend_by_distributor(limit: int = 10) -> list[dict]:
+    """Total quoted spend of active records per distributor and currency, largest first."""
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute(
+            """SELECT
+                   distributor,
+                   quote_currency,
+                   COUNT(*) as record_count,
+                   ROUND(SUM(COALESCE(total_price, unit_price * quantity, 0)), 2) as spend
+               FROM records
+               WHERE is_current = 1 AND distributor IS NOT NULL AND distributor != ''
+               GROUP BY distributor, quote_currency
+               ORDER BY spend DESC
+               LIMIT ?""",
+            (limit,),
+        )
+        return [dict(row) for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+
 def get_historical_price_summary(sku: str, eu_company: str = None) -> "dict | None":
-    """Get price statistics for a specific SKU, optionally filtered by company."""
+    """Get price statistics for a specific SKU, optionally filtered by company.
+
+    Read from the monthly rollup; std_price is the population standard deviation.
+    The p10/median/p90 prices and MAD are approximate, from the price sketches.
+    """
     conn = get_db_connection()
     try:
         sql = """
             SELECT
-                AVG(unit_price) as avg_price,
-                MIN(unit_price) as min_price,
-                MAX(unit_price) as max_price,
-                COUNT(*) as record_count
-            FROM historical_archive
-            WHERE sku = ? AND unit_price IS NOT NULL
+                SUM(price_sum) / SUM(price_count) as avg_price,
+                MIN(price_min) as min_price,
+                MAX(price_max) as max_price,
+                IFNULL(SUM(price_count), 0) as record_count,
+                SUM(price_sumsq) / SUM(price_count) - (SUM(price_sum) / SUM(price_count)) * (SUM(price_sum) / SUM(price_count)) as variance
+            FROM price_rollup_monthly
+            WHERE sku = ? AND price_count > 0
         """
         params = [sku]
         if eu_company:
@@ -546,7 +1244,11 @@ def get_historical_price_summary(sku: str, eu_company: str = None) -> "dict | No
         cursor = conn.execute(sql, params)
         row = cursor.fetchone()
         if row and row['record_count'] > 0:
-            return dict(row)
+            summary = dict(row)
+            summary['std_price'] = max(summary.pop('variance') or 0, 0) ** 0.5
+            scope = ('eu_company', eu_company) if eu_company else ('', '')
+            summary.update(_price_quantiles(conn, [sku], *scope).get(sku, {}))
+            return summary
         return None
     finally:
         conn.close()
@@ -656,18 +1358,23 @@ def generate_historical_for_skus(records: list[dict]):
 
                 total = round(price * qty, 2)
 
+                day = to_epoch_day(entry_date)
                 conn.execute(
                     """INSERT INTO historical_archive
                        (sku, distributor, item_description, brand, quote_currency,
                         quantity, unit_price, total_price, eu_company,
-                        archived_at, archive_reason, start_date)
-                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                        archived_at, archive_reason, start_date, archived_day, start_day,
+                        line_fingerprint)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
                     (sku, distributor, description, brand, currency,
                      qty, price, total, eu_company,
-                     date_str, 'synthetic_historical', date_str),
+                     date_str, 'synthetic_historical', date_str, day, day,
+                     line_fingerprint({'sku': sku, 'unit_price': price, 'quantity': qty,
+                                       'distributor': distributor})),
                 )
 
         conn.commit()
+        _refresh_price_sketches_quietly(conn)
     finally:
         conn.close()
 
@@ -676,7 +1383,8 @@ def get_historical_price_summaries_batch(skus: list[str]) -> dict[str, dict]:
     """Get price and quantity statistics for multiple SKUs in one query.
 
     Returns a dict keyed by SKU with avg_price, min_price, max_price,
-    avg_quantity, and record_count for each.
+    avg_quantity, and record_count for each. Read from the monthly rollup,
+    plus median_price, p10_price, p90_price and mad_price from the price sketches.
     """
     if not skus:
         return {}
@@ -687,13 +1395,13 @@ def get_historical_price_summaries_batch(skus: list[str]) -> dict[str, dict]:
         cursor = conn.execute(
             f"""SELECT
                     sku,
-                    AVG(unit_price) as avg_price,
-                    MIN(unit_price) as min_price,
-                    MAX(unit_price) as max_price,
-                    AVG(quantity) as avg_quantity,
-                    COUNT(*) as record_count
-                FROM historical_archive
-                WHERE sku IN ({placeholders}) AND unit_price IS NOT NULL
+                    SUM(price_sum) / SUM(price_count) as avg_price,
+                    MIN(price_min) as min_price,
+                    MAX(price_max) as max_price,
+                    SUM(qty_sum) / NULLIF(SUM(qty_count), 0) as avg_quantity,
+                    SUM(price_count) as record_count
+                FROM price_rollup_monthly
+                WHERE sku IN ({placeholders}) AND price_count > 0
                 GROUP BY sku""",
             skus,
         )
@@ -706,6 +1414,8 @@ def get_historical_price_summaries_batch(skus: list[str]) -> dict[str, dict]:
                 'avg_quantity': round(row['avg_quantity'], 1) if row['avg_quantity'] else 0,
                 'record_count': row['record_count'],
             }
+        for sku, quantiles in _price_quantiles(conn, list(result)).items():
+            result[sku].update({k: round(v, 2) if v is not None else None for k, v in quantiles.items()})
         return result
     finally:
         conn.close()
@@ -957,26 +1667,32 @@ def batch_delete_records(ids: list[int]) -> int:
     return count
 
 
+def _insert_draft(conn, record: dict, source_file: str, text_ids: dict[str, int]) -> int:
+    record_data = {c: record.get(c) for c in _RECORD_COLUMNS}
+    record_data['source_file'] = source_file
+    record_data['is_current'] = 0  # draft — not yet approved
+    record_data['validation_status'] = record.get('validation_status', 'pending')
+    record_data['validation_message'] = record.get('validation_message', '')
+    record_data['field_status'], record_data['field_notes'] = _encode_field_validation(
+        record.get('field_validation'), text_ids)
+    record_data.update(_date_days(record_data))
+
+    cols = list(record_data.keys())
+    placeholders = ', '.join(['?'] * len(cols))
+    col_names = ', '.join(cols)
+    values = [record_data[c] for c in cols]
+    cursor = conn.execute(
+        f"INSERT INTO records ({col_names}) VALUES ({placeholders})", values
+    )
+    return cursor.lastrowid
+
+
 def save_draft_records(records: list[dict], file_id: int, source_file: str = '') -> list[int]:
     """Save extracted records as drafts (is_current=0) linked to an uploaded file."""
     conn = get_db_connection()
-    ids = []
     try:
-        for record in records:
-            record_data = {c: record.get(c) for c in _RECORD_COLUMNS}
-            record_data['source_file'] = source_file
-            record_data['is_current'] = 0  # draft — not yet approved
-            record_data['validation_status'] = record.get('validation_status', 'pending')
-            record_data['validation_message'] = record.get('validation_message', '')
-
-            cols = list(record_data.keys())
-            placeholders = ', '.join(['?'] * len(cols))
-            col_names = ', '.join(cols)
-            values = [record_data[c] for c in cols]
-            cursor = conn.execute(
-                f"INSERT INTO records ({col_names}) VALUES ({placeholders})", values
-            )
-            ids.append(cursor.lastrowid)
+        text_ids = _intern_texts(conn, _field_validation_texts(records))
+        ids = [_insert_draft(conn, record, source_file, text_ids) for record in records]
         conn.commit()
         return ids
     finally:
@@ -984,14 +1700,38 @@ def save_draft_records(records: list[dict], file_id: int, source_file: str = '')
 
 
 def get_draft_records_by_file(source_file: str) -> list[dict]:
-    """Get draft records (is_current=0) for a given source file."""
+    """Get draft records (is_current=0) for a given source file.
+
+    Drafts saved with field-level validation come back with their
+    field_validation map (including acknowledgements) restored.
+    """
     conn = get_db_connection()
     try:
         cursor = conn.execute(
             "SELECT * FROM records WHERE is_current = 0 AND source_file = ? ORDER BY id",
             (source_file,),
         )
-        return [dict(row) for row in cursor.fetchall()]
+        records = [dict(row) for row in cursor.fetchall()]
+        text_ids = {
+            int(text_id)
+            for record in records if record.get('field_notes')
+            for note in record['field_notes'].split(';')
+            for text_id in note.split(':')[1:]
+        }
+        text_ids.discard(0)
+        texts = {}
+        text_ids = list(text_ids)
+        for start in range(0, len(text_ids), 500):
+            chunk = text_ids[start:start + 500]
+            placeholders = ', '.join(['?'] * len(chunk))
+            for row in conn.execute(f"SELECT id, text FROM validation_text WHERE id IN ({placeholders})", chunk):
+                texts[row['id']] = row['text']
+        for record in records:
+            bits = record.pop('field_status', None)
+            notes = record.pop('field_notes', None)
+            if bits is not None:
+                record['field_validation'] = _decode_field_validation(bits, notes, texts)
+        return records
     finally:
         conn.close()
 
@@ -1012,31 +1752,85 @@ def delete_draft_records_by_file(source_file: str) -> int:
 
 def replace_draft_records(records: list[dict], source_file: str) -> list[int]:
     """Delete existing drafts for a source file and re-insert updated records."""
-    delete_draft_records_by_file(source_file)
     conn = get_db_connection()
-    ids = []
     try:
-        for record in records:
-            record_data = {c: record.get(c) for c in _RECORD_COLUMNS}
-            record_data['source_file'] = source_file
-            record_data['is_current'] = 0
-            record_data['validation_status'] = record.get('validation_status', 'pending')
-            record_data['validation_message'] = record.get('validation_message', '')
-
-            cols = list(record_data.keys())
-            placeholders = ', '.join(['?'] * len(cols))
-            col_names = ', '.join(cols)
-            values = [record_data[c] for c in cols]
-            cursor = conn.execute(
-                f"INSERT INTO records ({col_names}) VALUES ({placeholders})", values
-            )
-            ids.append(cursor.lastrowid)
+        conn.execute("DELETE FROM records WHERE is_current = 0 AND source_file = ?", (source_file,))
+        text_ids = _intern_texts(conn, _field_validation_texts(records))
+        ids = [_insert_draft(conn, record, source_file, text_ids) for record in records]
         conn.commit()
         return ids
     finally:
         conn.close()
 
 
+_DRAFT_UPDATE_COLUMNS = ALLOWED_UPDATE_COLUMNS | {'validation_status', 'validation_message'}
+
+
+def apply_draft_operations(source_file: str, operations: list[dict]) -> dict:
+    """Apply row-level edits to the drafts of a source file in one transaction.
+
+    Operations are {'op': 'update', 'id', 'fields'}, {'op': 'insert', 'record'}
+    or {'op': 'delete', 'id'}; updates and deletes only touch drafts of this
+    file. Deleting a draft that is already gone is a no-op, so a repeated
+    autosave is harmless. Raises ValueError, applying nothing, on an unknown
+    operation or an update of an unknown id. Only edits of record fields mark
+    the draft user_modified (not re-validation results). Returns the counts, the IDs of inserted drafts in operation order, and the
+    IDs of all drafts of the file.
+    """
+    conn = get_db_connection()
+    try:
+        payloads = [op.get('fields') or op.get('record') or {} for op in operations]
+        text_ids = _intern_texts(conn, _field_validation_texts(payloads))
+        now = datetime.now().isoformat()
+        updated = deleted = 0
+        inserted = []
+        for op, payload in zip(operations, payloads):
+            kind = op.get('op')
+            if kind == 'insert':
+                inserted.append(_insert_draft(conn, payload, source_file, text_ids))
+                continue
+            if kind == 'delete':
+                cursor = conn.execute(
+                    "DELETE FROM records WHERE id = ? AND is_current = 0 AND source_file = ?",
+                    (op.get('id'), source_file),
+                )
+                deleted += cursor.rowcount
+                continue
+            if kind == 'update':
+                data = {k: v for k, v in payload.items() if k in _DRAFT_UPDATE_COLUMNS}
+                data.update(_date_days(data))
+                if 'field_validation' in payload:
+                    data['field_status'], data['field_notes'] = _encode_field_validation(
+                        payload['field_validation'], text_ids)
+                set_clause = ''.join(f"{k} = ?, " for k in data)
+                if not ALLOWED_UPDATE_COLUMNS.isdisjoint(data):
+                    set_clause += 'user_modified = 1, '
+                cursor = conn.execute(
+                    f"UPDATE records SET {set_clause}updated_at = ? "
+                    "WHERE id = ? AND is_current = 0 AND source_file = ?",
+                    [*data.values(), now, op.get('id'), source_file],
+                )
+                if not cursor.rowcount:
+                    raise ValueError(f"Draft {op.get('id')} not found for {source_file}")
+                updated += cursor.rowcount
+                continue
+            raise ValueError(f"Unknown draft operation: {kind!r}")
+        conn.commit()
+
+        cursor = conn.execute(
+            "SELECT id FROM records WHERE is_current = 0 AND source_file = ? ORDER BY id", (source_file,)
+        )
+        return {
+            'updated': updated, 'inserted': inserted, 'deleted': deleted,
+            'ids': [row['id'] for row in cursor.fetchall()],
+        }
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
 def get_uploaded_files(limit: int = 50) -> list[dict]:
     """Get all uploaded files ordered by most recent."""
     conn = get_db_connection()
@@ -2,15 +2,21 @@
 Document extraction service using H2OGPTE.
 Extracts structured line items from procurement documents.
 """
+import csv
 import json
 import re
-import secrets
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from xml.etree import ElementTree
 
-from procurement.config.settings import EXTRACTION_PROMPT_PATH
-from procurement.services.llm_service import get_h2ogpte_client, get_best_llm
-from procurement.services.validation import validate_records
-from procurement.services.database import get_all_known_skus, get_catalog_entries_batch
+from procurement.config.settings import (
+    EXTRACTION_PROMPT_PATH, EXTRACTION_CHUNK_PAGES, EXTRACTION_CHUNK_ROWS, EXTRACTION_MAX_CONCURRENCY,
+)
+from procurement.services.llm_service import get_h2ogpte_client, get_best_llm, stream_delta, temporary_chat
+from procurement.services.ingestion import ingestion_session
+from procurement.services.validation import line_fingerprint, validate_records, validate_record_fields
+from procurement.services.database import get_all_known_skus, get_archived_fingerprints, get_catalog_entries_batch
 
 EXTRACTION_JSON_SCHEMA = {
     "type": "object",
@@ -67,16 +73,30 @@ _FIELD_NAME_MAP = {
 
 _NUMERIC_FIELDS = {'quantity', 'unit_price', 'total_price'}
 
+# Fields that identify a line item when merging overlapping chunk results
+_DEDUPE_FIELDS = ('SKU', 'Item Description', 'Quantity', 'Unit Price', 'Total Price', 'Serial No')
+
+_PDF_PAGE_RE = re.compile(rb'/Type\s*/Page(?![A-Za-z])')
+_PDF_COUNT_RE = re.compile(rb'/Type\s*/Pages\b[^>]*?/Count\s+(\d+)|/Count\s+(\d+)[^>]*?/Type\s*/Pages\b', re.DOTALL)
+
+_DOCX_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
 
 def extract_document_with_llm(
     file_path: str,
     llm_client=None,
     filename: str = None,
+    on_item=None,
 ) -> list[dict]:
-    """Extract structured line items from a procurement document using H2OGPTE."""
+    """Extract structured line items from a procurement document using H2OGPTE.
+
+    If on_item is given, extraction queries are streamed and on_item(record)
+    is called for each line item as soon as it is parsed, with per-record
+    validation applied. The returned list is the merged, batch-validated
+    result and is authoritative.
+    """
     client = llm_client or get_h2ogpte_client()
-    best_model = get_best_llm(client)
-    collection_id = None
+    best_model = get_best_llm(client, task='extraction')
 
     if filename is None:
         filename = Path(file_path).name
@@ -96,35 +116,16 @@ def extract_document_with_llm(
         )
 
     try:
-        # Upload document
-        with open(file_path, 'rb') as f:
-            upload_id = client.upload(filename, f)
-
-        # Create temporary collection
-        collection_id = client.create_collection(
-            name=f"extraction_{filename}_{secrets.token_hex(4)}",
-            description=f"Temporary collection for extracting {filename}",
-        )
-
-        # Ingest document
-        client.ingest_uploads(collection_id, [upload_id], timeout=120)
-
-        # Create chat session and query
-        chat_session_id = client.create_chat_session(collection_id)
-        with client.connect(chat_session_id) as session:
-            reply = session.query(
-                extraction_prompt,
-                llm=best_model,
-                llm_args={
-                    'response_format': 'json_object',
-                    'guided_json': EXTRACTION_JSON_SCHEMA,
-                    'temperature': 0.1,
-                },
-                timeout=180,
-            )
-
-        # Parse response
-        items = parse_extraction_response(reply.content)
+        item_callback = _preview_callback(filename, on_item) if on_item else None
+        ranges = document_ranges(file_path)
+        # Upload + ingest once per document; reuses the collection left by /verify
+        with ingestion_session(file_path, filename, llm_client=client, release=True) as ingested:
+            if ranges:
+                items = _extract_chunked(client, ingested.collection_id, extraction_prompt, best_model,
+                                         ranges, item_callback)
+            else:
+                items = _query_items(client, ingested.collection_id, extraction_prompt, best_model,
+                                     item_callback)
 
         # Post-process
         normalized = [normalize_field_names(item) for item in items]
@@ -136,19 +137,316 @@ def extract_document_with_llm(
         known_skus = get_all_known_skus()
         skus_in_batch = [r.get('sku') for r in normalized if r.get('sku')]
         catalog_entries = get_catalog_entries_batch(skus_in_batch)
+        archived_fingerprints = get_archived_fingerprints([line_fingerprint(r) for r in normalized])
 
         # Validate
-        validated = validate_records(normalized, known_skus=known_skus, catalog_entries=catalog_entries)
+        validated = validate_records(normalized, known_skus=known_skus, catalog_entries=catalog_entries,
+                                     archived_fingerprints=archived_fingerprints)
         return validated
 
     except Exception as e:
         raise RuntimeError(f"Extraction failed: {str(e)}") from e
+
+
+def _query_items(client, collection_id: str, prompt: str, model: str, on_item=None,
+                 rag_config: dict = None) -> list[dict]:
+    """Run one guided-JSON extraction query against an ingested collection.
+
+    With on_item, the reply is streamed through IncrementalItemParser and
+    on_item(raw_item) is called for each item as it closes. rag_config is
+    passed through to the query.
+    """
+    parser = None
+    callback = None
+    if on_item is not None:
+        parser = IncrementalItemParser()
+
+        def callback(message):
+            for item in parser.feed(stream_delta(message)):
+                on_item(item)
+
+    with temporary_chat(client, collection_id) as session:
+        reply = session.query(
+            prompt,
+            llm=model,
+            llm_args={
+                'response_format': 'json_object',
+                'guided_json': EXTRACTION_JSON_SCHEMA,
+                'temperature': 0.1,
+            },
+            timeout=180,
+            callback=callback,
+            **({'rag_config': rag_config} if rag_config else {}),
+        )
+
+    if parser is not None and parser.items:
+        return parser.items
+    return parse_extraction_response(reply.content)
+
+
+def _extract_chunked(client, collection_id: str, prompt: str, model: str, ranges: list[tuple[str, str]],
+                     on_item=None) -> list[dict]:
+    """Extract each (label, text) range concurrently on the document's collection; merge in document order.
+
+    Each query carries the text of its range and runs without retrieval, so
+    no range can be missed or answered twice by search over the whole document.
+    """
+    def _extract_range(label_text):
+        label, text = label_text
+        range_prompt = (f"{prompt}\n\nExtract only the line items in {label} of the document, "
+                        f"given below.\n\n{text}")
+        return _query_items(client, collection_id, range_prompt, model, on_item,
+                            rag_config={'rag_type': 'llm_only'})
+
+    workers = max(1, min(EXTRACTION_MAX_CONCURRENCY, len(ranges)))
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        results = list(pool.map(_extract_range, ranges))
     finally:
-        if collection_id:
-            try:
-                client.delete_collections([collection_id])
-            except Exception:
-                pass
+        # After a failure (e.g. the streaming client went away) don't start the remaining ranges
+        pool.shutdown(cancel_futures=True)
+    return merge_chunk_items(results)
+
+
+def _preview_callback(filename: str, on_item):
+    """Wrap on_item so it receives normalized, per-record validated copies of raw items."""
+    def _emit(item):
+        if not isinstance(item, dict):
+            return
+        rec = normalize_field_names(item)
+        rec['source_file'] = filename
+        _convert_numerics(rec)
+        result = validate_record_fields(rec)
+        rec['validation_status'] = result.overall_status.value
+        rec['field_validation'] = {
+            f: {'status': fv.status.value, 'message': fv.message, 'suggestion': fv.suggestion}
+            for f, fv in result.field_results.items()
+        }
+        on_item(rec)
+    return _emit
+
+
+class IncrementalItemParser:
+    """Incremental JSON scanner that yields line-item objects as soon as they close.
+
+    Handles {"items": [{...}, ...]}, bare arrays and JSONL objects. Every
+    object whose parent is an array is an item; a top-level object without
+    an "items" key is also treated as one item.
+    """
+
+    def __init__(self):
+        self.items: list[dict] = []
+        self._text = ''
+        self._pos = 0
+        self._stack: list[tuple[str, int]] = []
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk: str) -> list[dict]:
+        """Consume more text; return the items completed by it."""
+        if not chunk:
+            return []
+        self._text += chunk
+        completed = []
+        text = self._text
+        i = self._pos
+        while i < len(text):
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                if self._stack:
+                    self._in_string = True
+            elif ch in '{[':
+                self._stack.append((ch, i))
+            elif ch in '}]' and self._stack:
+                kind, start = self._stack.pop()
+                if kind == '{' and ch == '}':
+                    parent = self._stack[-1][0] if self._stack else None
+                    if parent == '[' or parent is None:
+                        item = self._decode(text[start:i + 1], top_level=parent is None)
+                        if item is not None:
+                            completed.append(item)
+                if not self._stack:
+                    # Nothing open: drop consumed text
+                    text = text[i + 1:]
+                    i = -1
+            i += 1
+        self._text = text
+        self._pos = len(text)
+        self.items.extend(completed)
+        return completed
+
+    @staticmethod
+    def _decode(fragment: str, top_level: bool) -> "dict | None":
+        try:
+            obj = json.loads(fragment)
+        except json.JSONDecodeError:
+            return None
+        if not isinstance(obj, dict) or (top_level and 'items' in obj):
+            return None
+        return obj
+
+
+def merge_chunk_items(chunk_results: list[list[dict]]) -> list[dict]:
+    """Concatenate chunk results in order, dropping rows repeated from the previous chunk.
+
+    A row straddling a page boundary can be returned by both neighbouring
+    chunks. Repeats are only matched against the preceding chunk so that
+    genuinely repeated lines elsewhere in the document are kept.
+    """
+    merged: list[dict] = []
+    previous: dict[tuple, int] = {}
+    for items in chunk_results:
+        current: dict[tuple, int] = {}
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            key = _item_key(item)
+            current[key] = current.get(key, 0) + 1
+            if previous.get(key, 0) > 0:
+                previous[key] -= 1
+                continue
+            merged.append(item)
+        previous = current
+    return merged
+
+
+def _item_key(item: dict) -> tuple:
+    key = []
+    for name in _DEDUPE_FIELDS:
+        val = item.get(name, item.get(_FIELD_NAME_MAP.get(name, name)))
+        if isinstance(val, str):
+            val = val.strip().upper()
+        elif isinstance(val, (int, float)):
+            val = round(float(val), 4)
+        key.append(val)
+    return tuple(key)
+
+
+def page_ranges(pages: int, size: int = None) -> list[tuple[int, int]]:
+    """1-based inclusive page ranges of at most `size` pages covering the document."""
+    size = max(1, size or EXTRACTION_CHUNK_PAGES)
+    return [(start, min(start + size - 1, pages)) for start in range(1, pages + 1, size)]
+
+
+def row_ranges(rows: int, size: int = None) -> list[tuple[int, int]]:
+    """1-based inclusive row ranges of at most `size` rows covering a table."""
+    return page_ranges(rows, size or EXTRACTION_CHUNK_ROWS)
+
+
+def document_ranges(file_path: str) -> list[tuple[str, str]]:
+    """(label, text) of each page range (PDF) or row range (spreadsheet, CSV, Word) of a large document.
+
+    Returns an empty list when the document is within one chunk or its text
+    cannot be read locally; it is then extracted in one query.
+    """
+    suffix = Path(file_path).suffix.lower()
+    try:
+        if suffix == '.pdf':
+            return _pdf_ranges(file_path)
+        readers = {'.xlsx': _xlsx_tables, '.xls': _xls_tables, '.csv': _csv_tables, '.docx': _docx_tables}
+        if suffix in readers:
+            return _table_ranges(readers[suffix](file_path))
+    except Exception:
+        pass
+    return []
+
+
+def _pdf_ranges(file_path: str) -> list[tuple[str, str]]:
+    if count_pdf_pages(file_path) <= max(1, EXTRACTION_CHUNK_PAGES):
+        return []
+    from pypdf import PdfReader
+    texts = [page.extract_text() or '' for page in PdfReader(file_path).pages]
+    if not any(t.strip() for t in texts):
+        return []  # scanned document: only the ingested (OCR'd) copy has text
+    ranges = page_ranges(len(texts))
+    if len(ranges) <= 1:
+        return []
+    return [(f"pages {first}-{last}", '\n'.join(texts[first - 1:last])) for first, last in ranges]
+
+
+def _table_ranges(tables: list[tuple[str, list[list]]]) -> list[tuple[str, str]]:
+    """Chunk (name, rows) tables into row ranges; the first row of a table is its header."""
+    tables = [(name, rows) for name, rows in tables if len(rows) > 1]
+    if sum(len(rows) - 1 for _, rows in tables) <= max(1, EXTRACTION_CHUNK_ROWS):
+        return []
+    ranges = []
+    for name, (header, *rows) in tables:
+        for first, last in row_ranges(len(rows)):
+            lines = [_format_row(header)] + [_format_row(row) for row in rows[first - 1:last]]
+            ranges.append((f"{name}, rows {first}-{last}", '\n'.join(lines)))
+    return ranges
+
+
+def _format_row(row) -> str:
+    return ' | '.join('' if v is None else str(v).strip() for v in row)
+
+
+def _non_empty(rows) -> list[list]:
+    return [list(row) for row in rows if any(v is not None and str(v).strip() for v in row)]
+
+
+def _xlsx_tables(file_path: str) -> list[tuple[str, list[list]]]:
+    from openpyxl import load_workbook
+    # Iterate rows rather than trusting max_row, which read-only sheets may not report
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        return [(f"sheet {ws.title}", _non_empty(ws.iter_rows(values_only=True))) for ws in workbook.worksheets]
+    finally:
+        workbook.close()
+
+
+def _xls_tables(file_path: str) -> list[tuple[str, list[list]]]:
+    import xlrd
+    book = xlrd.open_workbook(file_path, on_demand=True)
+    try:
+        return [
+            (f"sheet {sheet.name}", _non_empty(sheet.row_values(i) for i in range(sheet.nrows)))
+            for sheet in book.sheets()
+        ]
+    finally:
+        book.release_resources()
+
+
+def _csv_tables(file_path: str) -> list[tuple[str, list[list]]]:
+    with open(file_path, newline='', encoding='utf-8-sig', errors='replace') as f:
+        return [('the table', _non_empty(csv.reader(f)))]
+
+
+def _docx_tables(file_path: str) -> list[tuple[str, list[list]]]:
+    """Paragraphs (one-cell rows) and table rows of a .docx, in document order."""
+    with zipfile.ZipFile(file_path) as archive:
+        body = ElementTree.fromstring(archive.read('word/document.xml')).find(f'{_DOCX_NS}body')
+    rows = []
+    for element in body if body is not None else []:
+        if element.tag == f'{_DOCX_NS}p':
+            rows.append([''.join(t.text or '' for t in element.iter(f'{_DOCX_NS}t'))])
+        elif element.tag == f'{_DOCX_NS}tbl':
+            rows += [
+                [''.join(t.text or '' for t in cell.iter(f'{_DOCX_NS}t')) for cell in row.iter(f'{_DOCX_NS}tc')]
+                for row in element.iter(f'{_DOCX_NS}tr')
+            ]
+    return [('the document', _non_empty(rows))]
+
+
+def count_pdf_pages(file_path: str) -> int:
+    """Count pages in a PDF without a PDF library. Returns 0 if unknown."""
+    try:
+        data = Path(file_path).read_bytes()
+    except OSError:
+        return 0
+    pages = len(_PDF_PAGE_RE.findall(data))
+    if pages:
+        return pages
+    # Page objects can be hidden in compressed object streams; fall back to /Pages /Count
+    counts = [int(a or b) for a, b in _PDF_COUNT_RE.findall(data)]
+    return max(counts) if counts else 0
 
 
 def parse_extraction_response(response_content: str) -> list[dict]:
@@ -0,0 +1,398 @@
+"""
+Offline H2OGPTE stand-in and record/replay harness.
+FakeH2OGPTE implements the client surface used by this app (upload,
+collections, ingestion, chat sessions, streaming query, model listing) with
+configurable latency distributions and failure injection, so the upload
+pipeline, PDF fallback and analyst endpoints can be exercised and
+benchmarked without a live server. RecordingH2OGPTE wraps a real client and
+saves query responses that FakeH2OGPTE can replay.
+"""
+import hashlib
+import json
+import random
+import secrets
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+
+class FakeH2OGPTEError(ConnectionError):
+    """Injected transient failure."""
+
+
+@dataclass
+class PartialChatMessage:
+    id: str
+    content: str
+
+
+@dataclass
+class ChatMessage:
+    id: str
+    content: str
+
+
+@dataclass
+class CollectionInfo:
+    id: str
+    name: str
+    description: str = ''
+    document_count: int = 0
+
+
+@dataclass
+class DocumentInfo:
+    id: str
+    name: str
+
+
+class LatencyModel:
+    """Random delay in seconds: fixed:S, uniform:A:B, normal:MEAN:STD or lognormal:MU:SIGMA."""
+
+    def __init__(self, kind: str = 'fixed', *params: float):
+        if kind not in ('fixed', 'uniform', 'normal', 'lognormal'):
+            raise ValueError(f"Unknown latency distribution: {kind}")
+        self.kind = kind
+        self.params = params or (0.0,)
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyModel":
+        kind, *params = spec.split(':')
+        return cls(kind.strip(), *(float(p) for p in params))
+
+    def sample(self, rng: random.Random) -> float:
+        p = self.params
+        if self.kind == 'uniform':
+            value = rng.uniform(p[0], p[1])
+        elif self.kind == 'normal':
+            value = rng.gauss(p[0], p[1])
+        elif self.kind == 'lognormal':
+            value = rng.lognormvariate(p[0], p[1])
+        else:
+            value = p[0]
+        return max(0.0, value)
+
+
+def _parse_op_map(spec: str, convert) -> dict:
+    """Parse "op=value,op2=value2" (a bare value applies to every op as '*')."""
+    result = {}
+    for part in filter(None, (p.strip() for p in (spec or '').split(','))):
+        op, sep, value = part.partition('=')
+        if not sep:
+            op, value = '*', op
+        result[op.strip()] = convert(value.strip())
+    return result
+
+
+def replay_key(document_digests: list[str], message: str) -> str:
+    """Key for a recorded response: the documents in scope plus the prompt."""
+    payload = json.dumps([sorted(document_digests), message])
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+_FAKE_PRODUCTS = [
+    ('C9300-48P-A', 'Catalyst 9300 48-port PoE+ Network Advantage', 'Cisco', 8500.0),
+    ('FG-100F', 'FortiGate 100F Next-Gen Firewall', 'Fortinet', 3800.0),
+    ('HPE-DL360-G10', 'ProLiant DL360 Gen10 Server', 'HPE', 7800.0),
+    ('PA-5220', 'Palo Alto PA-5220 Next-Gen Firewall', 'Palo Alto', 45000.0),
+    ('VMW-VS8-STD', 'vSphere 8 Standard License', 'VMware', 1800.0),
+    ('SID-A330-A', 'RSA SecurID A330 Appliance', 'RSA', 27875.0),
+    ('QSFP-110G-SR4-S', '110GBASE SR4 QSFP Transceiver, MPO, 110M', 'Cisco', 375.0),
+    ('R640-BASE', 'PowerEdge R640 Rack Server', 'Dell', 6900.0),
+]
+
+
+class _FakeSession:
+    def __init__(self, client: "FakeH2OGPTE", chat_session_id: str):
+        self._client = client
+        self._chat_session_id = chat_session_id
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def query(self, message: str, llm: str = None, llm_args: dict = None, timeout: float = None,
+              callback=None, **kwargs) -> ChatMessage:
+        client = self._client
+        collection_id = client._chat_sessions.get(self._chat_session_id)
+        # Without retrieval the model only sees the message
+        llm_only = (kwargs.get('rag_config') or {}).get('rag_type') == 'llm_only'
+        digests = [] if llm_only else client._collection_digests(collection_id)
+        content = client._respond(message, llm_args or {}, digests)
+        delay = client._delay('query', timeout)
+
+        message_id = secrets.token_hex(8)
+        if callback is not None:
+            pieces = [content[i:i + 24] for i in range(0, len(content), 24)] or ['']
+            for piece in pieces:
+                time.sleep(delay / len(pieces))
+                callback(PartialChatMessage(id=message_id, content=piece))
+        else:
+            time.sleep(delay)
+
+        reply = ChatMessage(id=message_id, content=content)
+        if callback is not None:
+            callback(reply)
+        return reply
+
+
+class FakeH2OGPTE:
+    """In-memory H2OGPTE client with simulated latency, failures and replay."""
+
+    def __init__(self, latency: dict = None, failure_rate: dict = None, replay_dir: str = None,
+                 seed: int = None, models: list[str] = None, items_per_document: int = 6):
+        self.latency = latency or {}
+        self.failure_rate = failure_rate or {}
+        self.models = models or ['claude-sonnet-4-5', 'gpt-4o']
+        self.items_per_document = items_per_document
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._uploads: dict[str, tuple[str, str]] = {}
+        self._collections: dict[str, CollectionInfo] = {}
+        self._documents: dict[str, dict[str, tuple[str, str]]] = {}
+        self._chat_sessions: dict[str, "str | None"] = {}
+        self._replay: dict[str, str] = {}
+        if replay_dir:
+            self.load_recordings(replay_dir)
+        self.calls: dict[str, int] = {}
+
+    @classmethod
+    def from_settings(cls, replay: bool = False) -> "FakeH2OGPTE":
+        from procurement.config.settings import (
+            H2OGPTE_FAKE_LATENCY, H2OGPTE_FAKE_FAILURE_RATE, H2OGPTE_FAKE_SEED, H2OGPTE_RECORD_DIR,
+        )
+        return cls(
+            latency=_parse_op_map(H2OGPTE_FAKE_LATENCY, LatencyModel.parse),
+            failure_rate=_parse_op_map(H2OGPTE_FAKE_FAILURE_RATE, float),
+            replay_dir=H2OGPTE_RECORD_DIR if replay else None,
+            seed=int(H2OGPTE_FAKE_SEED) if H2OGPTE_FAKE_SEED else None,
+        )
+
+    def load_recordings(self, replay_dir: str) -> int:
+        """Load recorded responses written by RecordingH2OGPTE."""
+        loaded = 0
+        for path in Path(replay_dir).glob('*.json'):
+            try:
+                data = json.loads(path.read_text())
+                self._replay[data['key']] = data['content']
+                loaded += 1
+            except (OSError, ValueError, KeyError):
+                continue
+        return loaded
+
+    # --- simulation helpers ---
+
+    def _delay(self, op: str, timeout: float = None) -> float:
+        with self._lock:
+            self.calls[op] = self.calls.get(op, 0) + 1
+        model = self.latency.get(op, self.latency.get('*'))
+        rate = self.failure_rate.get(op, self.failure_rate.get('*', 0.0))
+        with self._rng_lock:
+            delay = model.sample(self._rng) if model else 0.0
+            fail = rate > 0 and self._rng.random() < rate
+        if fail:
+            raise FakeH2OGPTEError(f"Injected failure in {op}")
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"{op} timed out after {timeout}s")
+        return delay
+
+    def _wait(self, op: str, timeout: float = None):
+        time.sleep(self._delay(op, timeout))
+
+    def _collection_digests(self, collection_id: "str | None") -> list[str]:
+        if not collection_id:
+            return []
+        with self._lock:
+            return [digest for _, digest in self._documents.get(collection_id, {}).values()]
+
+    def _respond(self, message: str, llm_args: dict, digests: list[str]) -> str:
+        recorded = self._replay.get(replay_key(digests, message))
+        if recorded is not None:
+            return recorded
+
+        schema = llm_args.get('guided_json') or {}
+        properties = schema.get('properties', {})
+        if 'items' in properties:
+            return json.dumps({'items': self._fake_items(digests, message)})
+        if 'found' in properties:
+            return json.dumps({'found': False, 'base_price': None, 'item_description': '', 'brand': ''})
+        if "'YES' or 'NO'" in message:
+            return 'YES'
+        return ("Simulated analyst response (offline H2OGPTE stand-in). "
+                f"The question was {len(message)} characters long including context.")
+
+    def _fake_items(self, digests: list[str], message: str) -> list[dict]:
+        rng = random.Random(digests[0] if digests else message)
+        items = []
+        ref = f"FAKE-QT-{rng.randint(1000, 9999)}"
+        for i in range(self.items_per_document):
+            sku, desc, brand, base = _FAKE_PRODUCTS[(i + rng.randint(0, 7)) % len(_FAKE_PRODUCTS)]
+            qty = rng.choice([1, 2, 5, 10, 20])
+            price = round(base * rng.uniform(0.9, 1.1), 2)
+            items.append({
+                'SKU': sku, 'Distributor': 'Offline Distribution Pte Ltd', 'Item Description': desc,
+                'Brand': brand, 'Quote Currency': 'USD', 'Quantity': qty, 'Serial No': f"SN{rng.randint(10**6, 10**7)}",
+                'Start Date': '2026-01-01', 'End Date': '2026-12-31', 'Unit Price': price,
+                'Total Price': round(price * qty, 2), 'EU Company': 'Company A', 'Comments/Notes': '',
+                'Quotation Ref No': ref, 'Quotation Date': '2025-12-15', 'Quotation End Date': '2026-01-14',
+                'Quotation Validity': '30 days',
+            })
+        return items
+
+    # --- client surface ---
+
+    def get_llms(self) -> list[dict]:
+        self._wait('get_llms')
+        return [{'name': m, 'display_name': m} for m in self.models]
+
+    def upload(self, file_name: str, file) -> str:
+        data = file.read()
+        self._wait('upload')
+        upload_id = secrets.token_hex(8)
+        with self._lock:
+            self._uploads[upload_id] = (file_name, hashlib.sha256(data).hexdigest())
+        return upload_id
+
+    def create_collection(self, name: str, description: str = '', **kwargs) -> str:
+        self._wait('create_collection')
+        collection_id = secrets.token_hex(8)
+        with self._lock:
+            self._collections[collection_id] = CollectionInfo(collection_id, name, description)
+            self._documents[collection_id] = {}
+        return collection_id
+
+    def ingest_uploads(self, collection_id: str, upload_ids: list[str], timeout: float = None, **kwargs):
+        self._wait('ingest', timeout)
+        with self._lock:
+            if collection_id not in self._collections:
+                raise ValueError(f"Collection not found: {collection_id}")
+            for upload_id in upload_ids:
+                name, digest = self._uploads.pop(upload_id)
+                self._documents[collection_id][secrets.token_hex(8)] = (name, digest)
+            self._collections[collection_id].document_count = len(self._documents[collection_id])
+
+    def update_collection(self, collection_id: str, name: str, description: str) -> str:
+        self._wait('update_collection')
+        with self._lock:
+            if collection_id not in self._collections:
+                raise ValueError(f"Collection not found: {collection_id}")
+            self._collections[collection_id].name = name
+            self._collections[collection_id].description = description
+        return collection_id
+
+    def create_chat_session(self, collection_id: str = None) -> str:
+        self._wait('chat_session')
+        chat_session_id = secrets.token_hex(8)
+        with self._lock:
+            self._chat_sessions[chat_session_id] = collection_id
+        return chat_session_id
+
+    def connect(self, chat_session_id: str) -> _FakeSession:
+        return _FakeSession(self, chat_session_id)
+
+    def delete_chat_sessions(self, chat_session_ids: list[str], **kwargs):
+        self._wait('delete')
+        with self._lock:
+            for chat_session_id in chat_session_ids:
+                self._chat_sessions.pop(chat_session_id, None)
+
+    def delete_collections(self, collection_ids: list[str], timeout: float = None, **kwargs):
+        self._wait('delete', timeout)
+        with self._lock:
+            for collection_id in collection_ids:
+                self._collections.pop(collection_id, None)
+                self._documents.pop(collection_id, None)
+
+    def list_recent_collections(self, offset: int = 0, limit: int = 100, **kwargs) -> list[CollectionInfo]:
+        self._wait('list')
+        with self._lock:
+            return list(self._collections.values())[offset:offset + limit]
+
+    def list_documents_in_collection(self, collection_id: str, offset: int = 0, limit: int = 100,
+                                     **kwargs) -> list[DocumentInfo]:
+        self._wait('list')
+        with self._lock:
+            docs = self._documents.get(collection_id, {})
+            return [DocumentInfo(doc_id, name) for doc_id, (name, _) in docs.items()][offset:offset + limit]
+
+    def delete_documents_from_collection(self, collection_id: str, document_ids: list[str], **kwargs):
+        self._wait('delete')
+        with self._lock:
+            docs = self._documents.get(collection_id, {})
+            for doc_id in document_ids:
+                docs.pop(doc_id, None)
+            if collection_id in self._collections:
+                self._collections[collection_id].document_count = len(docs)
+
+
+class _RecordingSession:
+    def __init__(self, recorder: "RecordingH2OGPTE", inner_ctx, chat_session_id: str):
+        self._recorder = recorder
+        self._inner_ctx = inner_ctx
+        self._chat_session_id = chat_session_id
+        self._session = None
+
+    def __enter__(self):
+        self._session = self._inner_ctx.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._inner_ctx.__exit__(*exc)
+
+    def query(self, message: str, *args, **kwargs):
+        reply = self._session.query(message, *args, **kwargs)
+        self._recorder._save(self._chat_session_id, message, reply.content)
+        return reply
+
+
+class RecordingH2OGPTE:
+    """Proxy around a live client that records query responses for replay."""
+
+    def __init__(self, inner, record_dir: str):
+        self._inner = inner
+        self._dir = Path(record_dir)
+        self._dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._upload_digests: dict[str, str] = {}
+        self._collection_digests: dict[str, list[str]] = {}
+        self._chat_collections: dict[str, "str | None"] = {}
+
+    def __getattr__(self, name):
+        return getattr(self._inner, name)
+
+    def upload(self, file_name: str, file):
+        data = file.read()
+        import io
+        upload_id = self._inner.upload(file_name, io.BytesIO(data))
+        with self._lock:
+            self._upload_digests[upload_id] = hashlib.sha256(data).hexdigest()
+        return upload_id
+
+    def ingest_uploads(self, collection_id: str, upload_ids: list[str], *args, **kwargs):
+        result = self._inner.ingest_uploads(collection_id, upload_ids, *args, **kwargs)
+        with self._lock:
+            digests = self._collection_digests.setdefault(collection_id, [])
+            digests.extend(self._upload_digests.pop(u) for u in upload_ids if u in self._upload_digests)
+        return result
+
+    def create_chat_session(self, collection_id: str = None, *args, **kwargs):
+        chat_session_id = self._inner.create_chat_session(collection_id, *args, **kwargs)
+        with self._lock:
+            self._chat_collections[chat_session_id] = collection_id
+        return chat_session_id
+
+    def connect(self, chat_session_id: str):
+        return _RecordingSession(self, self._inner.connect(chat_session_id), chat_session_id)
+
+    def _save(self, chat_session_id: str, message: str, content: str):
+        with self._lock:
+            collection_id = self._chat_collections.get(chat_session_id)
+            digests = list(self._collection_digests.get(collection_id, [])) if collection_id else []
+        key = replay_key(digests, message)
+        record = {'key': key, 'documents': digests, 'prompt': message, 'content': content}
+        (self._dir / f"{key}.json").write_text(json.dumps(record, indent=2))
@@ -0,0 +1,121 @@
+"""
+Background H2OGPTE health monitor.
+Probes the service on an interval (model listing only, no LLM queries) and
+keeps the last result so health endpoints answer from memory.
+"""
+import threading
+import time
+from dataclasses import dataclass, asdict
+from datetime import datetime
+
+from procurement.config.settings import HEALTH_PROBE_INTERVAL_SECONDS, HEALTH_PROBE_TIMEOUT_SECONDS
+from procurement.services.llm_service import get_h2ogpte_client
+from procurement.services.model_registry import model_registry
+
+
+@dataclass
+class HealthSnapshot:
+    connected: bool = False
+    model: "str | None" = None
+    error: "str | None" = None
+    latency_ms: "float | None" = None
+    checked_at: "str | None" = None
+
+
+class HealthMonitor:
+    """Periodic prober holding the latest HealthSnapshot."""
+
+    def __init__(self, interval: float = HEALTH_PROBE_INTERVAL_SECONDS,
+                 timeout: float = HEALTH_PROBE_TIMEOUT_SECONDS):
+        self.interval = interval
+        self.timeout = timeout
+        self._snapshot = HealthSnapshot(error="Health probe pending")
+        self._lock = threading.Lock()
+        self._inflight: "threading.Event | None" = None
+        self._stop = threading.Event()
+        self._thread: "threading.Thread | None" = None
+        self._probe: "threading.Thread | None" = None
+
+    @property
+    def snapshot(self) -> HealthSnapshot:
+        return self._snapshot
+
+    def _run_probe(self) -> HealthSnapshot:
+        started = time.monotonic()
+        result: dict = {}
+
+        # A probe that outlived its timeout is still hung on the service; don't stack another thread on it
+        if self._probe is not None and self._probe.is_alive():
+            return HealthSnapshot(connected=False, error="Previous health probe still running",
+                                  latency_ms=0.0, checked_at=datetime.now().isoformat(timespec='seconds'))
+
+        def _probe():
+            try:
+                client = get_h2ogpte_client()
+                models = model_registry.refresh(client, timeout=self.timeout)
+                last_error = model_registry.snapshot()['last_error']
+                if last_error or models is None:
+                    raise RuntimeError(last_error or "Model listing failed")
+                if not models:
+                    raise RuntimeError("No models available")
+                result['model'] = model_registry.best_model(client)
+            except Exception as e:
+                result['error'] = str(e)
+
+        worker = self._probe = threading.Thread(target=_probe, name='h2ogpte-health-probe', daemon=True)
+        worker.start()
+        worker.join(self.timeout)
+
+        latency_ms = round((time.monotonic() - started) * 1000, 1)
+        checked_at = datetime.now().isoformat(timespec='seconds')
+        if worker.is_alive():
+            return HealthSnapshot(connected=False, error=f"Health probe timed out after {self.timeout}s",
+                                  latency_ms=latency_ms, checked_at=checked_at)
+        if 'error' in result:
+            return HealthSnapshot(connected=False, error=result['error'],
+                                  latency_ms=latency_ms, checked_at=checked_at)
+        return HealthSnapshot(connected=True, model=result.get('model'),
+                              latency_ms=latency_ms, checked_at=checked_at)
+
+    def probe_now(self) -> HealthSnapshot:
+        """Probe immediately; concurrent callers share one probe."""
+        with self._lock:
+            inflight = self._inflight
+            owner = inflight is None
+            if owner:
+                inflight = self._inflight = threading.Event()
+
+        if not owner:
+            inflight.wait(self.timeout + 1)
+            return self._snapshot
+
+        try:
+            self._snapshot = self._run_probe()
+        finally:
+            with self._lock:
+                self._inflight = None
+            inflight.set()
+        return self._snapshot
+
+    def start(self):
+        """Start the background probe loop (idempotent)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+
+        def _loop():
+            while not self._stop.is_set():
+                self.probe_now()
+                self._stop.wait(self.interval)
+
+        self._thread = threading.Thread(target=_loop, name='h2ogpte-health-monitor', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def as_dict(self) -> dict:
+        return asdict(self._snapshot)
+
+
+health_monitor = HealthMonitor()
@@ -0,0 +1,162 @@
+"""
+Shared H2OGPTE ingestion sessions.
+A document is uploaded and ingested once per content hash; verification and
+extraction then query the same pooled collection. Idle sessions hand their
+collection back to the pool when their lease expires.
+"""
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from procurement.config.settings import INGESTION_LEASE_SECONDS, INGESTION_TIMEOUT_SECONDS
+from procurement.services.collection_pool import collection_pool
+from procurement.services.llm_service import get_h2ogpte_client
+
+_sessions: dict[str, "IngestionSession"] = {}
+_sessions_lock = threading.Lock()
+_reaper_thread = None
+
+
+@dataclass
+class IngestionSession:
+    content_hash: str
+    filename: str
+    collection_id: str = None
+    expires_at: float = 0.0
+    in_use: int = 0
+    error: str = None
+    ready: threading.Event = field(default_factory=threading.Event)
+
+
+def _file_digest(file_path: str) -> str:
+    """SHA-256 of the file contents."""
+    h = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _ingest(client, session: IngestionSession, file_path: str):
+    """Upload the file and ingest it into a pooled collection."""
+    with open(file_path, 'rb') as f:
+        upload_id = client.upload(session.filename, f)
+
+    session.collection_id = collection_pool.acquire(client)
+    client.ingest_uploads(session.collection_id, [upload_id], timeout=INGESTION_TIMEOUT_SECONDS)
+
+
+def _release_collection(client, collection_id: str):
+    if not collection_id:
+        return
+    try:
+        collection_pool.release(collection_id, client)
+    except Exception:
+        pass
+
+
+def _ensure_reaper():
+    """Start the background lease reaper once per process."""
+    global _reaper_thread
+    if _reaper_thread is not None and _reaper_thread.is_alive():
+        return
+
+    def _loop():
+        interval = max(5, min(60, INGESTION_LEASE_SECONDS // 2))
+        while True:
+            time.sleep(interval)
+            reap_expired_sessions()
+
+    _reaper_thread = threading.Thread(target=_loop, name='ingestion-reaper', daemon=True)
+    _reaper_thread.start()
+
+
+def reap_expired_sessions() -> int:
+    """Release collections of sessions whose lease expired and are not in use."""
+    now = time.monotonic()
+    expired = []
+    with _sessions_lock:
+        for key, sess in list(_sessions.items()):
+            if sess.ready.is_set() and sess.in_use == 0 and sess.expires_at <= now:
+                expired.append(_sessions.pop(key))
+
+    if expired:
+        client = get_h2ogpte_client()
+        for sess in expired:
+            _release_collection(client, sess.collection_id)
+    return len(expired)
+
+
+@contextmanager
+def ingestion_session(file_path: str, filename: str, llm_client=None, release: bool = False):
+    """Yield an ingested session for the file, creating it on first use.
+
+    Concurrent callers for the same content wait for a single ingest. The
+    lease is renewed on exit; with release=True the collection goes back to
+    the pool as soon as no other caller is using it.
+    """
+    client = llm_client or get_h2ogpte_client()
+    digest = _file_digest(file_path)
+
+    with _sessions_lock:
+        session = _sessions.get(digest)
+        owner = session is None
+        if owner:
+            session = IngestionSession(content_hash=digest, filename=filename)
+            _sessions[digest] = session
+        session.in_use += 1
+
+    if owner:
+        try:
+            _ingest(client, session, file_path)
+        except Exception as e:
+            session.error = str(e)
+            with _sessions_lock:
+                session.in_use -= 1
+                _sessions.pop(digest, None)
+            _release_collection(client, session.collection_id)
+            raise
+        finally:
+            session.ready.set()
+        _ensure_reaper()
+    else:
+        if not session.ready.wait(INGESTION_TIMEOUT_SECONDS):
+            with _sessions_lock:
+                session.in_use -= 1
+            raise TimeoutError(f"Timed out waiting for ingestion of {filename}")
+        if session.error:
+            with _sessions_lock:
+                session.in_use -= 1
+            raise RuntimeError(f"Ingestion failed: {session.error}")
+
+    try:
+        yield session
+    finally:
+        drop = False
+        with _sessions_lock:
+            session.in_use -= 1
+            session.expires_at = time.monotonic() + INGESTION_LEASE_SECONDS
+            if release and session.in_use == 0 and _sessions.get(digest) is session:
+                _sessions.pop(digest)
+                drop = True
+        if drop:
+            _release_collection(client, session.collection_id)
+
+
+def get_active_sessions() -> list[dict]:
+    """Snapshot of live ingestion sessions (for diagnostics)."""
+    now = time.monotonic()
+    with _sessions_lock:
+        return [
+            {
+                'content_hash': s.content_hash,
+                'filename': s.filename,
+                'collection_id': s.collection_id,
+                'in_use': s.in_use,
+                'ready': s.ready.is_set(),
+                'lease_remaining': max(0.0, round(s.expires_at - now, 1)) if s.ready.is_set() else None,
+            }
+            for s in _sessions.values()
+        ]
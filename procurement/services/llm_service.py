@@ -1,27 +1,28 @@
 """
 H2OGPTE LLM service for document verification, extraction support, and analyst queries.
 """
-import os
-import secrets
-from dataclasses import dataclass, field
+from contextlib import contextmanager
+from dataclasses import dataclass, field, replace
+from typing import Callable
 
-from procurement.config.settings import H2OGPTE_API_KEY, H2OGPTE_ADDRESS
+from procurement.config.settings import (
+    ANALYST_TOOLS, H2OGPTE_API_KEY, H2OGPTE_ADDRESS, H2OGPTE_MODE, H2OGPTE_RECORD_DIR, MODEL_OVERRIDES,
+)
+from procurement.services.model_registry import model_registry
+from procurement.services.resilience import H2OGPTEUnavailable, ResilientH2OGPTE, is_transient
 
 _h2ogpte_client = None
 
-# Model preference order
-_MODEL_PREFERENCE = [
-    'claude-opus-4-1', 'claude-opus-4', 'claude-sonnet-4-5', 'claude-sonnet-4',
-    'gpt-5-mini', 'o3', 'o4-mini', 'gpt-4.1', 'gpt-4o',
-    'gemini-2.5-pro', 'claude-3-5-sonnet',
-]
-
 
 @dataclass
 class AnalystResponse:
     response: str
     suggestions: list = field(default_factory=list)
     confidence: float = 0.85
+    conversation_id: str = None
+    tool: str = None
+    data: dict = None
+    cache: str = None
 
 
 def get_h2ogpte_client():
@@ -30,16 +31,47 @@ def get_h2ogpte_client():
     if _h2ogpte_client is not None:
         return _h2ogpte_client
 
+    if H2OGPTE_MODE in ('fake', 'replay'):
+        from procurement.services.fake_h2ogpte import FakeH2OGPTE
+        _h2ogpte_client = ResilientH2OGPTE(FakeH2OGPTE.from_settings(replay=H2OGPTE_MODE == 'replay'))
+        return _h2ogpte_client
+
     if not H2OGPTE_API_KEY or not H2OGPTE_ADDRESS:
         raise RuntimeError(
             "H2OGPTE is not configured. Set H2OGPTE_API_KEY and H2OGPTE_ADDRESS in .env"
         )
 
     from h2ogpte import H2OGPTE
-    _h2ogpte_client = H2OGPTE(address=H2OGPTE_ADDRESS, api_key=H2OGPTE_API_KEY)
+    client = H2OGPTE(address=H2OGPTE_ADDRESS, api_key=H2OGPTE_API_KEY)
+    if H2OGPTE_MODE == 'record':
+        from procurement.services.fake_h2ogpte import RecordingH2OGPTE
+        client = RecordingH2OGPTE(client, H2OGPTE_RECORD_DIR)
+    _h2ogpte_client = ResilientH2OGPTE(client)
     return _h2ogpte_client
 
 
+@contextmanager
+def temporary_chat(client, collection_id: str = None):
+    """Connected chat session on a collection, deleted on exit so sessions do not pile up on H2OGPTE."""
+    chat_session_id = client.create_chat_session(collection_id)
+    try:
+        with client.connect(chat_session_id) as session:
+            yield session
+    finally:
+        try:
+            client.delete_chat_sessions([chat_session_id])
+        except Exception:
+            pass
+
+
+def get_h2ogpte_metrics() -> dict:
+    """Limiter, retry and circuit breaker counters for the shared client."""
+    metrics = getattr(_h2ogpte_client, 'metrics', None)
+    if metrics is None:
+        return {'circuit': None, 'operations': {}}
+    return metrics()
+
+
 def verify_h2ogpte_connection() -> bool:
     """Verify H2OGPTE connectivity by listing models. Returns True if OK."""
     try:
@@ -50,32 +82,20 @@ def verify_h2ogpte_connection() -> bool:
         return False
 
 
-def get_best_llm(client) -> str:
-    """Select the best available LLM from the preference list."""
-    try:
-        models = client.get_llms()
-    except Exception:
-        return 'auto'
-
-    model_ids = []
-    for m in models:
-        if isinstance(m, str):
-            model_ids.append(m)
-        elif isinstance(m, dict):
-            model_ids.append(m.get('name', m.get('display_name', '')))
-        else:
-            model_ids.append(getattr(m, 'name', getattr(m, 'display_name', str(m))))
+def get_best_llm(client, task: str = None) -> str:
+    """Select the best available LLM for a task from the cached model registry.
 
-    model_ids_lower = [mid.lower() for mid in model_ids]
+    Never blocks on model listing: returns a per-task override if configured,
+    otherwise the cached choice ('auto' until the first listing completes).
+    """
+    return model_registry.best_model(client, task)
 
-    for pref in _MODEL_PREFERENCE:
-        for i, mid_lower in enumerate(model_ids_lower):
-            if pref.lower() in mid_lower:
-                return model_ids[i]
 
-    if model_ids:
-        return model_ids[0]
-    return 'auto'
+def stream_delta(message) -> str:
+    """Text delta carried by an h2ogpte streaming callback message ('' for the final message)."""
+    if type(message).__name__ != 'PartialChatMessage':
+        return ''
+    return getattr(message, 'content', '') or ''
 
 
 _CATALOG_PDF_JSON_SCHEMA = {
@@ -93,12 +113,14 @@ _CATALOG_PDF_JSON_SCHEMA = {
 def query_catalog_pdf(collection_id: str, sku: str, description: str = None) -> "dict | None":
     """Query a PDF catalog collection for product details and pricing for a given SKU.
 
-    Returns a dict with {found, base_price, item_description, brand} or None on failure.
+    Returns a dict with {found, base_price, item_description, brand}, or None if
+    the reply is unusable. Transient H2OGPTE errors and fast-fail rejections are
+    raised so a lookup is not mistaken for a negative result.
     """
     import json
 
     client = get_h2ogpte_client()
-    best_model = get_best_llm(client)
+    best_model = get_best_llm(client, task='catalog')
 
     desc_hint = f" (description: '{description}')" if description else ""
     prompt = (
@@ -110,8 +132,7 @@ def query_catalog_pdf(collection_id: str, sku: str, description: str = None) ->
     )
 
     try:
-        chat_session_id = client.create_chat_session(collection_id)
-        with client.connect(chat_session_id) as session:
+        with temporary_chat(client, collection_id) as session:
             reply = session.query(
                 prompt,
                 llm=best_model,
@@ -122,80 +143,169 @@ def query_catalog_pdf(collection_id: str, sku: str, description: str = None) ->
                 },
                 timeout=60,
             )
+    except Exception as e:
+        if is_transient(e) or isinstance(e, H2OGPTEUnavailable):
+            # Let callers tell "H2OGPTE unavailable" apart from "not in this catalog"
+            raise
+        return None
 
+    try:
         data = json.loads(reply.content)
-        return {
-            'found': bool(data.get('found', False)),
-            'base_price': data.get('base_price'),
-            'item_description': data.get('item_description', ''),
-            'brand': data.get('brand', ''),
-            'raw_response': reply.content,
-        }
-    except Exception:
+    except ValueError:
         return None
+    if not isinstance(data, dict):
+        return None
+    return {
+        'found': bool(data.get('found', False)),
+        'base_price': data.get('base_price'),
+        'item_description': data.get('item_description', ''),
+        'brand': data.get('brand', ''),
+        'raw_response': reply.content,
+    }
 
 
 def verify_procurement_document(file_path: str, filename: str) -> bool:
-    """Quick pre-check whether a file is a procurement document."""
-    client = get_h2ogpte_client()
-    best_model = get_best_llm(client)
-    collection_id = None
+    """Quick pre-check whether a file is a procurement document.
 
-    try:
-        with open(file_path, 'rb') as f:
-            upload_id = client.upload(filename, f)
+    The ingested collection is kept alive (leased) so a following extraction
+    of the same file reuses it instead of ingesting again.
+    """
+    from procurement.services.ingestion import ingestion_session
 
-        collection_id = client.create_collection(
-            name=f"verify_{secrets.token_hex(4)}",
-            description="Document verification",
-        )
-        client.ingest_uploads(collection_id, [upload_id], timeout=60)
+    client = get_h2ogpte_client()
+    best_model = get_best_llm(client, task='verification')
 
-        chat_session_id = client.create_chat_session(collection_id)
-        with client.connect(chat_session_id) as session:
-            reply = session.query(
-                "Is this a procurement quotation, purchase order, invoice, or price list document? "
-                "Answer with ONLY 'YES' or 'NO'.",
-                llm=best_model,
-                llm_args={'temperature': 0.0},
-                timeout=30,
-            )
+    try:
+        with ingestion_session(file_path, filename, llm_client=client) as ingested:
+            with temporary_chat(client, ingested.collection_id) as session:
+                reply = session.query(
+                    "Is this a procurement quotation, purchase order, invoice, or price list document? "
+                    "Answer with ONLY 'YES' or 'NO'.",
+                    llm=best_model,
+                    llm_args={'temperature': 0.0},
+                    timeout=30,
+                )
         return 'YES' in reply.content.upper()
     except Exception:
         return False
-    finally:
-        if collection_id:
-            try:
-                client.delete_collections([collection_id])
-            except Exception:
-                pass
 
 
 def query_analyst(
     query: str,
     context_records: list[dict] = None,
     historical_summary: dict = None,
+    conversation_id: str = None,
+    on_token: "Callable[[str], None] | None" = None,
 ) -> AnalystResponse:
-    """Send a question to the AI analyst with procurement context."""
+    """Send a question to the AI analyst with procurement context.
+
+    Context is assembled per question within a token budget (see
+    analyst_context). Turns of the same conversation reuse one chat session:
+    the system prompt goes out on the first turn, and later turns only add
+    records and aggregates the session has not seen. With on_token, response
+    text is passed to it piece by piece as it streams in.
+
+    Suggestion chip questions matched by an analytics tool are answered from
+    the database first, scoped to context_records (ANALYST_TOOLS): directly
+    with 'template', or with the exact result handed to the LLM to phrase
+    with 'llm'.
+
+    Opening questions (no conversation history) that reach the LLM are
+    cached by question, context and data version; the response's cache field
+    is 'hit' or 'miss' for those and None otherwise.
+    """
+    from procurement.services.analyst_cache import analyst_cache, cache_key
+    from procurement.services.analyst_context import AnalystContext, build_analyst_context
+    from procurement.services.analyst_sessions import conversation_store
+    from procurement.services.analytics import answer_with_tools
+    from procurement.services.database import get_data_version
+
+    tool_result = None
+    if ANALYST_TOOLS in ('template', 'llm'):
+        try:
+            tool_result = answer_with_tools(query, context_records)
+        except Exception:
+            tool_result = None  # fall back to the LLM
+
+    if tool_result is not None and ANALYST_TOOLS == 'template':
+        conversation_id = conversation_store.add_note(
+            conversation_id, f"Earlier question: {query}\nAnswer (computed from the database):\n{tool_result.summary}"
+        )
+        if on_token is not None:
+            on_token(tool_result.summary)
+        return AnalystResponse(
+            response=tool_result.summary,
+            suggestions=_generate_suggestions(query),
+            confidence=1.0,
+            conversation_id=conversation_id,
+            tool=tool_result.tool,
+            data=tool_result.data,
+        )
+
+    key = None
+    if analyst_cache.enabled and conversation_store.is_fresh(conversation_id):
+        try:
+            key = cache_key(query, context_records, historical_summary, get_data_version())
+        except Exception:
+            key = None
+    cached = analyst_cache.get(key) if key else None
+    if cached is not None:
+        conversation_id = conversation_store.add_note(
+            conversation_id, f"Earlier question: {query}\nAnswer:\n{cached.response}"
+        )
+        if on_token is not None:
+            on_token(cached.response)
+        return replace(cached, conversation_id=conversation_id, cache='hit')
+
     client = get_h2ogpte_client()
-    system_prompt = _build_analyst_system_prompt(context_records, historical_summary)
 
     try:
-        chat_session_id = client.create_chat_session()
-        with client.connect(chat_session_id) as session:
-            reply = session.query(
-                f"{system_prompt}\n\nUser Question: {query}",
-                llm='auto',
-                llm_args={'temperature': 0.7},
-                timeout=60,
-            )
+        with conversation_store.turn(conversation_id, client) as conv:
+            conversation_id = conv.conversation_id
+            new_summary = conv.summary_delta(historical_summary)
+            if tool_result is not None:
+                context = AnalystContext(text="Exact result computed from the database "
+                                              f"(use these numbers, do not recompute):\n{tool_result.summary}")
+            else:
+                context = build_analyst_context(query, context_records, new_summary, exclude=conv.sent_keys)
+            notes, conv.notes = conv.notes, []
+            context_text = '\n\n'.join(notes + [context.text]) if context.text else '\n\n'.join(notes)
+            if conv.turns == 0:
+                prompt = _build_analyst_system_prompt(context_text)
+            else:
+                prompt = f"Additional context:\n{context_text}" if context_text else ''
+
+            stream_args = {}
+            if on_token is not None:
+                def _forward(message):
+                    delta = stream_delta(message)
+                    if delta:
+                        on_token(delta)
+                stream_args['callback'] = _forward
+
+            with client.connect(conv.chat_session_id) as session:
+                reply = session.query(
+                    f"{prompt}\n\nUser Question: {query}" if prompt else f"User Question: {query}",
+                    llm=MODEL_OVERRIDES.get('analyst') or 'auto',
+                    llm_args={'temperature': 0.7},
+                    timeout=60,
+                    **stream_args,
+                )
+            conv.mark_sent(context.keys, new_summary if tool_result is None else None)
 
         suggestions = _generate_suggestions(query)
-        return AnalystResponse(
+        result = AnalystResponse(
             response=reply.content,
             suggestions=suggestions,
             confidence=0.85,
+            conversation_id=conversation_id,
+            tool=tool_result.tool if tool_result else None,
+            data=tool_result.data if tool_result else None,
+            cache='miss' if key else None,
         )
+        if key:
+            analyst_cache.put(key, result)
+        return result
     except Exception as e:
         return AnalystResponse(
             response=f"I encountered an error processing your question: {str(e)}",
@@ -204,31 +314,16 @@ def query_analyst(
         )
 
 
-def _build_analyst_system_prompt(
-    context_records: list[dict] = None,
-    historical_summary: dict = None,
-) -> str:
+def _build_analyst_system_prompt(context_text: str = '') -> str:
     """Build the system prompt with procurement data context."""
-    import json
-
     parts = [
         "You are a procurement analyst assistant powered by H2OGPTE. "
         "You help analyze procurement data, compare pricing, identify trends, "
-        "and provide actionable recommendations for procurement decisions."
+        "and provide actionable recommendations for procurement decisions. "
+        "Record data is given as pipe-separated tables with a header row."
     ]
-
-    if context_records:
-        parts.append(f"\n\nCurrent Records ({len(context_records)} items):")
-        sample = context_records[:10]
-        parts.append(json.dumps(sample, indent=2, default=str))
-        if len(context_records) > 10:
-            skus = list({r.get('sku', '') for r in context_records if r.get('sku')})
-            parts.append(f"\n... and {len(context_records) - 10} more records. All SKUs: {', '.join(skus[:20])}")
-
-    if historical_summary:
-        parts.append(f"\n\nHistorical Summary:")
-        parts.append(json.dumps(historical_summary, indent=2, default=str))
-
+    if context_text:
+        parts.append(f"\n\n{context_text}")
     return '\n'.join(parts)
 
 
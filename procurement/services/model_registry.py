@@ -0,0 +1,140 @@
+"""
+Cached H2OGPTE model discovery.
+Keeps the resolved model list for MODEL_CACHE_TTL_SECONDS and refreshes it in
+the background (stale-while-revalidate), so callers never wait on get_llms().
+Concurrent refreshes are coalesced into a single remote call.
+"""
+import threading
+import time
+
+from procurement.config.settings import MODEL_CACHE_TTL_SECONDS, MODEL_OVERRIDES
+
+# Model preference order
+MODEL_PREFERENCE = [
+    'claude-opus-4-1', 'claude-opus-4', 'claude-sonnet-4-5', 'claude-sonnet-4',
+    'gpt-5-mini', 'o3', 'o4-mini', 'gpt-4.1', 'gpt-4o',
+    'gemini-2.5-pro', 'claude-3-5-sonnet',
+]
+
+# Minimum delay between refresh attempts after a failed listing
+_RETRY_AFTER_FAILURE_SECONDS = 30
+
+
+def _model_ids(models) -> list[str]:
+    """Normalize get_llms() output (strings, dicts or objects) to model names."""
+    model_ids = []
+    for m in models:
+        if isinstance(m, str):
+            model_ids.append(m)
+        elif isinstance(m, dict):
+            model_ids.append(m.get('name', m.get('display_name', '')))
+        else:
+            model_ids.append(getattr(m, 'name', getattr(m, 'display_name', str(m))))
+    return model_ids
+
+
+def pick_best_model(model_ids: list[str]) -> str:
+    """Select the best available model from the preference list."""
+    model_ids_lower = [mid.lower() for mid in model_ids]
+
+    for pref in MODEL_PREFERENCE:
+        for i, mid_lower in enumerate(model_ids_lower):
+            if pref.lower() in mid_lower:
+                return model_ids[i]
+
+    if model_ids:
+        return model_ids[0]
+    return 'auto'
+
+
+class ModelRegistry:
+    """Process-wide cache of available models with single-flight refresh."""
+
+    def __init__(self, ttl: float = MODEL_CACHE_TTL_SECONDS):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._model_ids: "list[str] | None" = None
+        self._best: str = 'auto'
+        self._fetched_at = 0.0
+        self._last_attempt = 0.0
+        self._last_error: "str | None" = None
+        self._inflight: "threading.Event | None" = None
+
+    def _is_stale(self, now: float) -> bool:
+        if self._model_ids is None or now - self._fetched_at >= self.ttl:
+            retry_after = _RETRY_AFTER_FAILURE_SECONDS if self._last_error else 0
+            return now - self._last_attempt >= retry_after
+        return False
+
+    def best_model(self, client, task: str = None) -> str:
+        """Return the model for a task without blocking on model listing.
+
+        Per-task overrides from settings win. Otherwise the cached best model
+        is returned ('auto' until the first listing completes) and a
+        background refresh is started if the cache is stale.
+        """
+        override = MODEL_OVERRIDES.get(task) if task else None
+        if override:
+            return override
+
+        if self._is_stale(time.monotonic()):
+            self.refresh_async(client)
+        return self._best
+
+    def _claim(self) -> "tuple[threading.Event, bool]":
+        """The in-flight refresh event, and whether the caller started it and must fetch."""
+        with self._lock:
+            if self._inflight is not None:
+                return self._inflight, False
+            self._inflight = threading.Event()
+            self._last_attempt = time.monotonic()
+            return self._inflight, True
+
+    def _fetch(self, client, inflight: threading.Event):
+        try:
+            model_ids = _model_ids(client.get_llms())
+            with self._lock:
+                self._model_ids = model_ids
+                self._best = pick_best_model(model_ids)
+                self._fetched_at = time.monotonic()
+                self._last_error = None
+        except Exception as e:
+            with self._lock:
+                self._last_error = str(e)
+        finally:
+            with self._lock:
+                self._inflight = None
+            inflight.set()
+
+    def refresh(self, client, timeout: float = None) -> "list[str] | None":
+        """Refresh the model list now; joins an in-flight refresh if there is one.
+
+        Raises TimeoutError if the joined refresh is still running after timeout seconds.
+        """
+        inflight, owner = self._claim()
+        if owner:
+            self._fetch(client, inflight)
+        elif not inflight.wait(timeout):
+            raise TimeoutError(f"Model refresh still running after {timeout}s")
+        return self._model_ids
+
+    def refresh_async(self, client):
+        """Start a background refresh unless one is already running."""
+        inflight, owner = self._claim()
+        if owner:
+            threading.Thread(target=self._fetch, args=(client, inflight), name='model-registry-refresh',
+                             daemon=True).start()
+
+    def snapshot(self) -> dict:
+        """Current cache state (for diagnostics)."""
+        now = time.monotonic()
+        return {
+            'best_model': self._best,
+            'models': list(self._model_ids or []),
+            'age_seconds': round(now - self._fetched_at, 1) if self._model_ids is not None else None,
+            'last_error': self._last_error,
+            'overrides': {k: v for k, v in MODEL_OVERRIDES.items() if v},
+        }
+
+
+model_registry = ModelRegistry()
@@ -0,0 +1,119 @@
+"""
+Mergeable quantile sketches for historical prices.
+A merging t-digest: values are summarized as weighted centroids, small at the
+tails and larger around the median, so p10/p50/p90 stay accurate in a few KB
+per SKU. Digests can be updated one value at a time or merged, and serialize
+to a compact float64 array stored as a BLOB (see database.refresh_price_sketches).
+"""
+import math
+from array import array
+
+from procurement.config.settings import PRICE_SKETCH_COMPRESSION
+
+
+def _weighted_quantile(centroids: list[tuple[float, float]], q: float, low: float, high: float) -> float:
+    """Quantile of sorted (mean, count) centroids, interpolating between centroid centers."""
+    total = sum(count for _, count in centroids)
+    target = q * total
+    cumulative = 0.0
+    prev_center, prev_value = 0.0, low
+    for mean, count in centroids:
+        center = cumulative + count / 2
+        if target <= center:
+            if center == prev_center:
+                return mean
+            return prev_value + (mean - prev_value) * (target - prev_center) / (center - prev_center)
+        prev_center, prev_value = center, mean
+        cumulative += count
+    if total == prev_center:
+        return high
+    return prev_value + (high - prev_value) * (target - prev_center) / (total - prev_center)
+
+
+class TDigest:
+    """Merging t-digest with the arcsine scale function."""
+
+    def __init__(self, compression: int = PRICE_SKETCH_COMPRESSION):
+        self.compression = compression
+        self.count = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self._centroids: list[tuple[float, float]] = []
+        self._buffer: list[tuple[float, float]] = []
+
+    def _k(self, q: float) -> float:
+        return self.compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+    def _k_inv(self, k: float) -> float:
+        return (math.sin(min(k * 2 * math.pi / self.compression, math.pi / 2)) + 1) / 2
+
+    def add(self, value: float, count: float = 1):
+        self._buffer.append((float(value), count))
+        self.count += count
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if len(self._buffer) >= 5 * self.compression:
+            self._compress()
+
+    def merge(self, other: "TDigest"):
+        if not other.count:
+            return
+        self._buffer.extend(other.centroids())
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+
+    def _compress(self):
+        if not self._buffer:
+            return
+        items = sorted(self._centroids + self._buffer)
+        self._buffer = []
+        merged = []
+        mean, count = items[0]
+        so_far = 0.0
+        limit = self._k_inv(self._k(0) + 1) * self.count
+        for next_mean, next_count in items[1:]:
+            if so_far + count + next_count <= limit:
+                count += next_count
+                mean += (next_mean - mean) * next_count / count
+            else:
+                merged.append((mean, count))
+                so_far += count
+                limit = self._k_inv(self._k(so_far / self.count) + 1) * self.count
+                mean, count = next_mean, next_count
+        merged.append((mean, count))
+        self._centroids = merged
+
+    def centroids(self) -> list[tuple[float, float]]:
+        self._compress()
+        return list(self._centroids)
+
+    def quantile(self, q: float) -> "float | None":
+        if not self.count:
+            return None
+        return _weighted_quantile(self.centroids(), min(max(q, 0.0), 1.0), self.min, self.max)
+
+    def mad(self) -> "float | None":
+        """Median absolute deviation from the median, estimated from the centroids."""
+        median = self.quantile(0.5)
+        if median is None:
+            return None
+        deviations = sorted((abs(mean - median), count) for mean, count in self._centroids)
+        return _weighted_quantile(deviations, 0.5, 0.0, max(self.max - median, median - self.min))
+
+    def to_bytes(self) -> bytes:
+        values = array('d', [self.compression, self.min, self.max])
+        for mean, count in self.centroids():
+            values.extend((mean, count))
+        return values.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "TDigest":
+        values = array('d')
+        values.frombytes(data)
+        digest = cls(int(values[0]))
+        digest.min, digest.max = values[1], values[2]
+        digest._centroids = list(zip(values[3::2], values[4::2]))
+        digest.count = sum(values[4::2])
+        return digest
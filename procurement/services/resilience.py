@@ -0,0 +1,298 @@
+"""
+Resilience layer around the shared H2OGPTE client.
+Every call passes through a global and a per-operation concurrency limit, is
+retried with jittered exponential backoff on transient errors, and is
+rejected immediately while the circuit breaker is open. Counters for each
+operation and breaker state are kept for the health endpoint.
+"""
+import random
+import threading
+import time
+
+from procurement.config.settings import (
+    H2OGPTE_MAX_CONCURRENCY, H2OGPTE_OP_CONCURRENCY, H2OGPTE_ACQUIRE_TIMEOUT_SECONDS,
+    H2OGPTE_RETRY_ATTEMPTS, H2OGPTE_RETRY_BASE_DELAY, H2OGPTE_RETRY_MAX_DELAY,
+    H2OGPTE_BREAKER_THRESHOLD, H2OGPTE_BREAKER_RESET_SECONDS,
+)
+
+# Client methods mapped to the operation name used for limits and metrics
+_OPERATIONS = {
+    'upload': 'upload',
+    'create_collection': 'create_collection',
+    'ingest_uploads': 'ingest',
+    'create_chat_session': 'chat_session',
+    'get_llms': 'get_llms',
+    'delete_collections': 'delete',
+    'delete_chat_sessions': 'delete',
+    'delete_documents_from_collection': 'delete',
+    'list_recent_collections': 'list',
+    'list_documents_in_collection': 'list',
+    'update_collection': 'update_collection',
+}
+
+# Operations that create server-side state are not retried: the first attempt
+# may have succeeded before the connection dropped.
+_NOT_RETRIED = {'create_collection', 'ingest'}
+
+
+class H2OGPTEUnavailable(RuntimeError):
+    """Call rejected without reaching H2OGPTE (circuit open or limiter saturated)."""
+
+
+class CircuitOpenError(H2OGPTEUnavailable):
+    pass
+
+
+class ThrottledError(H2OGPTEUnavailable):
+    pass
+
+
+def is_transient(exc: BaseException) -> bool:
+    """Whether an error is worth retrying (network, timeout, 429 or 5xx)."""
+    if isinstance(exc, H2OGPTEUnavailable):
+        return False
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    status = getattr(exc, 'status_code', None) or getattr(exc, 'status', None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    name = type(exc).__name__.lower()
+    return any(word in name for word in ('timeout', 'connection', 'unavailable'))
+
+
+def backoff_delay(attempt: int, base: float = H2OGPTE_RETRY_BASE_DELAY,
+                  cap: float = H2OGPTE_RETRY_MAX_DELAY) -> float:
+    """Full-jitter exponential backoff for the given retry attempt (1-based)."""
+    return random.uniform(0, min(cap, base * (2 ** (attempt - 1))))
+
+
+class CircuitBreaker:
+    """Opens after consecutive transient failures; lets one trial call through after the reset timeout."""
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, threshold: int = H2OGPTE_BREAKER_THRESHOLD,
+                 reset_timeout: float = H2OGPTE_BREAKER_RESET_SECONDS):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_inflight = False
+        self.transitions = {self.OPEN: 0, self.HALF_OPEN: 0, self.CLOSED: 0}
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def _set_state(self, state: str):
+        if state != self._state:
+            self._state = state
+            self.transitions[state] += 1
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self._set_state(self.HALF_OPEN)
+            if self._trial_inflight:
+                return False
+            self._trial_inflight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._trial_inflight = False
+            self._set_state(self.CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_inflight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+                self._set_state(self.OPEN)
+
+    def release_trial(self):
+        """Give up a half-open trial slot without a verdict (non-transient error)."""
+        with self._lock:
+            self._trial_inflight = False
+
+
+class _OpStats:
+    __slots__ = ('calls', 'successes', 'failures', 'retries', 'rejected', 'throttled', 'in_flight', 'total_ms')
+
+    def __init__(self):
+        self.calls = self.successes = self.failures = self.retries = 0
+        self.rejected = self.throttled = self.in_flight = 0
+        self.total_ms = 0.0
+
+    def as_dict(self) -> dict:
+        completed = self.successes + self.failures
+        return {
+            'calls': self.calls, 'successes': self.successes, 'failures': self.failures,
+            'retries': self.retries, 'rejected': self.rejected, 'throttled': self.throttled,
+            'in_flight': self.in_flight,
+            'avg_ms': round(self.total_ms / completed, 1) if completed else None,
+        }
+
+
+class ResilientH2OGPTE:
+    """Proxy around an H2OGPTE client applying limits, retries and the circuit breaker."""
+
+    def __init__(self, inner, max_concurrency: int = H2OGPTE_MAX_CONCURRENCY,
+                 op_concurrency: dict = None, acquire_timeout: float = H2OGPTE_ACQUIRE_TIMEOUT_SECONDS,
+                 retry_attempts: int = H2OGPTE_RETRY_ATTEMPTS, breaker: CircuitBreaker = None,
+                 sleep=time.sleep):
+        self._inner = inner
+        self._global = threading.BoundedSemaphore(max_concurrency)
+        limits = H2OGPTE_OP_CONCURRENCY if op_concurrency is None else op_concurrency
+        self._op_limits = {op: threading.BoundedSemaphore(n) for op, n in limits.items()}
+        self._acquire_timeout = acquire_timeout
+        self._retry_attempts = retry_attempts
+        self.breaker = breaker or CircuitBreaker()
+        self._sleep = sleep
+        self._stats_lock = threading.Lock()
+        self._stats: dict[str, _OpStats] = {}
+
+    @property
+    def inner(self):
+        return self._inner
+
+    def __getattr__(self, name):
+        attr = getattr(self._inner, name)
+        op = _OPERATIONS.get(name)
+        if op is None or not callable(attr):
+            return attr
+
+        def _wrapped(*args, **kwargs):
+            return self.call(op, attr, *args, **kwargs)
+        return _wrapped
+
+    def connect(self, chat_session_id: str):
+        return _ResilientSession(self, self._inner.connect(chat_session_id))
+
+    def _stat(self, op: str) -> _OpStats:
+        with self._stats_lock:
+            return self._stats.setdefault(op, _OpStats())
+
+    def _bump(self, op: str, **deltas):
+        stats = self._stat(op)
+        with self._stats_lock:
+            for key, value in deltas.items():
+                setattr(stats, key, getattr(stats, key) + value)
+
+    def _acquire(self, op: str) -> list:
+        deadline = time.monotonic() + self._acquire_timeout
+        held = []
+        for sem in (self._op_limits.get(op), self._global):
+            if sem is None:
+                continue
+            if not sem.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                for h in held:
+                    h.release()
+                self._bump(op, throttled=1)
+                raise ThrottledError(f"H2OGPTE {op} limiter saturated for {self._acquire_timeout}s")
+            held.append(sem)
+        return held
+
+    def call(self, op: str, fn, *args, retry=True, **kwargs):
+        """Run fn under the limits for op, retrying transient failures.
+
+        retry may be a callable, checked after each failure, to stop retrying
+        once a retry is no longer safe.
+        """
+        attempts = self._retry_attempts if retry and op not in _NOT_RETRIED else 1
+        self._bump(op, calls=1)
+
+        for attempt in range(1, attempts + 1):
+            if not self.breaker.allow():
+                self._bump(op, rejected=1)
+                raise CircuitOpenError("H2OGPTE circuit open; failing fast")
+
+            held = self._acquire(op)
+            self._bump(op, in_flight=1)
+            started = time.monotonic()
+            try:
+                _rewind(args, kwargs)
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                elapsed_ms = (time.monotonic() - started) * 1000
+                transient = is_transient(e)
+                if transient:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.release_trial()
+                retryable = retry() if callable(retry) else True
+                if not transient or not retryable or attempt == attempts:
+                    self._bump(op, failures=1, total_ms=elapsed_ms)
+                    raise
+                self._bump(op, retries=1, total_ms=elapsed_ms)
+            else:
+                self.breaker.record_success()
+                self._bump(op, successes=1, total_ms=(time.monotonic() - started) * 1000)
+                return result
+            finally:
+                self._bump(op, in_flight=-1)
+                for sem in held:
+                    sem.release()
+
+            self._sleep(backoff_delay(attempt))
+
+    def metrics(self) -> dict:
+        """Breaker state and per-operation counters."""
+        with self._stats_lock:
+            operations = {op: s.as_dict() for op, s in sorted(self._stats.items())}
+        return {
+            'circuit': {'state': self.breaker.state, 'transitions': dict(self.breaker.transitions)},
+            'operations': operations,
+        }
+
+
+def _rewind(args, kwargs):
+    """Seek file arguments back to the start so an upload can be retried."""
+    for value in list(args) + list(kwargs.values()):
+        if hasattr(value, 'seek') and hasattr(value, 'read'):
+            try:
+                value.seek(0)
+            except Exception:
+                pass
+
+
+class _ResilientSession:
+    def __init__(self, client: ResilientH2OGPTE, inner_ctx):
+        self._client = client
+        self._inner_ctx = inner_ctx
+        self._session = None
+
+    def __enter__(self):
+        self._session = self._inner_ctx.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._inner_ctx.__exit__(*exc)
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+    def query(self, message: str, *args, callback=None, **kwargs):
+        if callback is None:
+            return self._client.call('query', self._session.query, message, *args, **kwargs)
+
+        # A streaming query is only retried until the first partial reaches the caller
+        streamed = threading.Event()
+
+        def _tracking_callback(message):
+            streamed.set()
+            callback(message)
+
+        return self._client.call('query', self._session.query, message, *args, callback=_tracking_callback,
+                                 retry=lambda: not streamed.is_set(), **kwargs)
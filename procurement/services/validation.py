@@ -4,14 +4,22 @@ Three-tier status: Valid (green), Warning (amber), Error (red).
 Operates at per-field, cross-field, and batch levels.
 """
 import difflib
+import hashlib
+import importlib.util
+import json
 import math
+import os
 import re
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Optional
+from functools import lru_cache
+from typing import Iterator, Optional
 from enum import Enum
 
-from procurement.config.settings import COMPULSORY_FIELDS, SUPPORTED_CURRENCIES
+from procurement.config.settings import (
+    COMPULSORY_FIELDS, SUPPORTED_CURRENCIES, VALIDATION_COLUMNAR_MIN_BATCH, VALIDATION_ENGINE,
+    VALIDATION_PARALLEL_MIN_BATCH, VALIDATION_WORKERS,
+)
 
 
 class FieldStatus(Enum):
@@ -20,26 +28,31 @@ class FieldStatus(Enum):
     ERROR = 'error'
 
 
-@dataclass
+@dataclass(slots=True)
 class FieldValidationResult:
     status: FieldStatus
     message: str = ""
     suggestion: str = ""
 
 
-@dataclass
+@dataclass(slots=True)
 class RecordValidationResult:
     overall_status: FieldStatus
     field_results: dict = field(default_factory=dict)
 
 
-# Fields that are errors when missing (critical fields)
-_ERROR_TEXT = {'sku', 'item_description'}
-_ERROR_NUMERIC = {'quantity', 'unit_price'}
+# Fields that are errors when missing (critical fields). Lists, not sets, so
+# messages come out in the same order in every process (string hashing is
+# randomized per interpreter, e.g. in parallel validation workers).
+_ERROR_TEXT = ['sku', 'item_description']
+_ERROR_NUMERIC = ['quantity', 'unit_price']
 
 # Fields that are warnings when missing (non-critical but expected)
-_WARNING_TEXT = {'eu_company', 'distributor', 'quote_currency', 'serial_no', 'quotation_ref_no'}
-_WARNING_NUMERIC = {'total_price'}
+_WARNING_TEXT = ['eu_company', 'distributor', 'quote_currency', 'serial_no', 'quotation_ref_no']
+_WARNING_NUMERIC = ['total_price']
+
+_DATE_FIELDS = ['start_date', 'end_date', 'quotation_date', 'quotation_end_date']
+_OPTIONAL_FIELDS = ['brand', 'comments_notes', 'quotation_validity']
 
 
 def is_empty_value(value) -> bool:
@@ -53,37 +66,88 @@ def is_empty_value(value) -> bool:
     return False
 
 
-def parse_date(date_str) -> "datetime | None":
-    """Parse a date string in multiple formats. Returns None if unparseable."""
-    if date_str is None or (isinstance(date_str, str) and date_str.strip() == ''):
-        return None
-
-    if not isinstance(date_str, str):
-        return None
-
-    date_str = date_str.strip()
-
-    formats = [
-        '%Y-%m-%d',       # ISO: 2024-01-15
-        '%Y-%m-%dT%H:%M:%S',
-        '%m/%d/%Y',       # US: 01/15/2024
-        '%d-%b-%y',       # European: 15-Jan-24
-        '%d-%b-%Y',       # European full: 15-Jan-2024
-        '%d/%m/%Y',       # DD/MM/YYYY
-        '%Y%m%d',         # Compact: 20240115
-        '%b %d, %Y',      # Jan 15, 2024
-        '%d %b %Y',       # 15 Jan 2024
-    ]
-
-    for fmt in formats:
+# Accepted date formats, in precedence order
+_DATE_FORMATS = [
+    '%Y-%m-%d',       # ISO: 2024-01-15
+    '%Y-%m-%dT%H:%M:%S',
+    '%Y-%m-%d %H:%M:%S',  # SQLite CURRENT_TIMESTAMP
+    '%Y-%m-%dT%H:%M:%S.%f',  # datetime.isoformat()
+    '%m/%d/%Y',       # US: 01/15/2024
+    '%d-%b-%y',       # European: 15-Jan-24
+    '%d-%b-%Y',       # European full: 15-Jan-2024
+    '%d/%m/%Y',       # DD/MM/YYYY
+    '%Y%m%d',         # Compact: 20240115
+    '%b %d, %Y',      # Jan 15, 2024
+    '%d %b %Y',       # 15 Jan 2024
+]
+
+# String shapes and the only formats (in precedence order) that can match them.
+# Numeric shapes are built directly from the regex groups; alpha-month shapes
+# get a single strptime. Anything else falls back to trying every format.
+_ISO = r'([0-9]{4})-([0-9]{1,2})-([0-9]{1,2})'
+_TIME = r'([0-9]{1,2}):([0-9]{1,2}):([0-9]{1,2})'
+_DATE_SHAPES = [
+    (re.compile(_ISO), 'ymd'),
+    (re.compile(_ISO + 'T' + _TIME), 'ymdhms'),
+    (re.compile(_ISO + r'\s+' + _TIME), 'ymdhms'),
+    (re.compile(_ISO + 'T' + _TIME + r'\.([0-9]{1,6})'), 'ymdhmsf'),
+    (re.compile(r'([0-9]{1,2})/([0-9]{1,2})/([0-9]{4})'), 'slash'),
+    (re.compile(r'([0-9]{4})([0-9]{2})([0-9]{2})'), 'ymd'),
+    (re.compile(r'[0-9]{1,2}-[A-Za-z]{3}-[0-9]{2}'), '%d-%b-%y'),
+    (re.compile(r'[0-9]{1,2}-[A-Za-z]{3}-[0-9]{4}'), '%d-%b-%Y'),
+    (re.compile(r'[A-Za-z]{3}\s+[0-9]{1,2},\s+[0-9]{4}'), '%b %d, %Y'),
+    (re.compile(r'[0-9]{1,2}\s+[A-Za-z]{3}\s+[0-9]{4}'), '%d %b %Y'),
+]
+
+
+def _parse_date_slow(date_str: str) -> "datetime | None":
+    for fmt in _DATE_FORMATS:
         try:
             return datetime.strptime(date_str, fmt)
         except ValueError:
             continue
-
     return None
 
 
+@lru_cache(maxsize=4096)
+def _parse_date_str(date_str: str) -> "datetime | None":
+    for pattern, kind in _DATE_SHAPES:
+        m = pattern.fullmatch(date_str)
+        if m is None:
+            continue
+        try:
+            if kind == 'slash':
+                # %m/%d/%Y takes precedence over %d/%m/%Y
+                a, b, year = map(int, m.groups())
+                try:
+                    return datetime(year, a, b)
+                except ValueError:
+                    return datetime(year, b, a)
+            if kind == 'ymdhmsf':
+                *parts, fraction = m.groups()
+                return datetime(*map(int, parts), int(fraction.ljust(6, '0')))
+            if kind.startswith('ymd'):
+                return datetime(*map(int, m.groups()))
+            return datetime.strptime(date_str, kind)
+        except ValueError:
+            return None
+    return _parse_date_slow(date_str)
+
+
+def parse_date(date_str) -> "datetime | None":
+    """Parse a date string in multiple formats. Returns None if unparseable.
+
+    The format is picked from the string's shape, so a value is parsed once
+    rather than tried against every format; recent results are memoized.
+    """
+    if not isinstance(date_str, str):
+        return None
+    date_str = date_str.strip()
+    if not date_str:
+        return None
+    return _parse_date_str(date_str)
+
+
 def _to_numeric(value) -> "float | None":
     """Convert a value to float, returning None if not possible."""
     if value is None:
@@ -103,6 +167,43 @@ def _to_numeric(value) -> "float | None":
     return None
 
 
+def _fingerprint_text(value) -> str:
+    return '' if is_empty_value(value) else ' '.join(str(value).split()).upper()
+
+
+def _fingerprint_number(value) -> str:
+    number = _to_numeric(value)
+    return '' if number is None else repr(round(number, 4))
+
+
+def line_fingerprint(record: dict) -> str:
+    """Hash identifying a quote line across batches.
+
+    Built from the normalized SKU, unit price, quantity, quotation reference and
+    distributor, so re-submitting an approved quote yields the same fingerprint
+    regardless of case, spacing or number formatting.
+    """
+    key = '\x1f'.join((
+        _fingerprint_text(record.get('sku')),
+        _fingerprint_number(record.get('unit_price')),
+        _fingerprint_number(record.get('quantity')),
+        _fingerprint_text(record.get('quotation_ref_no')),
+        _fingerprint_text(record.get('distributor')),
+    ))
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def historical_median(sku_hist: dict) -> "float | None":
+    """Median historical price of a SKU summary, falling back to the mean when no sketch exists."""
+    median = sku_hist.get('median_price') if sku_hist else None
+    return median if median is not None else (sku_hist.get('avg_price') if sku_hist else None)
+
+
+def archived_duplicate_message(record: dict) -> str:
+    sku = (record.get('sku') or '').strip().upper() or 'Unknown'
+    return f"Already approved: SKU {sku} with the same price, quantity, quotation ref and distributor is in the archive"
+
+
 def validate_record_fields(
     record: dict,
     historical_avg: float = 0.0,
@@ -211,9 +312,8 @@ def validate_record_fields(
                      f"Total ({total_price:.2f}) differs from unit price x quantity ({expected:.2f}) by {diff_pct*100:.1f}%")
 
     # --- Date validation ---
-    date_fields = ['start_date', 'end_date', 'quotation_date', 'quotation_end_date']
     parsed_dates = {}
-    for f in date_fields:
+    for f in _DATE_FIELDS:
         raw = record.get(f)
         if is_empty_value(raw):
             # Optional fields — valid if empty
@@ -272,8 +372,7 @@ def validate_record_fields(
                          f"Round number ({unit_price:.0f}) — historical avg has decimals ({hist_avg:.2f})")
 
     # Optional fields that aren't yet in results
-    optional_fields = ['brand', 'comments_notes', 'quotation_validity']
-    for f in optional_fields:
+    for f in _OPTIONAL_FIELDS:
         if f not in results:
             _set(f, FieldStatus.VALID)
 
@@ -322,6 +421,9 @@ def _pdf_fallback_lookup(sku: str, description: str = None) -> "dict | None":
     except Exception:
         return None
 
+    from procurement.services.resilience import H2OGPTEUnavailable
+
+    lookup_failed = False
     for doc in ref_docs:
         try:
             result = query_catalog_pdf(doc['collection_id'], sku, description)
@@ -335,16 +437,140 @@ def _pdf_fallback_lookup(sku: str, description: str = None) -> "dict | None":
                     raw_response=result.get('raw_response'),
                 )
                 return result
+        except H2OGPTEUnavailable:
+            # Circuit open or limiter saturated: no point trying the other documents
+            lookup_failed = True
+            break
         except Exception:
+            lookup_failed = True
             continue
 
-    # Not found in any reference PDF — cache negative result
-    save_pdf_cache_entry(sku, found=False)
+    # Not found in any reference PDF — cache negative result, unless a lookup
+    # failed (the SKU may be in a document we could not query)
+    if not lookup_failed:
+        save_pdf_cache_entry(sku, found=False)
     return None
 
 
-def validate_records(records: list[dict], known_skus: list[str] = None, catalog_entries: dict = None, historical_stats: dict = None) -> list[dict]:
-    """Validate a batch of records. Adds validation fields + duplicate detection + fuzzy SKU matching + catalog validation."""
+@lru_cache(maxsize=1)
+def columnar_available() -> bool:
+    """Whether NumPy, and with it the columnar engine, is installed."""
+    return importlib.util.find_spec('numpy') is not None
+
+
+def _parallel_workers(n: int) -> int:
+    """Worker processes for per-record validation of n records (1 = in process).
+
+    'parallel' shards batches of VALIDATION_PARALLEL_MIN_BATCH records or more.
+    'auto' does so only as the fallback when NumPy is missing (large batches go
+    to the columnar engine otherwise), and keeps them in process on a single CPU.
+    """
+    if n < VALIDATION_PARALLEL_MIN_BATCH:
+        return 1
+    if VALIDATION_ENGINE == 'parallel' or (VALIDATION_ENGINE == 'auto' and not columnar_available()):
+        return max(1, min(VALIDATION_WORKERS or os.cpu_count() or 1, n))
+    return 1
+
+
+def uses_process_pool() -> bool:
+    """Whether large batches are validated in the process pool on this host (started with the app)."""
+    return _parallel_workers(max(VALIDATION_PARALLEL_MIN_BATCH, 2)) > 1
+
+
+def _use_columnar(n: int) -> bool:
+    """Whether n records go to the columnar engine (and its coded results); independent of the CPU count."""
+    return VALIDATION_ENGINE == 'columnar' or (VALIDATION_ENGINE == 'auto' and n >= VALIDATION_COLUMNAR_MIN_BATCH)
+
+
+def _validate_record_entry(
+    rec: dict,
+    known_skus: list[str] = None,
+    known_skus_upper: list[str] = None,
+    catalog_entries: dict = None,
+    historical_stats: dict = None,
+) -> tuple:
+    """Per-record section of validate_records: field rules, fuzzy SKU match and catalog check.
+
+    Pure (the record is not modified), so it can run in a worker process.
+    Returns (field_validation, messages, catalog_match).
+    """
+    result = validate_record_fields(rec, historical_stats=historical_stats)
+    messages = []
+    field_val = {}
+    catalog_match = False
+    for f, fv in result.field_results.items():
+        field_val[f] = {'status': fv.status.value, 'message': fv.message, 'suggestion': fv.suggestion}
+        if fv.status != FieldStatus.VALID and fv.message:
+            messages.append(fv.message)
+
+    # Fuzzy SKU matching
+    if known_skus and 'sku' in field_val:
+        sku = (rec.get('sku') or '').strip()
+        if sku:
+            sku_upper = sku.upper()
+            matches = difflib.get_close_matches(sku_upper, known_skus_upper, n=1, cutoff=0.7)
+            if matches and matches[0] != sku_upper:
+                # Found a fuzzy match
+                suggestion = next((s for s in known_skus if s.upper() == matches[0]), None)
+                if suggestion:
+                    field_val['sku']['suggestion'] = suggestion
+                    # Escalate to warning if currently valid
+                    if field_val['sku']['status'] == 'valid':
+                        field_val['sku']['status'] = 'warning'
+                        messages.append(f"SKU '{sku}' is close to known SKU '{suggestion}' (fuzzy match)")
+
+    # Catalog validation
+    if catalog_entries and 'sku' in field_val:
+        sku = (rec.get('sku') or '').strip()
+        if sku and sku in catalog_entries:
+            catalog_match = True
+            catalog = catalog_entries[sku]
+            unit_price = _to_numeric(rec.get('unit_price'))
+
+            if unit_price is not None and catalog.get('max_price'):
+                max_price = catalog['max_price']
+                deviation = (unit_price - max_price) / max_price if max_price > 0 else 0
+
+                if deviation > 0.50:
+                    # >50% over max price
+                    field_val['unit_price']['status'] = 'error'
+                    msg = f"Unit price ({unit_price:.2f}) exceeds catalog max price ({max_price:.2f}) by {deviation*100:.0f}%"
+                    field_val['unit_price']['message'] = msg
+                    messages.append(msg)
+                elif deviation > 0.10:
+                    # >10% over max price
+                    field_val['unit_price']['status'] = 'warning'
+                    msg = f"Unit price ({unit_price:.2f}) exceeds catalog max price ({max_price:.2f}) by {deviation*100:.0f}%"
+                    field_val['unit_price']['message'] = msg
+                    messages.append(msg)
+
+    return field_val, messages, catalog_match
+
+
+def validate_records(records: list[dict], known_skus: list[str] = None, catalog_entries: dict = None, historical_stats: dict = None,
+                     archived_fingerprints: set = None) -> list[dict]:
+    """Validate a batch of records. Adds validation fields + duplicate detection + fuzzy SKU matching + catalog validation.
+
+    archived_fingerprints is the set of line_fingerprint values of the batch
+    already in the historical archive (database.get_archived_fingerprints);
+    those lines are flagged as already approved.
+
+    Batches of VALIDATION_COLUMNAR_MIN_BATCH records or more go to the
+    columnar engine (validation_columnar) when NumPy is installed. Without
+    NumPy (or with VALIDATION_ENGINE=parallel), batches of
+    VALIDATION_PARALLEL_MIN_BATCH records or more have the per-record section
+    sharded across worker processes instead (validation_parallel). The output
+    is the same either way.
+    """
+    if _use_columnar(len(records)):
+        try:
+            from procurement.services.validation_columnar import validate_records_columnar
+        except ImportError:
+            pass  # NumPy not installed
+        else:
+            return validate_records_columnar(records, known_skus, catalog_entries, historical_stats,
+                                             archived_fingerprints)
+
     # Normalize known_skus to uppercase for case-insensitive matching
     known_skus_upper = [s.upper() for s in (known_skus or [])]
 
@@ -359,60 +585,20 @@ def validate_records(records: list[dict], known_skus: list[str] = None, catalog_
         if ack:
             acknowledged_map[i] = ack
 
-    # Per-record validation
-    for rec in records:
-        result = validate_record_fields(rec, historical_stats=historical_stats)
-        rec['validation_status'] = result.overall_status.value
-        messages = []
-        field_val = {}
-        for f, fv in result.field_results.items():
-            field_val[f] = {'status': fv.status.value, 'message': fv.message, 'suggestion': fv.suggestion}
-            if fv.status != FieldStatus.VALID and fv.message:
-                messages.append(fv.message)
-
-        # Fuzzy SKU matching
-        if known_skus and 'sku' in field_val:
-            sku = (rec.get('sku') or '').strip()
-            if sku:
-                sku_upper = sku.upper()
-                matches = difflib.get_close_matches(sku_upper, known_skus_upper, n=1, cutoff=0.7)
-                if matches and matches[0] != sku_upper:
-                    # Found a fuzzy match
-                    suggestion = next((s for s in known_skus if s.upper() == matches[0]), None)
-                    if suggestion:
-                        field_val['sku']['suggestion'] = suggestion
-                        # Escalate to warning if currently valid
-                        if field_val['sku']['status'] == 'valid':
-                            field_val['sku']['status'] = 'warning'
-                            messages.append(f"SKU '{sku}' is close to known SKU '{suggestion}' (fuzzy match)")
-
-        # Catalog validation
-        if catalog_entries and 'sku' in field_val:
-            sku = (rec.get('sku') or '').strip()
-            if sku and sku in catalog_entries:
-                rec['catalog_match'] = True
-                catalog = catalog_entries[sku]
-                unit_price = _to_numeric(rec.get('unit_price'))
-
-                if unit_price is not None and catalog.get('max_price'):
-                    max_price = catalog['max_price']
-                    deviation = (unit_price - max_price) / max_price if max_price > 0 else 0
-
-                    if deviation > 0.50:
-                        # >50% over max price
-                        field_val['unit_price']['status'] = 'error'
-                        msg = f"Unit price ({unit_price:.2f}) exceeds catalog max price ({max_price:.2f}) by {deviation*100:.0f}%"
-                        field_val['unit_price']['message'] = msg
-                        messages.append(msg)
-                        rec['validation_status'] = 'error'
-                    elif deviation > 0.10:
-                        # >10% over max price
-                        field_val['unit_price']['status'] = 'warning'
-                        msg = f"Unit price ({unit_price:.2f}) exceeds catalog max price ({max_price:.2f}) by {deviation*100:.0f}%"
-                        field_val['unit_price']['message'] = msg
-                        messages.append(msg)
-                        if rec['validation_status'] == 'valid':
-                            rec['validation_status'] = 'warning'
+    # Per-record validation, sharded across worker processes for very large batches
+    workers = _parallel_workers(len(records))
+    if workers > 1:
+        from procurement.services.validation_parallel import validate_record_entries_parallel
+        entries = validate_record_entries_parallel(records, known_skus, catalog_entries, historical_stats, workers)
+    else:
+        entries = [
+            _validate_record_entry(rec, known_skus, known_skus_upper, catalog_entries, historical_stats)
+            for rec in records
+        ]
+
+    for rec, (field_val, messages, catalog_match) in zip(records, entries):
+        if catalog_match:
+            rec['catalog_match'] = True
 
         # PDF catalog fallback — when no structured catalog match
         if not rec.get('catalog_match'):
@@ -465,6 +651,21 @@ def validate_records(records: list[dict], known_skus: list[str] = None, catalog_
                 else:
                     rec['validation_message'] = msg
 
+    # Cross-batch duplicate detection against the historical archive
+    if archived_fingerprints:
+        for rec in records:
+            if line_fingerprint(rec) not in archived_fingerprints:
+                continue
+            msg = archived_duplicate_message(rec)
+            fv = rec.get('field_validation', {})
+            fv['sku'] = {'status': 'warning', 'message': msg}
+            rec['field_validation'] = fv
+            existing_msg = rec.get('validation_message', '')
+            if existing_msg and existing_msg != 'All fields valid':
+                rec['validation_message'] = f"{existing_msg}; {msg}"
+            else:
+                rec['validation_message'] = msg
+
     # --- Batch-level: price outlier vs SKU historical median ---
     hist = historical_stats or {}
     for i, rec in enumerate(records):
@@ -473,7 +674,7 @@ def validate_records(records: list[dict], known_skus: list[str] = None, catalog_
             continue
         sku_key = (rec.get('sku') or '').strip()
         sku_hist = hist.get(sku_key, {})
-        median_price = sku_hist.get('avg_price')
+        median_price = historical_median(sku_hist)
         if not median_price or median_price <= 0:
             continue
         ratio = price / median_price
@@ -562,6 +763,26 @@ def validate_records(records: list[dict], known_skus: list[str] = None, catalog_
     return records
 
 
+def validate_records_json(records: list[dict], known_skus: list[str] = None, catalog_entries: dict = None,
+                          historical_stats: dict = None, archived_fingerprints: set = None) -> "Iterator[str]":
+    """validate_records, rendered as chunks of a JSON array for the API.
+
+    On the columnar engine the field-level results stay coded arrays until they
+    are written out, instead of a dict per field per record.
+    """
+    if _use_columnar(len(records)):
+        try:
+            from procurement.services.validation_columnar import validate_records_compact
+        except ImportError:
+            pass  # NumPy not installed
+        else:
+            result = validate_records_compact(records, known_skus, catalog_entries, historical_stats,
+                                              archived_fingerprints)
+            return result.iter_json(records)
+    validated = validate_records(records, known_skus, catalog_entries, historical_stats, archived_fingerprints)
+    return iter([json.dumps(validated, ensure_ascii=False, separators=(',', ':'))])
+
+
 def get_missing_fields(record: dict) -> list[str]:
     """Return list of compulsory fields that are missing or empty."""
     missing = []
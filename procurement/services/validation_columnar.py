@@ -0,0 +1,455 @@
+"""
+Columnar validation engine for large batches.
+Loads a batch into NumPy arrays (quantities, prices, parsed dates, SKU keys)
+and evaluates the per-field, cross-field and batch rules of
+validation.validate_records as vectorized masks. Each value is converted
+once, messages are only formatted for flagged rows, and fuzzy SKU matches and
+PDF catalog lookups are done once per distinct SKU. The output
+(field_validation, validation_status, validation_message, catalog flags) is
+the same as the per-record engine's. Field-level results are kept as coded
+arrays (CompactValidation) and only expanded into dicts or JSON at the edge.
+"""
+import difflib
+import json
+
+import numpy as np
+
+from procurement.config.settings import SUPPORTED_CURRENCIES
+from procurement.services import validation
+from procurement.services.validation import (
+    _DATE_FIELDS, _ERROR_NUMERIC, _ERROR_TEXT, _OPTIONAL_FIELDS, _WARNING_NUMERIC, _WARNING_TEXT,
+    _to_numeric, is_empty_value, parse_date,
+)
+
+VALID, WARNING, ERROR = 0, 1, 2
+_STATUS_NAMES = ('valid', 'warning', 'error')
+
+# Key order of field_validation, as validate_record_fields inserts them
+_FIELD_ORDER = tuple(dict.fromkeys([
+    *_ERROR_TEXT, *_WARNING_TEXT, *_ERROR_NUMERIC, *_WARNING_NUMERIC, *_DATE_FIELDS, *_OPTIONAL_FIELDS,
+]))
+
+_DAY_US = 86_400_000_000
+
+# Flags of a CompactValidation code next to the status in the low bits
+_ACKNOWLEDGED = 4
+_NO_SUGGESTION = 8  # entry has no suggestion key (batch duplicate flags)
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+
+class CompactValidation:
+    """Field-level results of a batch as coded arrays, one row per field in _FIELD_ORDER.
+
+    codes holds the status plus the _ACKNOWLEDGED / _NO_SUGGESTION flags;
+    message and suggestion ids index the interned texts. field_validation
+    dicts are only built by apply(); dumps() renders JSON straight from the
+    codes, so large batches never hold a dict per field.
+    """
+    __slots__ = ('codes', 'message_ids', 'suggestion_ids', 'texts')
+
+    def __init__(self, codes: np.ndarray, message_ids: np.ndarray, suggestion_ids: np.ndarray, texts: list[str]):
+        self.codes = codes
+        self.message_ids = message_ids
+        self.suggestion_ids = suggestion_ids
+        self.texts = texts
+
+    def _columns(self, render):
+        """Per field, the rendered entry of every row; render is called once per distinct entry."""
+        columns = []
+        for f, codes, message_ids, suggestion_ids in zip(_FIELD_ORDER, self.codes.tolist(),
+                                                         self.message_ids.tolist(), self.suggestion_ids.tolist()):
+            rendered = {}
+            column = []
+            for key in zip(codes, message_ids, suggestion_ids):
+                entry = rendered.get(key)
+                if entry is None:
+                    entry = rendered[key] = render(f, self._entry(*key))
+                column.append(entry)
+            columns.append(column)
+        return columns
+
+    def _entry(self, code: int, message_id: int, suggestion_id: int) -> dict:
+        entry = {'status': _STATUS_NAMES[code & 3], 'message': self.texts[message_id]}
+        if not code & _NO_SUGGESTION:
+            entry['suggestion'] = self.texts[suggestion_id]
+        if code & _ACKNOWLEDGED:
+            entry['acknowledged'] = True
+        return entry
+
+    def field_validations(self) -> list[dict]:
+        columns = self._columns(lambda f, entry: entry)
+        return [dict(zip(_FIELD_ORDER, (entry.copy() for entry in row))) for row in zip(*columns)]
+
+    def apply(self, records: list[dict]) -> list[dict]:
+        """Set field_validation on each record."""
+        for rec, fv in zip(records, self.field_validations()):
+            rec['field_validation'] = fv
+        return records
+
+    def iter_json(self, records: list[dict], chunk_size: int = 1000):
+        """JSON array of the records with their field_validation, as apply() + json.dumps would give,
+        yielded in chunks of chunk_size records."""
+        columns = self._columns(lambda f, entry: f'{_dumps(f)}:{_dumps(entry)}')
+        yield '['
+        parts = []
+        for i, (rec, row) in enumerate(zip(records, zip(*columns))):
+            rec.pop('field_validation', None)
+            head = _dumps(rec)[:-1]
+            parts.append(f"{head}{',' if len(head) > 1 else ''}\"field_validation\":{{{','.join(row)}}}}}")
+            if len(parts) == chunk_size:
+                yield f"{',' if i >= chunk_size else ''}{','.join(parts)}"
+                parts = []
+        if parts:
+            yield f"{',' if len(records) > len(parts) else ''}{','.join(parts)}"
+        yield ']'
+
+    def dumps(self, records: list[dict]) -> str:
+        return ''.join(self.iter_json(records))
+
+
+class _Field:
+    """Status, message and suggestion columns of one field."""
+
+    def __init__(self, n: int):
+        self.status = np.zeros(n, dtype=np.int8)
+        self.message = np.full(n, '', dtype=object)
+        self.suggestion = np.full(n, '', dtype=object)
+
+    def set(self, mask, status: int, message, suggestion=None):
+        """Set rows in mask; message/suggestion are a string or a function of the row index."""
+        idx = np.flatnonzero(mask)
+        if not len(idx):
+            return
+        self.status[idx] = status
+        if callable(message):
+            self.message[idx] = [message(i) for i in idx.tolist()]
+        else:
+            self.message[idx] = message
+        if callable(suggestion):
+            self.suggestion[idx] = [suggestion(i) for i in idx.tolist()]
+        else:
+            self.suggestion[idx] = suggestion or ''
+
+
+def _map_distinct(func, values: list) -> list:
+    """func applied to each value, evaluated once per distinct value (price lists repeat a lot)."""
+    try:
+        lookup = {v: func(v) for v in set(values)}
+    except TypeError:  # unhashable values
+        return [func(v) for v in values]
+    return [lookup[v] for v in values]
+
+
+def _mask(func, values: list) -> np.ndarray:
+    return np.fromiter(_map_distinct(func, values), dtype=bool, count=len(values))
+
+
+def _numeric(values: list) -> "tuple[list, np.ndarray]":
+    """Numeric values (None if not numeric) and the same as a float array with NaN for None."""
+    nums = _map_distinct(_to_numeric, values)
+    return nums, np.fromiter((np.nan if v is None else v for v in nums), dtype=np.float64, count=len(nums))
+
+
+_NAT = np.iinfo(np.int64).min
+_EPOCH = np.datetime64(0, 'us').astype(object)
+
+
+def _date_us(value) -> int:
+    """Microseconds since the epoch of a date value, NaT's integer when empty or unparseable."""
+    if is_empty_value(value):
+        return _NAT
+    dt = parse_date(value)
+    if dt is None:
+        return _NAT
+    delta = dt - _EPOCH
+    return (delta.days * 86_400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def _dates(values: list) -> "tuple[np.ndarray, np.ndarray]":
+    """Empty mask and parsed datetime64[us] array (NaT when empty or unparseable)."""
+    empty = _mask(is_empty_value, values)
+    micros = np.fromiter(_map_distinct(_date_us, values), dtype=np.int64, count=len(values))
+    return empty, micros.view('datetime64[us]')
+
+
+def validate_records_columnar(records: list[dict], known_skus: list[str] = None, catalog_entries: dict = None,
+                              historical_stats: dict = None, archived_fingerprints: set = None) -> list[dict]:
+    """Columnar equivalent of validation.validate_records; same arguments and output."""
+    result = validate_records_compact(records, known_skus, catalog_entries, historical_stats, archived_fingerprints)
+    return result.apply(records)
+
+
+def validate_records_compact(records: list[dict], known_skus: list[str] = None, catalog_entries: dict = None,
+                             historical_stats: dict = None, archived_fingerprints: set = None) -> CompactValidation:
+    """Validate records, setting the record-level keys and returning the field-level results compactly."""
+    n = len(records)
+    if n == 0:
+        empty_ids = np.zeros((len(_FIELD_ORDER), 0), dtype=np.int32)
+        return CompactValidation(np.zeros((len(_FIELD_ORDER), 0), dtype=np.int8), empty_ids, empty_ids, [''])
+
+    # Preserve acknowledged state from incoming records
+    acknowledged_map: dict[int, list[str]] = {}
+    for i, rec in enumerate(records):
+        fv = rec.get('field_validation') or {}
+        ack = [f for f, d in fv.items() if isinstance(d, dict) and d.get('acknowledged')]
+        if ack:
+            acknowledged_map[i] = ack
+
+    column = {f: [rec.get(f) for rec in records] for f in (*_FIELD_ORDER, 'quote_currency')}
+    fields = {f: _Field(n) for f in _FIELD_ORDER}
+    skus = column['sku']
+    sku_keys = [(s or '').strip() for s in skus]
+
+    # --- Text fields ---
+    empty = {}
+    for f in (*_ERROR_TEXT, *_WARNING_TEXT):
+        empty[f] = _mask(is_empty_value, column[f])
+        if f in _ERROR_TEXT:
+            fields[f].set(empty[f], ERROR, f"Missing required field: {f}")
+        else:
+            fields[f].set(empty[f], WARNING, f"Missing field: {f}")
+
+    short_sku = ~empty['sku'] & _mask(lambda s: isinstance(s, str) and len(s.strip()) < 3, skus)
+    fields['sku'].set(short_sku, WARNING, lambda i: f"SKU '{skus[i]}' has fewer than 3 characters")
+
+    currencies = column['quote_currency']
+    currency_str = ~empty['quote_currency'] & _mask(lambda c: isinstance(c, str), currencies)
+    unsupported = currency_str & _mask(
+        lambda c: isinstance(c, str) and c.strip().upper() not in SUPPORTED_CURRENCIES, currencies)
+    fields['quote_currency'].set(unsupported, WARNING, lambda i: f"Unsupported currency: {currencies[i]}")
+
+    # --- Numeric fields ---
+    q_list, q = _numeric(column['quantity'])
+    up_list, up = _numeric(column['unit_price'])
+    _, tp = _numeric(column['total_price'])
+
+    qf = fields['quantity']
+    qf.set(np.isnan(q), ERROR, "Missing required field: quantity")
+    qf.set(q < 0, ERROR, lambda i: f"Negative value for quantity: {q_list[i]}")
+    qf.set(q == 0, ERROR, "Quantity cannot be zero")
+    qf.set(q > 10000, WARNING, lambda i: f"High quantity: {q_list[i]}")
+
+    upf = fields['unit_price']
+    upf.set(np.isnan(up), ERROR, "Missing required field: unit_price")
+    upf.set(up < 0, ERROR, lambda i: f"Negative value for unit_price: {up_list[i]}")
+
+    tpf = fields['total_price']
+    tpf.set(np.isnan(tp), WARNING, "Missing field: total_price")
+    tpf.set(tp < 0, ERROR, lambda i: f"Negative value for total_price: {float(tp[i])}")
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        expected = up * q
+        diff_pct = np.abs(tp - expected) / expected
+        mismatch = (q > 0) & (expected > 0) & (diff_pct > 0.01)
+
+    def _mismatch_msg(i):
+        total, exp = float(tp[i]), float(expected[i])
+        return f"Total ({total:.2f}) differs from unit price x quantity ({exp:.2f}) by {abs(total - exp) / exp * 100:.1f}%"
+    tpf.set(mismatch, WARNING, _mismatch_msg)
+
+    # --- Dates ---
+    parsed = {}
+    for f in _DATE_FIELDS:
+        date_empty, parsed[f] = _dates(column[f])
+        raw = column[f]
+        fields[f].set(~date_empty & np.isnat(parsed[f]), ERROR, lambda i, raw=raw: f"Cannot parse date: {raw[i]}")
+
+    after = parsed['start_date'] > parsed['end_date']
+    fields['start_date'].set(after, ERROR, "Start date is after end date")
+    fields['end_date'].set(after, ERROR, "End date is before start date")
+    fields['quotation_date'].set(parsed['quotation_date'] > parsed['quotation_end_date'], ERROR,
+                                 "Quotation date is after quotation end date")
+
+    # --- Decimal error and round number vs SKU historical average ---
+    hist = historical_stats or {}
+    hist_avg_by_sku = {}
+    for key in set(sku_keys):
+        sku_hist = hist.get(key, {})
+        avg = sku_hist.get('avg_price') if sku_hist else None
+        hist_avg_by_sku[key] = np.nan if avg is None else avg
+    h_values = [hist_avg_by_sku[k] for k in sku_keys]
+    h = np.fromiter(h_values, dtype=np.float64, count=n)
+    hist_median_by_sku = {}
+    for key in set(sku_keys):
+        median = validation.historical_median(hist.get(key, {}))
+        hist_median_by_sku[key] = np.nan if median is None else median
+    m_values = [hist_median_by_sku[k] for k in sku_keys]
+    m = np.fromiter(m_values, dtype=np.float64, count=n)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        divided = up / 100
+        decimal = (h > 0) & (up > 5 * h) & (np.abs(divided - h) / h <= 0.30)
+    upf.set(decimal, WARNING,
+            lambda i: (f"Possible decimal error: {up_list[i]:.2f} may be {up_list[i] / 100:.2f} "
+                       f"(historical avg {h_values[i]:.2f})"),
+            suggestion=lambda i: str(round(up_list[i] / 100, 2)))
+
+    desc = column['item_description']
+    short_desc = ~empty['item_description'] & _mask(lambda d: isinstance(d, str) and len(d.strip()) < 5, desc)
+    fields['item_description'].set(short_desc, WARNING,
+                                   lambda i: f"Description is very short ({len(desc[i].strip())} chars)")
+
+    with np.errstate(invalid='ignore'):
+        round_number = (h > 0) & (up > 0) & (np.mod(up, 100) == 0) & (np.mod(h, 1) != 0) & (upf.status == VALID)
+    upf.set(round_number, WARNING,
+            lambda i: f"Round number ({up_list[i]:.0f}) — historical avg has decimals ({h_values[i]:.2f})")
+
+    # Per-record messages in field order, for flagged rows only
+    messages: dict[int, list[str]] = {}
+    for f in _FIELD_ORDER:
+        fld = fields[f]
+        idx = np.flatnonzero(fld.status != VALID)
+        for i, msg in zip(idx.tolist(), fld.message[idx].tolist()):
+            if msg:
+                messages.setdefault(i, []).append(msg)
+
+    # --- Fuzzy SKU matching, once per distinct SKU ---
+    if known_skus:
+        known_skus_upper = [s.upper() for s in known_skus]
+        fuzzy = {}
+        for key in set(sku_keys):
+            if not key:
+                continue
+            sku_upper = key.upper()
+            matches = difflib.get_close_matches(sku_upper, known_skus_upper, n=1, cutoff=0.7)
+            if matches and matches[0] != sku_upper:
+                fuzzy[key] = next((s for s in known_skus if s.upper() == matches[0]), None)
+        skuf = fields['sku']
+        for i, key in enumerate(sku_keys):
+            suggestion = fuzzy.get(key) if key else None
+            if suggestion:
+                skuf.suggestion[i] = suggestion
+                if skuf.status[i] == VALID:
+                    skuf.status[i] = WARNING
+                    messages.setdefault(i, []).append(f"SKU '{key}' is close to known SKU '{suggestion}' (fuzzy match)")
+
+    # --- Catalog validation ---
+    if catalog_entries:
+        max_prices = np.full(n, np.nan)
+        for i, key in enumerate(sku_keys):
+            if key and key in catalog_entries:
+                records[i]['catalog_match'] = True
+                max_price = catalog_entries[key].get('max_price')
+                if max_price:
+                    max_prices[i] = max_price
+        with np.errstate(invalid='ignore', divide='ignore'):
+            deviation = np.where(max_prices > 0, (up - max_prices) / max_prices, 0.0)
+            over = ~np.isnan(up) & ~np.isnan(max_prices)
+            for mask, status in ((over & (deviation > 0.50), ERROR),
+                                 (over & (deviation > 0.10) & (deviation <= 0.50), WARNING)):
+                for i in np.flatnonzero(mask).tolist():
+                    msg = (f"Unit price ({up_list[i]:.2f}) exceeds catalog max price "
+                           f"({max_prices[i]:.2f}) by {deviation[i] * 100:.0f}%")
+                    upf.status[i] = status
+                    upf.message[i] = msg
+                    messages.setdefault(i, []).append(msg)
+
+    # --- PDF catalog fallback, once per distinct SKU ---
+    pdf_lookups = {}
+    skuf = fields['sku']
+    for i, rec in enumerate(records):
+        key = sku_keys[i]
+        if rec.get('catalog_match') or not key:
+            continue
+        if key not in pdf_lookups:
+            pdf_lookups[key] = validation._pdf_fallback_lookup(key, rec.get('item_description'))
+        pdf_result = pdf_lookups[key]
+        if pdf_result and pdf_result.get('found'):
+            rec['catalog_match'] = True
+            rec['pdf_fallback'] = True
+            msg = "Matched from reference PDF"
+            if pdf_result.get('base_price') is not None:
+                msg += f" (base price: {pdf_result['base_price']:.2f})"
+            skuf.message[i] = msg
+            messages.setdefault(i, []).append(msg)
+
+    # --- Batch-level duplicate detection ---
+    composite_keys = {}
+    for i, key in enumerate(zip((k.upper() for k in sku_keys), up_list, q_list)):
+        composite_keys.setdefault(key, []).append(i)
+    duplicate_sku = {}
+    for key, indices in composite_keys.items():
+        if len(indices) >= 2:
+            msg = f"Possible duplicate: SKU {key[0] or 'Unknown'} appears {len(indices)} times with same price and quantity"
+            for i in indices:
+                duplicate_sku[i] = msg
+                messages.setdefault(i, []).append(msg)
+    if archived_fingerprints:
+        for i, rec in enumerate(records):
+            if validation.line_fingerprint(rec) in archived_fingerprints:
+                msg = validation.archived_duplicate_message(rec)
+                duplicate_sku[i] = msg
+                messages.setdefault(i, []).append(msg)
+
+    # --- Batch-level price outlier vs SKU historical median ---
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ratio = up / m
+        outlier = (up > 0) & (m > 0) & ((ratio > 3) | (ratio < 0.33)) & (upf.status != ERROR)
+    for i in np.flatnonzero(outlier).tolist():
+        msg = f"Batch outlier: price {up_list[i]:.2f} vs SKU median {m_values[i]:.2f} ({up_list[i] / m_values[i]:.1f}x)"
+        upf.status[i] = WARNING
+        upf.message[i] = msg
+        messages.setdefault(i, []).append(msg)
+
+    # --- Batch-level currency inconsistency ---
+    currencies_used = {currencies[i].strip().upper() for i in np.flatnonzero(currency_str).tolist()}
+    if len(currencies_used) > 1:
+        curf = fields['quote_currency']
+        mixed = curf.status != ERROR
+        curf.status[mixed] = WARNING
+        curf.message[mixed] = f"Mixed currencies in batch: {', '.join(sorted(currencies_used))}"
+
+    # --- Batch-level date outlier (>2 years from batch median) ---
+    quote_dates = parsed['quotation_date']
+    dated = np.flatnonzero(~np.isnat(quote_dates))
+    if len(dated) >= 2:
+        values = quote_dates[dated]
+        median = np.sort(values)[len(values) // 2]
+        diff_days = np.abs((values - median).astype(np.int64) // _DAY_US)
+        qdf = fields['quotation_date']
+        raw = column['quotation_date']
+        for i, days in zip(dated[diff_days > 730].tolist(), diff_days[diff_days > 730].tolist()):
+            qdf.status[i] = WARNING
+            qdf.message[i] = f"Date outlier: {raw[i]} is {days // 365}+ years from batch median"
+            qdf.suggestion[i] = ''
+
+    # --- Encode field-level results ---
+    for i, msg in duplicate_sku.items():
+        fields['sku'].status[i] = WARNING
+        fields['sku'].message[i] = msg
+    worst = np.zeros(n, dtype=np.int8)
+    for f in _FIELD_ORDER:
+        np.maximum(worst, fields[f].status, out=worst)
+    worst_names = [_STATUS_NAMES[s] for s in worst.tolist()]
+
+    text_index = {'': 0}
+    codes = np.stack([fields[f].status for f in _FIELD_ORDER])
+    message_ids = np.zeros(codes.shape, dtype=np.int32)
+    suggestion_ids = np.zeros(codes.shape, dtype=np.int32)
+    for row, f in enumerate(_FIELD_ORDER):
+        for texts, ids in ((fields[f].message, message_ids[row]), (fields[f].suggestion, suggestion_ids[row])):
+            idx = np.flatnonzero(texts != '')
+            ids[idx] = [text_index.setdefault(t, len(text_index)) for t in texts[idx].tolist()]
+    sku_row = _FIELD_ORDER.index('sku')
+    for i in duplicate_sku:
+        codes[sku_row, i] |= _NO_SUGGESTION
+        suggestion_ids[sku_row, i] = 0
+
+    for i, rec in enumerate(records):
+        rec['validation_message'] = '; '.join(messages[i]) if i in messages else 'All fields valid'
+        rec['validation_status'] = worst_names[i]
+
+    # Restore acknowledged state and recalculate status ignoring acknowledged fields
+    field_rows = {f: row for row, f in enumerate(_FIELD_ORDER)}
+    for i, ack_fields in acknowledged_map.items():
+        for field_name in ack_fields:
+            if field_name in field_rows:
+                codes[field_rows[field_name], i] |= _ACKNOWLEDGED
+        statuses = codes[:, i]
+        statuses = statuses[(statuses & _ACKNOWLEDGED) == 0] & 3
+        records[i]['validation_status'] = _STATUS_NAMES[int(statuses.max())] if len(statuses) else 'valid'
+
+    return CompactValidation(codes, message_ids, suggestion_ids, list(text_index))
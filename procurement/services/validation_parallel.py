@@ -0,0 +1,133 @@
+"""
+Process-pool validation for very large uploads.
+The per-record section of validate_records (field rules, fuzzy SKU match,
+catalog check) is CPU-bound and holds the GIL, so with VALIDATION_ENGINE=parallel
+it is sharded across a long-lived pool of worker processes. The pool is started
+once (at app startup, or on first use) with the forkserver or spawn method, so
+workers never inherit the locks of the server's threads. The reference data
+(known SKUs, catalog entries, historical stats) is pickled once per batch into
+shared memory; each worker unpickles it once and reuses it for every shard of
+the batch. PDF catalog lookups and the batch-level passes run in the parent
+after the shards are merged.
+"""
+import logging
+import math
+import multiprocessing
+import pickle
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from procurement.config.settings import VALIDATION_WORKERS
+from procurement.services import validation
+
+logger = logging.getLogger(__name__)
+
+# Shards per worker, so a slow shard does not leave the other workers idle
+_SHARDS_PER_WORKER = 4
+
+# Only the fields the per-record section reads are sent to the workers
+_INPUT_FIELDS = tuple(dict.fromkeys([
+    *validation._ERROR_TEXT, *validation._WARNING_TEXT, *validation._ERROR_NUMERIC,
+    *validation._WARNING_NUMERIC, *validation._DATE_FIELDS,
+]))
+
+_pool: "ProcessPoolExecutor | None" = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+# In a worker: (shared memory block name, references) of the batch being validated
+_worker_refs: tuple = (None, None)
+
+
+def _load_refs(block: str, size: int) -> tuple:
+    """The references of a batch, read from its shared memory block on the worker's first shard."""
+    global _worker_refs
+    if _worker_refs[0] != block:
+        shm = shared_memory.SharedMemory(name=block)
+        try:
+            _worker_refs = (block, pickle.loads(shm.buf[:size]))
+        finally:
+            shm.close()
+    return _worker_refs[1]
+
+
+def _validate_shard(refs: tuple, records: list[dict]) -> list[tuple]:
+    known_skus, known_skus_upper, catalog_entries, historical_stats = refs
+    return [
+        validation._validate_record_entry(rec, known_skus, known_skus_upper, catalog_entries, historical_stats)
+        for rec in records
+    ]
+
+
+def _validate_shared_shard(block: str, size: int, records: list[dict]) -> list[tuple]:
+    return _validate_shard(_load_refs(block, size), records)
+
+
+def _mp_context():
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+def start_pool(workers: int = None) -> ProcessPoolExecutor:
+    """Start the shared validation pool (idempotent). workers defaults to VALIDATION_WORKERS or the CPU count."""
+    global _pool, _pool_workers
+    workers = max(1, workers or VALIDATION_WORKERS or multiprocessing.cpu_count())
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=_mp_context())
+            _pool_workers = workers
+        return _pool
+
+
+def shutdown_pool():
+    """Stop the shared validation pool; the next parallel validation starts a new one."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _discard_pool(pool: ProcessPoolExecutor):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def validate_record_entries_parallel(
+    records: list[dict],
+    known_skus: list[str] = None,
+    catalog_entries: dict = None,
+    historical_stats: dict = None,
+    workers: int = 2,
+) -> list[tuple]:
+    """validation._validate_record_entry for every record, computed in the shared pool.
+
+    Results are in record order. If the pool cannot be started or breaks, the
+    failure is logged, the pool is discarded and the batch is validated in process.
+    """
+    refs = (known_skus, [s.upper() for s in (known_skus or [])], catalog_entries, historical_stats)
+    slim = [{f: rec.get(f) for f in _INPUT_FIELDS} for rec in records]
+
+    pool = shm = None
+    try:
+        pool = start_pool(workers)
+        payload = pickle.dumps(refs, protocol=pickle.HIGHEST_PROTOCOL)
+        shm = shared_memory.SharedMemory(create=True, size=max(1, len(payload)))
+        shm.buf[:len(payload)] = payload
+        size = max(1, math.ceil(len(slim) / (_pool_workers * _SHARDS_PER_WORKER)))
+        shards = [slim[i:i + size] for i in range(0, len(slim), size)]
+        results = pool.map(_validate_shared_shard, [shm.name] * len(shards), [len(payload)] * len(shards), shards)
+        return [entry for shard in results for entry in shard]
+    except Exception:
+        logger.warning("Parallel validation failed; validating %d records in process", len(slim), exc_info=True)
+        if pool is not None:
+            _discard_pool(pool)
+        return _validate_shard(refs, slim)
+    finally:
+        if shm is not None:
+            shm.close()
+            shm.unlink()
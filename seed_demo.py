@@ -299,6 +299,8 @@ def main():
         n_hist = seed_historical(conn)
         seed_uploaded_files(conn)
         n_drafts = seed_sample_quote_drafts(conn)
+        # Backfill the epoch-day columns and line fingerprints of the raw inserts
+        init_db()
 
         cur = conn.execute("SELECT COUNT(*) FROM records WHERE is_current = 1")
         total_rec = cur.fetchone()[0]
@@ -0,0 +1,69 @@
+"""
+Tests for the analyst context builder.
+"""
+from unittest.mock import patch
+
+import pytest
+from procurement.services.analyst_context import (
+    TABLE_HEADER, build_analyst_context, encode_table, estimate_tokens,
+)
+from procurement.services.database import get_db_connection, init_db, insert_record
+
+
+@pytest.fixture
+def temp_db(tmp_path):
+    with patch('procurement.services.database.DATABASE_PATH', tmp_path / 'test.db'):
+        init_db()
+        yield
+
+
+def _records(n):
+    return [
+        {'id': i, 'sku': f'SKU-{i:03d}', 'distributor': 'Ingram Micro' if i % 2 else 'Tech Data',
+         'eu_company': 'Company A', 'quote_currency': 'USD', 'quantity': 1,
+         'unit_price': float(i), 'total_price': float(i), 'item_description': 'x' * 80}
+        for i in range(n)
+    ]
+
+
+class TestEncodeTable:
+    def test_compact_rows(self):
+        lines = encode_table([{'sku': 'A|B', 'unit_price': 12.5, 'quantity': 2.0, 'item_description': 'y' * 80}])
+        assert lines[0] == TABLE_HEADER
+        cells = lines[1].split('|')
+        assert cells[1] == 'A/B' and len(cells[2]) == 40
+        assert '12.5' in cells and '2' in cells
+
+
+class TestBuildAnalystContext:
+    def test_mentioned_sku_ranks_first_and_budget_respected(self, temp_db):
+        records = _records(300)
+        ctx = build_analyst_context("What about SKU-007?", records, token_budget=800)
+        assert ctx.records[0]['sku'] == 'SKU-007'
+        # Then by spend, largest first
+        assert ctx.records[1]['sku'] == 'SKU-299'
+        assert ctx.tokens <= 800
+        assert 0 < len(ctx.records) < 300
+
+    def test_excluded_keys_not_resent(self, temp_db):
+        records = _records(5)
+        first = build_analyst_context("overview", records)
+        second = build_analyst_context("overview", records, exclude=first.keys)
+        assert len(first.records) == 5
+        assert second.records == [] and second.text == ''
+
+    def test_aggregates_from_database(self, temp_db):
+        conn = get_db_connection()
+        conn.execute("INSERT INTO historical_archive (sku, unit_price, quantity) VALUES ('SKU-001', 90, 1)")
+        conn.commit()
+        conn.close()
+        insert_record({'sku': 'SKU-001', 'distributor': 'Tech Data', 'quote_currency': 'USD',
+                       'unit_price': 100.0, 'quantity': 2, 'total_price': 200.0})
+
+        ctx = build_analyst_context("Is SKU-001 competitive?")
+        assert 'SKU-001|1|90' in ctx.text
+        assert 'Tech Data|USD|1|200' in ctx.text
+        assert {'agg:sku:SKU-001', 'agg:distributors'} <= ctx.keys
+
+    def test_estimate_tokens(self):
+        assert estimate_tokens('abcd' * 10) == 10
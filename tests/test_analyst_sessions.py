@@ -0,0 +1,108 @@
+"""
+Tests for persistent analyst conversations (offline, against the fake client).
+"""
+from unittest.mock import patch
+
+import pytest
+from procurement.services.analyst_cache import AnalystCache
+from procurement.services.analyst_sessions import ConversationStore
+from procurement.services.database import (
+    get_data_version, init_db, insert_record, save_approved_records, save_draft_records,
+)
+from procurement.services.fake_h2ogpte import FakeH2OGPTE
+from procurement.services.llm_service import query_analyst
+
+
+@pytest.fixture
+def analyst(tmp_path):
+    """Fake client recording every prompt, fresh conversation store and cache, and an empty database."""
+    client = FakeH2OGPTE()
+    store = ConversationStore(idle_seconds=60, max_conversations=2)
+    prompts = []
+    respond = client._respond
+
+    def _spy(message, llm_args, digests):
+        prompts.append(message)
+        return respond(message, llm_args, digests)
+
+    with patch('procurement.services.database.DATABASE_PATH', tmp_path / 'test.db'), \
+            patch.object(client, '_respond', _spy), \
+            patch('procurement.services.llm_service.get_h2ogpte_client', return_value=client), \
+            patch('procurement.services.analyst_sessions.conversation_store', store), \
+            patch('procurement.services.analyst_cache.analyst_cache', AnalystCache()):
+        init_db()
+        yield client, store, prompts
+
+
+RECORDS = [{'id': i, 'sku': f'SKU-{i}', 'unit_price': 100 + i} for i in range(3)]
+
+
+class TestAnalystConversations:
+    def test_follow_up_reuses_session_and_sends_only_delta(self, analyst):
+        client, store, prompts = analyst
+        first = query_analyst("Which SKU is cheapest?", context_records=RECORDS)
+        assert first.conversation_id
+        assert 'procurement analyst' in prompts[0] and 'SKU-2' in prompts[0]
+
+        extra = RECORDS + [{'id': 9, 'sku': 'SKU-9', 'unit_price': 50}]
+        second = query_analyst("And now?", context_records=extra, conversation_id=first.conversation_id)
+        assert second.conversation_id == first.conversation_id
+        assert 'procurement analyst' not in prompts[1]
+        assert 'SKU-9' in prompts[1] and 'SKU-0' not in prompts[1]
+        assert len(client._chat_sessions) == 1
+
+        query_analyst("Thanks", context_records=extra, conversation_id=first.conversation_id)
+        assert prompts[2] == "User Question: Thanks"
+
+    def test_idle_eviction_deletes_chat_session(self, analyst):
+        client, store, _ = analyst
+        query_analyst("Hi")
+        store.idle_seconds = 0
+        assert store.evict_idle(client) == 1
+        assert client._chat_sessions == {}
+
+    def test_overflow_evicts_least_recently_used(self, analyst):
+        client, store, _ = analyst
+        ids = [query_analyst(f"Q{i}").conversation_id for i in range(3)]
+        assert store.stats()['conversations'] == 2
+        assert not store.end(ids[0], client)
+
+    def test_streams_tokens(self, analyst):
+        tokens = []
+        result = query_analyst("Summarize spend", on_token=tokens.append)
+        assert len(tokens) > 1
+        assert ''.join(tokens) == result.response
+
+
+class TestAnalystCache:
+    def test_repeat_question_served_from_cache(self, analyst):
+        _, _, prompts = analyst
+        first = query_analyst("Which SKU is cheapest?", context_records=RECORDS)
+        again = query_analyst("which sku is  cheapest", context_records=list(reversed(RECORDS)))
+        assert (first.cache, again.cache) == ('miss', 'hit')
+        assert again.response == first.response and again.conversation_id != first.conversation_id
+        assert len(prompts) == 1
+
+        # The cached exchange is carried into the follow-up turn
+        query_analyst("Why?", conversation_id=again.conversation_id)
+        assert 'Earlier question: which sku is  cheapest' in prompts[1]
+
+    def test_follow_ups_not_cached(self, analyst):
+        first = query_analyst("Hi")
+        assert query_analyst("Hi", conversation_id=first.conversation_id).cache is None
+
+    def test_data_change_invalidates(self, analyst):
+        _, _, prompts = analyst
+        query_analyst("Which SKU is cheapest?", context_records=RECORDS)
+        insert_record({'sku': 'SKU-NEW', 'unit_price': 10.0, 'is_current': 1})
+        assert query_analyst("Which SKU is cheapest?", context_records=RECORDS).cache == 'miss'
+        assert len(prompts) == 2
+
+
+class TestDataVersion:
+    def test_drafts_do_not_bump_version(self, analyst):
+        before = get_data_version()
+        save_draft_records([{'sku': 'DRAFT-1'}], file_id=1, source_file='q.pdf')
+        assert get_data_version() == before
+        save_approved_records([{'sku': 'DRAFT-1'}], source_file='q.pdf')
+        assert get_data_version() != before
@@ -0,0 +1,137 @@
+"""
+Tests for the deterministic analyst analytics tools.
+"""
+from unittest.mock import patch
+
+import pytest
+from procurement.services.analytics import (
+    answer_with_tools, distributor_price_comparison, match_tool, negotiation_candidates,
+    price_changes_by_sku, price_trend, price_variance_by_sku, total_spend_impact, validation_issue_summary,
+)
+from procurement.services.database import get_db_connection, init_db, insert_record
+from procurement.services.llm_service import _generate_suggestions, query_analyst
+
+
+@pytest.fixture
+def seeded_db(tmp_path):
+    with patch('procurement.services.database.DATABASE_PATH', tmp_path / 'test.db'):
+        init_db()
+        conn = get_db_connection()
+        history = [
+            ('STABLE-1', 'Tech Data', 100, '2025-01-15'), ('STABLE-1', 'Tech Data', 100, '2025-06-15'),
+            ('VOLATILE-1', 'Tech Data', 50, '2025-01-15'), ('VOLATILE-1', 'Ingram Micro', 150, '2025-06-15'),
+        ]
+        conn.executemany(
+            "INSERT INTO historical_archive (sku, distributor, quote_currency, unit_price, quantity, archived_at) "
+            "VALUES (?, ?, 'USD', ?, 1, ?)", history,
+        )
+        conn.commit()
+        conn.close()
+        insert_record({'sku': 'STABLE-1', 'distributor': 'Tech Data', 'quote_currency': 'USD',
+                       'unit_price': 120.0, 'quantity': 2, 'validation_status': 'valid'})
+        insert_record({'sku': 'VOLATILE-1', 'distributor': 'Tech Data', 'quote_currency': 'USD',
+                       'unit_price': 90.0, 'quantity': 1, 'validation_status': 'warning',
+                       'validation_message': 'Price deviates from history'})
+        yield
+
+
+class TestTools:
+    def test_price_variance(self, seeded_db):
+        result = price_variance_by_sku()
+        assert [r['sku'] for r in result.data['skus']] == ['VOLATILE-1', 'STABLE-1']
+        assert result.data['skus'][0]['cv_pct'] == 50.0
+
+    def test_distributor_comparison(self, seeded_db):
+        result = distributor_price_comparison()
+        (cmp,) = result.data['skus']
+        assert cmp['sku'] == 'VOLATILE-1'
+        assert [d['distributor'] for d in cmp['distributors']] == ['Tech Data', 'Ingram Micro']
+
+    def test_spend_impact_exact(self, seeded_db):
+        usd = total_spend_impact().data['currencies']['USD']
+        # 2 x (120 - 100) + 1 x (90 - 100)
+        assert usd['impact'] == 30.0
+        assert usd['current'] == 330.0 and usd['historical'] == 300.0
+
+    def test_negotiation_candidates(self, seeded_db):
+        items = negotiation_candidates().data['items']
+        assert [i['sku'] for i in items] == ['STABLE-1']
+        assert items[0]['potential_saving'] == 40.0
+
+    def test_price_changes(self, seeded_db):
+        changes = price_changes_by_sku().data['skus']
+        assert changes[0]['sku'] == 'VOLATILE-1' and changes[0]['change_pct'] == 200.0
+
+    def test_price_trend_index_from_rollups(self, seeded_db):
+        # Each SKU averages 100: January is (1.0 + 0.5) / 2, June (1.0 + 1.5) / 2
+        assert [p['value'] for p in price_trend().data['points']] == [75.0, 125.0]
+        assert [p['value'] for p in price_trend(records=[{'sku': 'STABLE-1'}]).data['points']] == [100.0, 100.0]
+
+
+QUOTE = [
+    {'sku': 'VOLATILE-1', 'distributor': 'Arrow', 'quote_currency': 'USD', 'unit_price': 130.0, 'quantity': 3,
+     'validation_status': 'error', 'validation_message': 'Missing quotation date'},
+    {'sku': 'NEW-1', 'unit_price': 10.0, 'validation_status': 'valid'},
+]
+
+
+class TestScopedTools:
+    def test_negotiation_uses_supplied_records(self, seeded_db):
+        (item,) = negotiation_candidates(records=QUOTE).data['items']
+        # Not the active STABLE-1 record; 3 x (130 - 100)
+        assert item['sku'] == 'VOLATILE-1' and item['potential_saving'] == 90.0
+
+    def test_spend_impact_uses_supplied_records(self, seeded_db):
+        assert total_spend_impact(records=QUOTE).data['currencies']['USD']['impact'] == 90.0
+
+    def test_validation_summary_uses_supplied_records(self, seeded_db):
+        result = validation_issue_summary(records=QUOTE)
+        assert result.data['status_counts'] == {'error': 1, 'valid': 1}
+        assert result.data['top_messages'] == [{'message': 'Missing quotation date', 'n': 1}]
+
+    def test_history_tools_limited_to_quoted_skus(self, seeded_db):
+        assert [r['sku'] for r in price_variance_by_sku(records=QUOTE).data['skus']] == ['VOLATILE-1']
+        assert price_changes_by_sku(records=[{'sku': 'STABLE-1'}]).data['skus'][0]['change_pct'] == 0.0
+        (cmp,) = distributor_price_comparison(records=QUOTE).data['skus']
+        assert [d['distributor'] for d in cmp['distributors']] == ['Tech Data', 'Arrow', 'Ingram Micro']
+
+
+class TestRouting:
+    @pytest.mark.parametrize('question, tool', [
+        ("Which SKUs have the highest price variance?", 'price_variance'),
+        ("Compare prices across distributors", 'distributor_comparison'),
+        ("What's the total spend impact?", 'spend_impact'),
+        ("Which items should I negotiate on?", 'negotiation'),
+        ("Which items have increased in price the most?", 'price_changes'),
+        ("What are the most common validation errors?", 'validation_issues'),
+    ])
+    def test_suggestion_chips_route_to_tools(self, seeded_db, question, tool):
+        assert answer_with_tools(question).tool == tool
+
+    @pytest.mark.parametrize('question', [
+        "Is this quotation competitive compared to history?",
+        "How should I negotiate with TechVault on the firewall renewal?",
+        "Why is this quote above the historical average and is it justified?",
+        "Explain the data quality problems in my uploaded file",
+        "Which items need attention in this quote?",
+    ])
+    def test_open_questions_fall_back(self, question):
+        assert match_tool(question) is None
+
+    def test_every_chip_is_routed_or_left_to_the_llm(self):
+        llm_chips = {"Are there any seasonal pricing patterns?", "Is this quotation competitive compared to history?"}
+        chips = {c for q in ('price', 'trend', 'error', 'other') for c in _generate_suggestions(q)}
+        assert {c for c in chips if match_tool(c) is None} == llm_chips
+
+    def test_chip_is_scoped_to_context_records(self, seeded_db):
+        with patch('procurement.services.llm_service.get_h2ogpte_client') as client:
+            result = query_analyst("Which items should I negotiate on?", context_records=QUOTE)
+        client.assert_not_called()
+        assert [i['sku'] for i in result.data['items']] == ['VOLATILE-1']
+
+    def test_analyst_answers_without_llm(self, seeded_db):
+        with patch('procurement.services.llm_service.get_h2ogpte_client') as client:
+            result = query_analyst("What's the total spend impact?")
+        client.assert_not_called()
+        assert result.tool == 'spend_impact' and result.confidence == 1.0
+        assert '30.00' in result.response
@@ -0,0 +1,66 @@
+"""
+Tests for the temporary collection pool (offline, against the fake client).
+"""
+import io
+
+from procurement.services.collection_pool import CollectionPool
+from procurement.services.fake_h2ogpte import FakeH2OGPTE
+
+
+def _ingest(client, collection_id):
+    upload_id = client.upload('quote.pdf', io.BytesIO(b'%PDF-1.4'))
+    client.ingest_uploads(collection_id, [upload_id])
+
+
+class TestCollectionPool:
+    def test_released_collection_is_cleared_and_reused(self):
+        client = FakeH2OGPTE()
+        pool = CollectionPool(max_idle=2, warm=0)
+        first = pool.acquire(client)
+        _ingest(client, first)
+        pool.release(first, client, wait=True)
+
+        assert client.list_documents_in_collection(first) == []
+        assert pool.acquire(client) == first
+        usage = pool.usage()
+        assert usage['created'] == 1 and usage['reused'] == 1 and usage['in_use'] == 1
+
+    def test_overflow_is_deleted(self):
+        client = FakeH2OGPTE()
+        pool = CollectionPool(max_idle=1, warm=0)
+        a, b = pool.acquire(client), pool.acquire(client)
+        pool.release(a, client, wait=True)
+        pool.release(b, client, wait=True)
+        assert [c.id for c in client.list_recent_collections()] == [a]
+        assert pool.usage()['discarded'] == 1
+
+    def test_reaps_leaked_temporary_collections_only(self):
+        client = FakeH2OGPTE()
+        client.create_collection(name='extraction_abc123')
+        client.create_collection(name='verify_deadbeef')
+        keep = client.create_collection(name='ref_catalog_1234')
+        pool = CollectionPool(max_idle=2, warm=1)
+        pool.fill(client)
+
+        assert pool.reap_leaked(client) == 2
+        remaining = {c.id for c in client.list_recent_collections()}
+        assert keep in remaining and len(remaining) == 2
+
+    def test_live_pools_of_other_processes_are_not_reaped(self):
+        client = FakeH2OGPTE()
+        CollectionPool(max_idle=2, warm=2).fill(client)
+        live = {c.id for c in client.list_recent_collections()}
+        CollectionPool(max_idle=1, warm=1, lease_seconds=0).fill(client)  # owner stopped renewing
+
+        assert CollectionPool(warm=0).reap_leaked(client) == 1
+        assert {c.id for c in client.list_recent_collections()} == live
+
+    def test_renewal_extends_the_lease(self):
+        client = FakeH2OGPTE()
+        pool = CollectionPool(max_idle=1, warm=1, lease_seconds=0)
+        pool.fill(client)
+        pool.lease_seconds = 600
+        assert pool.renew_leases(client) == 1
+        (coll,) = client.list_recent_collections()
+        assert f"owner={pool.owner}" in coll.description
+        assert CollectionPool(warm=0).reap_leaked(client) == 0
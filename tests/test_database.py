@@ -6,13 +6,18 @@ import sqlite3
 from unittest.mock import patch
 from procurement.services.database import (
     init_db, get_db_connection, insert_record, get_record_by_id,
-    update_record, delete_record, get_current_records,
+    update_record, update_records, delete_record, get_current_records,
     save_approved_records, search_historical_records,
     get_historical_stats, get_dashboard_metrics,
     get_price_trend_by_sku, get_records_added_this_month,
+    get_historical_price_summaries_batch, rebuild_price_rollups, to_epoch_day,
+    get_archived_fingerprints, get_price_quantiles, rebuild_price_sketches, refresh_price_sketches,
+    save_draft_records, replace_draft_records, get_draft_records_by_file, apply_draft_operations,
+    get_changes,
     ALLOWED_UPDATE_COLUMNS,
 )
 from procurement.config.settings import DATABASE_PATH
+from procurement.services.validation import line_fingerprint
 from pathlib import Path
 import tempfile
 import os
@@ -136,6 +141,392 @@ class TestSearchHistoricalRecords:
             assert results[0]['sku'] == 'SRCH-001'
 
 
+class TestUpdateRecords:
+    def test_bulk_update_logs_changes_and_returns_rows(self, temp_db):
+        with patch('procurement.services.database.DATABASE_PATH', temp_db):
+            first = insert_record({'sku': 'BU-1', 'unit_price': 10})
+            second = insert_record({'sku': 'BU-2', 'unit_price': 20})
+            rows = update_records({first: {'unit_price': 11, 'sku': 'BU-1', 'id': 99},
+                                   second: {'start_date': '2024-01-15'}})
+            assert [(r['id'], r['unit_price'], r['user_modified']) for r in rows] == [(first, 11, 1), (second, 20, 1)]
+            assert rows[1]['start_day'] == to_epoch_day('2024-01-15')
+            conn = get_db_connection()
+            log = conn.execute("SELECT record_id, field_name, old_value, new_value FROM change_log ORDER BY id").fetchall()
+            conn.close()
+            assert [tuple(r) for r in log] == [(first, 'unit_price', '10.0', '11'),
+                                               (second, 'start_date', 'None', '2024-01-15')]
+
+    def test_missing_record_updates_nothing(self, temp_db):
+        with patch('procurement.services.database.DATABASE_PATH', temp_db):
+            record_id = insert_record({'sku': 'BU-3'})
+            with pytest.raises(ValueError):
+                update_records({record_id: {'sku': 'BU-4'}, 999: {'sku': 'X'}})
+            assert get_record_by_id(record_id)['sku'] == 'BU-3'
+            assert update_record(999, {'sku': 'X'}) is False
+
+
+class TestChangeFeed:
+    def test_mutations_are_published_in_order(self, temp_db):
+        with patch('procurement.services.database.DATABASE_PATH', temp_db):
+            record_id = insert_record({'sku': 'CF-1'})
+            update_record(record_id, {'sku': 'CF-2'})
+            delete_record(record_id)
+            draft_id, = save_draft_records([{'sku': 'CF-3'}], 1, 'quote.pdf')
+            approved_id, = save_approved_records([{'sku': 'CF-4', 'unit_price': 5}])
+            feed = get_changes()
+            assert [(c['seq'], c['table_name'], c['row_id'], c['op']) for c in feed['changes']] == [
+                (1, 'records', record_id, 'insert'),
+                (2, 'records', record_id, 'update'),
+                (3, 'records', record_id, 'delete'),
+                (4, 'drafts', draft_id, 'insert'),
+                (5, 'records', approved_id, 'insert'),
+                (6, 'historical_archive', 1, 'insert'),
+            ]
+            assert (feed['next_since'], feed['has_more'], feed['reset']) == (6, False, False)
+
+    def test_since_limit_and_tables(self, temp_db):
+        with patch('procurement.services.database.DATABASE_PATH', temp_db):
+            for sku in ('CF-5', 'CF-6', 'CF-7'):
+                insert_record({'sku': sku})
+            save_draft_records([{'sku': 'CF-8'}], 1, 'quote.pdf')
+            page = get_changes(since=1, limit=1)
+            assert [c['seq'] for c in page['changes']] == [2] and page['has_more'] and page['next_since'] == 2
+            drafts = get_changes(since=2, tables=['drafts'])
+            assert [c['seq'] for c in drafts['changes']] == [4] and drafts['next_since'] == 4
+            assert get_changes(since=4) == {'changes': [], 'next_since': 4, 'has_more': False, 'reset': False}
+
+    def test_commit_between_reads_is_not_returned_twice(self, temp_db):
+        class _Conn:
+            """Connection that lets another writer commit right after the sequence is read."""
+
+            def __init__(self, conn):
+                self._conn = conn
+
+            def __getattr__(self, name):
+                return getattr(self._conn, name)
+
+            def execute(self, sql, *args):
+                result = self._conn.execute(sql, *args)
+                if 'sqlite_sequence' in sql:
+                    insert_record({'sku': 'CF-LATE'})
+                return result
+
+        with patch('procurement.services.database.DATABASE_PATH', temp_db):
+            insert_record({'sku': 'CF-11'})
+            connect = get_db_connection
+            with patch('procurement.services.database.get_db_connection', lambda: _Conn(connect())):
+                first = get_changes()
+            second = get_changes(since=first['next_since'])
+            seqs = [c['seq'] for c in first['changes'] + second['changes']]
+            assert seqs == [1, 2] and first['next_since'] >= max(c['seq'] for c in first['changes'])
+
+    def test_pruned_or_unknown_position_requests_reset(self, temp_db):
+        with patch('procurement.services.database.DATABASE_PATH', temp_db):
+            insert_record({'sku': 'CF-9'})
+            insert_record({'sku': 'CF-10'})
+            conn = get_db_connection()
+            conn.execute("UPDATE change_feed SET changed_at = '2000-01-01' WHERE seq = 1")
+            conn.commit()
+            conn.close()
+            init_db()
+            assert get_changes(since=0)['reset'] and not get_changes(since=1)['reset']
+            assert get_changes(since=50)['reset']
+
+
+class TestDateDays:
+    def test_epoch_day_across_formats(self):
+        assert to_epoch_day('1970-01-02') == 1
+        day = to_epoch_day('2024-01-15')
+        assert to_epoch_day('01/15/2024') == to_epoch_day('15-Jan-24') == to_epoch_day('2024-01-15 23:59:59') == day
+        assert to_epoch_day('soon') is None and to_epoch_day(None) is None
+
+    def test_range_filter_mixed_archive_formats(self, temp_db):
+        with patch('procurement.services.database.DATABASE_PATH', temp_db):
+            save_approved_records([{'sku': 'DAY-1', 'unit_price': 1}])
+            conn = get_db_connection()
+            conn.execute("UPDATE historical_archive SET archived_at = '2025-01-31 18:30:00' WHERE sku = 'DAY-1'")
+            conn.commit()
+            conn.close()
+            # A text comparison would drop the evening row of the closing day
+            assert len(search_historical_records(date_from='2025-01-01', date_to='2025-01-31')) == 1
+            assert search_historical_records(date_from='02/01/2025') == []
+
+    def test_update_recomputes_shadow_column(self, temp_db):
+        with patch('procurement.services.database.DATABASE_PATH', temp_db):
+            record_id = insert_record({'sku': 'DAY-2', 'start_date': '2024-01-15'})
+            update_record(record_id, {'start_date': '16-Jan-24'})
+            assert get_record_by_id(record_id)['start_day'] == to_epoch_day('2024-01-16')
+
+    def test_migration_backfills_legacy_rows(self, tmp_path):
+        db_path = tmp_path / 'legacy.db'
+        conn = sqlite3.connect(str(db_path))
+        conn.execute("CREATE TABLE historical_archive (id INTEGER PRIMARY KEY AUTOINCREMENT, sku TEXT, "
+                     "distributor TEXT, eu_company TEXT, quote_currency TEXT, quantity REAL, unit_price REAL, start_date TEXT, "
+                     "end_date TEXT, quotation_date TEXT, quotation_end_date TEXT, "
+                     "archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)")
+        conn.execute("INSERT INTO historical_archive (sku, start_date, archived_at) "
+                     "VALUES ('OLD-1', 'Jan 15, 2024', '2024-02-01 10:00:00')")
+        conn.commit()
+        conn.close()
+        with patch('procurement.services.database.DATABASE_PATH', db_path):
+            init_db()
+            (row,) = search_historical_records(sku='OLD-1')
+            assert (row['start_day'], row['archived_day']) == (to_epoch_day('2024-01-15'), to_epoch_day('2024-02-01'))
+
+
+    def test_init_backfills_rows_written_outside_the_service(self, temp_db):
+        with patch('procurement.services.database.DATABASE_PATH', temp_db):
+            conn = get_db_connection()
+            # As seed_demo.py writes them: no shadow columns, ISO timestamps
+            conn.execute("INSERT INTO historical_archive (sku, unit_price, start_date, archived_at) "
+                         "VALUES ('SEED-1', 5, '2024-01-15', '2024-02-01T09:30:00.123456')")
+            conn.commit()
+            conn.close()
+            assert search_historical_records(date_from='2020-01-01') == []
+            init_db()
+            (row,) = search_historical_records(date_from='2020-01-01')
+            assert (row['start_day'], row['archived_day']) == (to_epoch_day('2024-01-15'), to_epoch_day('2024-02-01'))
+            assert row['line_fingerprint'] == line_fingerprint({'sku': 'SEED-1', 'unit_price': 5})
+
+
+class TestLineFingerprints:
+    LINE = {'sku': 'FP-1', 'unit_price': 10, 'quantity': 3, 'quotation_ref_no': 'Q-1', 'distributor': 'D'}
+
+    def _archive_count(self):
+        conn = get_db_connection()
+        try:
+            return conn.execute("SELECT COUNT(*) FROM historical_archive").fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_archive_rows_are_fingerprinted(self, temp_db):
+        with patch('procurement.services.database.DATABASE_PATH', temp_db):
+            save_approved_records([self.LINE])
+            other = line_fingerprint({**self.LINE, 'quantity': 4})
+            assert get_archived_fingerprints([line_fingerprint(self.LINE), other]) == {line_fingerprint(self.LINE)}
+
+    def test_skip_duplicates_is_idempotent(self, temp_db):
+        with patch('procurement.services.database.DATABASE_PATH', temp_db):
+            save_approved_records([self.LINE])
+            batch = [dict(self.LINE, sku='fp-1 '), {**self.LINE, 'quantity': 4}, {**self.LINE, 'quantity': 4}]
+            ids = save_approved_records(batch, skip_duplicates=True)
+            assert len(ids) == 2
+            assert self._archive_count() == 3
+            assert save_approved_records(batch, skip_duplicates=True) == []
+            # Default mode keeps the previous behaviour
+            assert len(save_approved_records([self.LINE])) == 1
+
+    def test_skip_duplicates_keeps_lines_repeated_within_the_batch(self, temp_db):
+        with patch('procurement.services.database.DATABASE_PATH', temp_db):
+            licences = [{**self.LINE, 'serial_no': 'SN-1'}, {**self.LINE, 'serial_no': 'SN-2'}]
+            assert len(save_approved_records(licences, skip_duplicates=True)) == 2
+            assert self._archive_count() == 2
+
+    def test_migration_backfills_fingerprints(self, tmp_path):
+        db_path = tmp_path / 'legacy.db'
+        conn = sqlite3.connect(str(db_path))
+        conn.execute("CREATE TABLE historical_archive (id INTEGER PRIMARY KEY AUTOINCREMENT, sku TEXT, "
+                     "distributor TEXT, eu_company TEXT, quote_currency TEXT, quantity REAL, unit_price REAL, "
+                     "quotation_ref_no TEXT, start_date TEXT, end_date TEXT, quotation_date TEXT, quotation_end_date TEXT, "
+                     "archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)")
+        conn.execute("INSERT INTO historical_archive (sku, distributor, quantity, unit_price, quotation_ref_no) "
+                     "VALUES ('FP-1', 'D', 3, 10, 'Q-1')")
+        conn.commit()
+        conn.close()
+        with patch('procurement.services.database.DATABASE_PATH', db_path):
+            init_db()
+            assert get_archived_fingerprints([line_fingerprint(self.LINE)]) == {line_fingerprint(self.LINE)}
+
+
+class TestPriceSketches:
+    def _archive(self, temp_db, rows):
+        conn = sqlite3.connect(str(temp_db))
+        conn.executemany("INSERT INTO historical_archive (sku, distributor, unit_price) VALUES (?, ?, ?)", rows)
+        conn.commit()
+        conn.close()
+        refresh_price_sketches()
+
+    def test_median_resists_a_bad_row(self, temp_db):
+        with patch('procurement.services.database.DATABASE_PATH', temp_db):
+            self._archive(temp_db, [('SK-1', 'D1', p) for p in (10, 11, 12, 13, 1000)])
+            summary = get_historical_price_summaries_batch(['SK-1'])['SK-1']
+            assert summary['avg_price'] == 209.2
+            assert (summary['median_price'], summary['mad_price']) == (12, 1)
+            self._archive(temp_db, [('SK-1', 'D2', 14)])
+            assert get_price_quantiles('SK-1')['median_price'] == 12.5
+            assert get_price_quantiles('SK-1', distributor='D2')['median_price'] == 14
+            assert get_price_quantiles('SK-1', distributor='D3') is None
+
+    def test_updates_and_deletes_rebuild_the_sku(self, temp_db):
+        with patch('procurement.services.database.DATABASE_PATH', temp_db):
+            self._archive(temp_db, [('SK-2', 'D1', p) for p in (1, 2, 3)])
+            assert get_price_quantiles('SK-2')['median_price'] == 2
+            conn = get_db_connection()
+            conn.execute("UPDATE historical_archive SET unit_price = 30 WHERE sku = 'SK-2' AND unit_price = 3")
+            conn.execute("DELETE FROM historical_archive WHERE sku = 'SK-2' AND unit_price = 1")
+            conn.commit()
+            conn.close()
+            assert get_price_quantiles('SK-2')['median_price'] == 2
+            assert refresh_price_sketches() == 2
+            assert get_price_quantiles('SK-2')['median_price'] == 16
+            assert rebuild_price_sketches() == 2
+            assert get_price_quantiles('SK-2')['median_price'] == 16
+
+    def test_readers_do_not_wait_for_the_write_lock(self, temp_db):
+        with patch('procurement.services.database.DATABASE_PATH', temp_db):
+            self._archive(temp_db, [('SK-3', 'D1', 5)])
+            writer = sqlite3.connect(str(temp_db))
+            writer.execute("BEGIN IMMEDIATE")
+            writer.execute("INSERT INTO historical_archive (sku, unit_price) VALUES ('SK-3', 7)")
+            try:
+                assert get_historical_price_summaries_batch(['SK-3'])['SK-3']['median_price'] == 5
+                assert get_price_quantiles('SK-3')['median_price'] == 5
+            finally:
+                writer.rollback()
+                writer.close()
+
+
+class TestDraftFieldValidation:
+    FIELD_VALIDATION = {
+        'sku': {'status': 'warning', 'message': "SKU 'AB' has fewer than 3 characters", 'suggestion': 'ABC-1',
+                'acknowledged': True},
+        'unit_price': {'status': 'error', 'message': 'Missing required field: unit_price', 'suggestion': ''},
+        'quotation_validity': {'status': 'valid', 'message': '', 'suggestion': ''},
+    }
+
+    def test_round_trip_keeps_acknowledgements(self, temp_db):
+        with patch('procurement.services.database.DATABASE_PATH', temp_db):
+            save_draft_records([
+                {'sku': 'AB', 'field_validation': self.FIELD_VALIDATION},
+                {'sku': 'OLD'},
+            ], file_id=1, source_file='q.pdf')
+            first, second = get_draft_records_by_file('q.pdf')
+            assert first['field_validation'] == self.FIELD_VALIDATION
+            assert 'field_validation' not in second and 'field_status' not in second
+
+    def test_messages_are_interned(self, temp_db):
+        with patch('procurement.services.database.DATABASE_PATH', temp_db):
+            drafts = [{'sku': 'AB', 'field_validation': self.FIELD_VALIDATION} for _ in range(3)]
+            replace_draft_records(drafts, source_file='q.pdf')
+            replace_draft_records(drafts, source_file='q.pdf')
+            conn = get_db_connection()
+            assert conn.execute("SELECT COUNT(*) FROM validation_text").fetchone()[0] == 3
+            conn.close()
+            assert len(get_draft_records_by_file('q.pdf')) == 3
+
+
+class TestDraftOperations:
+    def test_patch_keeps_ids_stable(self, temp_db):
+        with patch('procurement.services.database.DATABASE_PATH', temp_db):
+            first, second, third = save_draft_records(
+                [{'sku': 'A'}, {'sku': 'B'}, {'sku': 'C'}], file_id=1, source_file='q.pdf')
+            result = apply_draft_operations('q.pdf', [
+                {'op': 'update', 'id': first, 'fields': {'unit_price': 12.5, 'start_date': '15-Jan-24',
+                                                         'field_validation': {'sku': {'status': 'valid'}},
+                                                         'id': 999, 'is_current': 1}},
+                {'op': 'delete', 'id': second},
+                {'op': 'insert', 'record': {'sku': 'D'}},
+            ])
+            assert (result['updated'], result['deleted']) == (1, 1)
+            assert result['ids'] == [first, third, *result['inserted']]
+            drafts = {d['id']: d for d in get_draft_records_by_file('q.pdf')}
+            assert drafts[first]['unit_price'] == 12.5 and drafts[first]['user_modified'] == 1
+            assert drafts[first]['start_day'] == to_epoch_day('2024-01-15')
+            assert drafts[first]['field_validation']['sku']['status'] == 'valid'
+            assert drafts[third]['sku'] == 'C' and drafts[result['inserted'][0]]['sku'] == 'D'
+
+    def test_unknown_id_applies_nothing(self, temp_db):
+        with patch('procurement.services.database.DATABASE_PATH', temp_db):
+            (draft_id,) = save_draft_records([{'sku': 'A'}], file_id=1, source_file='q.pdf')
+            (other_id,) = save_draft_records([{'sku': 'B'}], file_id=2, source_file='other.pdf')
+            with pytest.raises(ValueError):
+                apply_draft_operations('q.pdf', [
+                    {'op': 'update', 'id': draft_id, 'fields': {'sku': 'A2'}},
+                    {'op': 'update', 'id': other_id, 'fields': {'sku': 'B2'}},
+                ])
+            assert [d['sku'] for d in get_draft_records_by_file('q.pdf')] == ['A']
+            assert [d['sku'] for d in get_draft_records_by_file('other.pdf')] == ['B']
+
+    def test_repeated_delete_is_a_no_op(self, temp_db):
+        with patch('procurement.services.database.DATABASE_PATH', temp_db):
+            first, second = save_draft_records([{'sku': 'A'}, {'sku': 'B'}], file_id=1, source_file='q.pdf')
+            (other_id,) = save_draft_records([{'sku': 'C'}], file_id=2, source_file='other.pdf')
+            apply_draft_operations('q.pdf', [{'op': 'delete', 'id': second}])
+            result = apply_draft_operations('q.pdf', [
+                {'op': 'delete', 'id': second},
+                {'op': 'delete', 'id': other_id},
+                {'op': 'update', 'id': first, 'fields': {'sku': 'A2'}},
+            ])
+            assert (result['updated'], result['deleted'], result['ids']) == (1, 0, [first])
+            assert len(get_draft_records_by_file('other.pdf')) == 1
+
+    def test_revalidation_does_not_mark_user_modified(self, temp_db):
+        with patch('procurement.services.database.DATABASE_PATH', temp_db):
+            (draft_id,) = save_draft_records([{'sku': 'A'}], file_id=1, source_file='q.pdf')
+            apply_draft_operations('q.pdf', [{'op': 'update', 'id': draft_id, 'fields': {
+                'validation_status': 'warning', 'validation_message': 'Check SKU',
+                'field_validation': {'sku': {'status': 'warning', 'message': 'Check SKU'}}}}])
+            (draft,) = get_draft_records_by_file('q.pdf')
+            assert draft['validation_status'] == 'warning' and not draft['user_modified']
+            apply_draft_operations('q.pdf', [{'op': 'update', 'id': draft_id, 'fields': {'sku': 'A2'}}])
+            assert get_draft_records_by_file('q.pdf')[0]['user_modified'] == 1
+
+
+class TestPriceRollup:
+    ROWS = [
+        ('RU-1', 'Co A', 'D1', 100, 2, '2025-01-05'), ('RU-1', 'Co A', 'D1', 120, None, '2025-01-20'),
+        ('RU-1', None, 'D2', 80, 4, '2025-02-10'), ('RU-1', 'Co A', 'D1', None, 1, '2025-02-11'),
+        ('RU-2', 'Co B', 'D1', 10, 1, '2025-02-01'),
+    ]
+
+    def _seed(self, temp_db):
+        conn = sqlite3.connect(str(temp_db))
+        conn.executemany(
+            "INSERT INTO historical_archive (sku, eu_company, distributor, unit_price, quantity, archived_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)", self.ROWS,
+        )
+        conn.commit()
+        return conn
+
+    def _snapshot(self):
+        return (get_price_trend_by_sku('RU-1'), get_historical_stats(), get_historical_stats(sku='RU-1'),
+                get_historical_price_summaries_batch(['RU-1', 'RU-2']))
+
+    def test_matches_raw_aggregates(self, temp_db):
+        with patch('procurement.services.database.DATABASE_PATH', temp_db):
+            self._seed(temp_db).close()
+            trend = get_price_trend_by_sku('RU-1')['data_points']
+            assert [(p['month'], p['avg_price'], p['min_price'], p['max_price'], p['record_count']) for p in trend] == [
+                ('2025-01', 110, 100, 120, 2), ('2025-02', 80, 80, 80, 1),
+            ]
+            stats = get_historical_stats()
+            assert (stats['total_records'], stats['unique_skus'], stats['unique_distributors']) == (5, 2, 2)
+            assert (stats['min_unit_price'], stats['max_unit_price'], stats['avg_unit_price']) == (10, 120, 77.5)
+            batch = get_historical_price_summaries_batch(['RU-1'])['RU-1']
+            assert (batch['avg_price'], batch['avg_quantity'], batch['record_count']) == (100, 3.0, 3)
+
+    def test_updates_deletes_and_rebuild_agree(self, temp_db):
+        with patch('procurement.services.database.DATABASE_PATH', temp_db):
+            conn = self._seed(temp_db)
+            conn.execute("UPDATE historical_archive SET unit_price = 90, archived_at = '2025-03-01' WHERE unit_price = 120")
+            conn.execute("DELETE FROM historical_archive WHERE unit_price = 80")
+            conn.commit()
+            conn.close()
+            incremental = self._snapshot()
+            assert [p['month'] for p in incremental[0]['data_points']] == ['2025-01', '2025-03']
+            assert rebuild_price_rollups() == 4
+            assert self._snapshot() == incremental
+
+    def test_init_db_backfills_existing_archive(self, temp_db):
+        with patch('procurement.services.database.DATABASE_PATH', temp_db):
+            conn = self._seed(temp_db)
+            conn.execute("DELETE FROM price_rollup_monthly")
+            conn.commit()
+            conn.close()
+            init_db()
+            assert get_historical_stats()['total_records'] == 5
+
+
 class TestGetDashboardMetrics:
     def test_empty_db(self, temp_db):
         with patch('procurement.services.database.DATABASE_PATH', temp_db):
@@ -0,0 +1,170 @@
+"""
+Tests for extraction response parsing and chunk merging (no H2OGPTE needed).
+"""
+import csv
+import zipfile
+
+import pytest
+from procurement.services.extraction import (
+    parse_extraction_response, normalize_field_names, merge_chunk_items,
+    document_ranges, page_ranges, IncrementalItemParser,
+)
+
+
+class TestParseExtractionResponse:
+    def test_items_object(self):
+        items = parse_extraction_response('{"items": [{"SKU": "A"}, {"SKU": "B"}]}')
+        assert [i['SKU'] for i in items] == ['A', 'B']
+
+    def test_jsonl(self):
+        items = parse_extraction_response('{"SKU": "A"}\n{"SKU": "B"}')
+        assert len(items) == 2
+
+    def test_garbage(self):
+        assert parse_extraction_response('no json here') == []
+
+
+class TestNormalizeFieldNames:
+    def test_maps_known_names(self):
+        rec = normalize_field_names({'SKU': 'A', 'Unit Price': 10, 'Comments/Notes': 'x'})
+        assert rec == {'sku': 'A', 'unit_price': 10, 'comments_notes': 'x'}
+
+
+class TestMergeChunkItems:
+    def test_keeps_order(self):
+        merged = merge_chunk_items([[{'SKU': 'A'}], [{'SKU': 'B'}], [{'SKU': 'C'}]])
+        assert [i['SKU'] for i in merged] == ['A', 'B', 'C']
+
+    def test_drops_row_repeated_across_boundary(self):
+        b = {'SKU': 'B', 'Unit Price': 2, 'Quantity': 1}
+        merged = merge_chunk_items([[{'SKU': 'A'}, b], [dict(b), {'SKU': 'C'}]])
+        assert [i['SKU'] for i in merged] == ['A', 'B', 'C']
+
+    def test_keeps_repeats_within_chunk_and_far_apart(self):
+        a = {'SKU': 'A', 'Unit Price': 1}
+        merged = merge_chunk_items([[a, dict(a)], [{'SKU': 'B'}], [dict(a)]])
+        assert [i['SKU'] for i in merged] == ['A', 'A', 'B', 'A']
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    monkeypatch.setattr('procurement.services.extraction.EXTRACTION_CHUNK_PAGES', 4)
+    monkeypatch.setattr('procurement.services.extraction.EXTRACTION_CHUNK_ROWS', 2)
+
+
+def _docx(path, body_xml):
+    ns = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr('word/document.xml', f'<w:document xmlns:w="{ns}"><w:body>{body_xml}</w:body></w:document>')
+    return path
+
+
+class TestDocumentRanges:
+    def test_page_ranges(self):
+        assert page_ranges(10, 4) == [(1, 4), (5, 8), (9, 10)]
+        assert page_ranges(4, 4) == [(1, 4)]
+
+    def test_small_pdf_not_chunked(self, tmp_path, small_chunks):
+        pdf = tmp_path / 'small.pdf'
+        pdf.write_bytes(b'%PDF-1.4\n' + b'<< /Type /Page >>\n' * 2 + b'<< /Type /Pages /Count 2 >>')
+        assert document_ranges(str(pdf)) == []
+
+    def test_scanned_pdf_left_to_a_single_query(self, tmp_path, small_chunks):
+        pypdf = pytest.importorskip('pypdf')
+        writer = pypdf.PdfWriter()
+        for _ in range(10):
+            writer.add_blank_page(width=200, height=200)
+        pdf = tmp_path / 'scanned.pdf'
+        with open(pdf, 'wb') as f:
+            writer.write(f)
+        assert document_ranges(str(pdf)) == []
+
+    def test_single_sheet_chunked_by_rows_with_header(self, tmp_path, small_chunks):
+        openpyxl = pytest.importorskip('openpyxl')
+        book = openpyxl.Workbook()
+        book.active.title = 'Prices'
+        for row in [('SKU', 'Price'), ('A', 1), ('B', 2), ('C', 3)]:
+            book.active.append(row)
+        path = tmp_path / 'prices.xlsx'
+        book.save(path)
+        assert document_ranges(str(path)) == [
+            ('sheet Prices, rows 1-2', 'SKU | Price\nA | 1\nB | 2'),
+            ('sheet Prices, rows 3-3', 'SKU | Price\nC | 3'),
+        ]
+
+    def test_small_multi_sheet_workbook_not_chunked(self, tmp_path, small_chunks):
+        openpyxl = pytest.importorskip('openpyxl')
+        book = openpyxl.Workbook()
+        book.active.append(['SKU', 'Price'])
+        book.active.append(['A', 1])
+        book.create_sheet('Software').append(['SKU', 'Price'])
+        book['Software'].append(['B', 2])
+        path = tmp_path / 'quote.xlsx'
+        book.save(path)
+        assert document_ranges(str(path)) == []
+
+    def test_sheet_without_dimensions_is_read(self, tmp_path, small_chunks):
+        openpyxl = pytest.importorskip('openpyxl')
+        book = openpyxl.Workbook()
+        for row in [('SKU', 'Price'), ('A', 1), ('B', 2), ('C', 3)]:
+            book.active.append(row)
+        saved = tmp_path / 'saved.xlsx'
+        book.save(saved)
+        # Some writers omit <dimension>, so read-only sheets report max_row as None
+        path = tmp_path / 'nodim.xlsx'
+        with zipfile.ZipFile(saved) as src, zipfile.ZipFile(path, 'w') as dst:
+            for item in src.infolist():
+                data = src.read(item)
+                if item.filename == 'xl/worksheets/sheet1.xml':
+                    data = data.replace(b'<dimension ref="A1:B4" />', b'')
+                dst.writestr(item, data)
+        reader = openpyxl.load_workbook(path, read_only=True)
+        assert reader.active.max_row is None
+        reader.close()
+        assert [label for label, _ in document_ranges(str(path))] == ['sheet Sheet, rows 1-2', 'sheet Sheet, rows 3-3']
+
+    def test_csv_chunked(self, tmp_path, small_chunks):
+        path = tmp_path / 'prices.csv'
+        with open(path, 'w', newline='') as f:
+            csv.writer(f).writerows([['SKU', 'Price'], ['A', '1'], ['B', '2'], ['C', '3']])
+        assert [text.splitlines()[0] for _, text in document_ranges(str(path))] == ['SKU | Price'] * 2
+
+    def test_docx_chunked(self, tmp_path, small_chunks):
+        row = '<w:tr><w:tc><w:p><w:r><w:t>{}</w:t></w:r></w:p></w:tc><w:tc><w:p><w:r><w:t>{}</w:t></w:r></w:p></w:tc></w:tr>'
+        table = '<w:tbl>' + ''.join(row.format(*r) for r in [('SKU', 'Price'), ('A', 1), ('B', 2), ('C', 3)]) + '</w:tbl>'
+        path = _docx(tmp_path / 'quote.docx', table)
+        assert document_ranges(str(path)) == [
+            ('the document, rows 1-2', 'SKU | Price\nA | 1\nB | 2'),
+            ('the document, rows 3-3', 'SKU | Price\nC | 3'),
+        ]
+
+
+class TestIncrementalItemParser:
+    def _feed_all(self, text, step=3):
+        parser = IncrementalItemParser()
+        seen = []
+        for i in range(0, len(text), step):
+            seen.extend(parser.feed(text[i:i + step]))
+        return parser, seen
+
+    def test_emits_items_as_they_close(self):
+        parser = IncrementalItemParser()
+        assert parser.feed('{"items": [{"SKU": "A", "Unit Price": 1}') == [{'SKU': 'A', 'Unit Price': 1}]
+        assert parser.feed(', {"SKU": "B"') == []
+        assert parser.feed('}]}') == [{'SKU': 'B'}]
+
+    def test_braces_inside_strings(self):
+        text = '{"items": [{"SKU": "A}{", "Item Description": "quote \\"x\\" [1]"}]}'
+        _, seen = self._feed_all(text)
+        assert seen == [{'SKU': 'A}{', 'Item Description': 'quote "x" [1]'}]
+
+    def test_jsonl_and_bare_array(self):
+        _, seen = self._feed_all('{"SKU": "A"}\n{"SKU": "B"}\n')
+        assert [i['SKU'] for i in seen] == ['A', 'B']
+        _, seen = self._feed_all('[{"SKU": "C"}]')
+        assert seen == [{'SKU': 'C'}]
+
+    def test_ignores_markdown_fence(self):
+        body = '{"items": [{"SKU": "A", "Quantity": 2}, {"SKU": "B", "Quantity": 3}]}'
+        parser, _ = self._feed_all(f'```json\n{body}\n```', step=5)
+        assert parser.items == parse_extraction_response(body)
@@ -0,0 +1,169 @@
+"""
+Tests for the offline H2OGPTE stand-in and the record/replay harness.
+"""
+import hashlib
+import io
+import json
+from unittest.mock import patch
+
+import pytest
+from procurement.services import ingestion
+from procurement.services.collection_pool import CollectionPool
+from procurement.services.database import init_db
+from procurement.services.extraction import extract_document_with_llm
+from procurement.services.fake_h2ogpte import (
+    FakeH2OGPTE, FakeH2OGPTEError, LatencyModel, RecordingH2OGPTE, _parse_op_map,
+)
+
+
+class _SyncPool(CollectionPool):
+    def release(self, collection_id, client=None, wait=True):
+        super().release(collection_id, client, wait=True)
+
+
+@pytest.fixture
+def quote_pdf(tmp_path):
+    """A one-page PDF plus an empty database and collection pool; catalog PDF fallback disabled."""
+    with patch('procurement.services.database.DATABASE_PATH', tmp_path / 'test.db'), \
+            patch('procurement.services.ingestion.collection_pool', _SyncPool(warm=0)), \
+            patch('procurement.services.validation._pdf_fallback_lookup', return_value=None):
+        init_db()
+        pdf = tmp_path / 'quote.pdf'
+        pdf.write_bytes(b'%PDF-1.4\n<< /Type /Page >>\n')
+        yield pdf
+
+
+class TestLatencySpec:
+    def test_parse_op_map(self):
+        spec = _parse_op_map('query=lognormal:0.5:0.4, ingest=fixed:0', LatencyModel.parse)
+        assert spec['query'].kind == 'lognormal' and spec['query'].params == (0.5, 0.4)
+        assert _parse_op_map('0.1', float) == {'*': 0.1}
+
+    def test_unknown_distribution(self):
+        with pytest.raises(ValueError):
+            LatencyModel.parse('pareto:1')
+
+
+class TestFakeClient:
+    def test_injected_failure(self):
+        client = FakeH2OGPTE(failure_rate={'upload': 1.0})
+        with pytest.raises(FakeH2OGPTEError):
+            client.upload('x.pdf', io.BytesIO(b'x'))
+
+    def test_query_timeout(self):
+        client = FakeH2OGPTE(latency={'query': LatencyModel('fixed', 5.0)})
+        chat_id = client.create_chat_session(None)
+        with client.connect(chat_id) as session, pytest.raises(TimeoutError):
+            session.query('hello', timeout=0.01)
+
+    def test_offline_extraction_end_to_end(self, quote_pdf):
+        client = FakeH2OGPTE(seed=1)
+        streamed = []
+        records = extract_document_with_llm(str(quote_pdf), llm_client=client, on_item=streamed.append)
+        assert len(records) == client.items_per_document
+        assert len(streamed) == len(records)
+        assert all(r['sku'] and r['unit_price'] for r in records)
+        # Deterministic for the same document; the pooled collection is emptied and reused
+        assert extract_document_with_llm(str(quote_pdf), llm_client=client) == records
+        collections = client.list_recent_collections()
+        assert len(collections) == 1 and collections[0].document_count == 0
+        assert client.calls['chat_session'] == 2 and client._chat_sessions == {}
+
+
+class _WorkbookFake(FakeH2OGPTE):
+    """Answers extraction queries from the rows it is shown, ignoring the instructions.
+
+    Without retrieval that is the rows in the message; with retrieval, like a
+    real search, it only sees the first context_rows rows of the collection.
+    """
+
+    context_rows = 3
+
+    def __init__(self):
+        super().__init__()
+        self.contents = {}
+
+    def upload(self, file_name, file):
+        data = file.read()
+        self.contents[hashlib.sha256(data).hexdigest()] = data
+        return super().upload(file_name, io.BytesIO(data))
+
+    def _fake_items(self, digests, message):
+        if not digests:
+            rows = [line.split(' | ') for line in message.splitlines() if ' | ' in line]
+            return [{'SKU': sku, 'Unit Price': float(price), 'Quantity': 1} for sku, price in rows if sku != 'SKU']
+        from openpyxl import load_workbook
+        items = []
+        for digest in digests:
+            book = load_workbook(io.BytesIO(self.contents[digest]), read_only=True)
+            for sheet in book.worksheets:
+                for sku, price in sheet.iter_rows(min_row=2, values_only=True):
+                    items.append({'SKU': sku, 'Unit Price': price, 'Quantity': 1})
+        return items[:self.context_rows]
+
+
+def _workbook(path, sheets):
+    openpyxl = pytest.importorskip('openpyxl')
+    book = openpyxl.Workbook()
+    for i, (name, rows) in enumerate(sheets.items()):
+        sheet = book.active if i == 0 else book.create_sheet()
+        sheet.title = name
+        sheet.append(['SKU', 'Price'])
+        for row in rows:
+            sheet.append(row)
+    book.save(path)
+    return path
+
+
+@pytest.fixture
+def small_chunks():
+    with patch('procurement.services.extraction.EXTRACTION_CHUNK_ROWS', 2):
+        yield
+
+
+class TestChunkedExtraction:
+    def test_each_range_sees_only_its_rows(self, quote_pdf, tmp_path, small_chunks):
+        workbook = _workbook(tmp_path / 'quote.xlsx', {
+            'Hardware': [('HW-1', 10), ('HW-2', 20)], 'Software': [('SW-1', 5)],
+            'Support': [('HW-1', 10), ('SP-1', 7)],
+        })
+        client = _WorkbookFake()
+        records = extract_document_with_llm(str(workbook), llm_client=client)
+        # No range dropped or answered twice; a line repeated on a non-adjacent sheet is kept
+        assert [r['sku'] for r in records] == ['HW-1', 'HW-2', 'SW-1', 'HW-1', 'SP-1']
+        assert all(c.document_count == 0 for c in client.list_recent_collections())
+
+    def test_single_sheet_price_list_is_chunked(self, quote_pdf, tmp_path, small_chunks):
+        rows = [(f"SKU-{i}", i) for i in range(1, 8)]
+        workbook = _workbook(tmp_path / 'prices.xlsx', {'Prices': rows})
+        client = _WorkbookFake()
+        records = extract_document_with_llm(str(workbook), llm_client=client)
+        assert [r['sku'] for r in records] == [sku for sku, _ in rows]
+        assert client.calls['query'] == 4
+
+    def test_ranges_query_the_verified_collection(self, quote_pdf, tmp_path, small_chunks):
+        workbook = _workbook(tmp_path / 'prices.xlsx', {'Prices': [(f"SKU-{i}", i) for i in range(1, 6)]})
+        client = _WorkbookFake()
+        # As /verify leaves it: ingested, lease kept
+        with ingestion.ingestion_session(str(workbook), 'prices.xlsx', llm_client=client):
+            pass
+        extract_document_with_llm(str(workbook), llm_client=client)
+        assert (client.calls['upload'], client.calls['ingest']) == (1, 1)
+        assert all(s['filename'] != 'prices.xlsx' for s in ingestion.get_active_sessions())
+
+
+class TestRecordReplay:
+    def test_replays_recorded_response(self, tmp_path, quote_pdf):
+        recorder = RecordingH2OGPTE(FakeH2OGPTE(), str(tmp_path / 'rec'))
+        extract_document_with_llm(str(quote_pdf), llm_client=recorder)
+        recordings = list((tmp_path / 'rec').glob('*.json'))
+        assert len(recordings) == 1
+
+        recorded = json.loads(recordings[0].read_text())
+        recorded['content'] = json.dumps({'items': [{'SKU': 'REPLAYED', 'Unit Price': 1}]})
+        recordings[0].write_text(json.dumps(recorded))
+
+        ingestion.collection_pool.drain(recorder)
+        replay = FakeH2OGPTE(replay_dir=str(tmp_path / 'rec'))
+        records = extract_document_with_llm(str(quote_pdf), llm_client=replay)
+        assert [r['sku'] for r in records] == ['REPLAYED']
@@ -0,0 +1,83 @@
+"""
+Tests for the background H2OGPTE health monitor, run against FakeH2OGPTE.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from unittest.mock import patch
+
+import pytest
+
+from procurement.services.fake_h2ogpte import FakeH2OGPTE, LatencyModel
+from procurement.services.health_monitor import HealthMonitor, HealthSnapshot
+from procurement.services.model_registry import ModelRegistry
+
+
+@contextmanager
+def _fake_service(list_seconds: float = 0.0):
+    """A fake client whose model listing takes list_seconds, and a fresh model cache."""
+    client = FakeH2OGPTE(latency={'get_llms': LatencyModel('fixed', list_seconds)})
+    with patch('procurement.services.health_monitor.get_h2ogpte_client', return_value=client), \
+            patch('procurement.services.health_monitor.model_registry', ModelRegistry()):
+        yield client
+
+
+def test_concurrent_fresh_probes_share_one_remote_call():
+    monitor = HealthMonitor(timeout=5)
+    with _fake_service(list_seconds=0.2) as client:
+        snapshots = []
+        threads = [threading.Thread(target=lambda: snapshots.append(monitor.probe_now())) for _ in range(10)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    assert client.calls['get_llms'] == 1
+    assert all(s is monitor.snapshot for s in snapshots)
+    assert monitor.snapshot.connected and monitor.snapshot.model == 'claude-sonnet-4-5'
+
+
+def test_timeout_records_an_error_status():
+    monitor = HealthMonitor(timeout=0.05)
+    with _fake_service(list_seconds=0.3):
+        snapshot = monitor.probe_now()
+        # Let the abandoned probe finish against the fakes
+        time.sleep(0.4)
+    assert not snapshot.connected
+    assert snapshot.error == 'Health probe timed out after 0.05s'
+    assert snapshot.latency_ms is not None and snapshot.checked_at
+
+
+def test_endpoint_serves_snapshot_without_remote_call():
+    pytest.importorskip('httpx')
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from backend.routers import health
+
+    app = FastAPI()
+    app.include_router(health.router)
+    monitor = HealthMonitor(timeout=5)
+    monitor._snapshot = HealthSnapshot(connected=True, model='cached-model', checked_at='2026-01-01T00:00:00')
+    with _fake_service() as client, patch('backend.routers.health.health_monitor', monitor):
+        http = TestClient(app)
+        assert http.get('/api/health/h2ogpte').json()['model'] == 'cached-model'
+        assert client.calls.get('get_llms', 0) == 0
+
+        fresh = http.get('/api/health/h2ogpte', params={'fresh': 1}).json()
+        assert fresh['model'] == 'claude-sonnet-4-5' and fresh['connected']
+        assert client.calls['get_llms'] == 1
+
+
+def test_hung_probe_is_not_stacked_on():
+    monitor = HealthMonitor(timeout=0.05)
+    with _fake_service(list_seconds=0.3) as client:
+        first = monitor.probe_now()
+        second = monitor.probe_now()
+        probes = [t for t in threading.enumerate() if t.name == 'h2ogpte-health-probe']
+        time.sleep(0.4)
+        third = monitor.probe_now()
+        time.sleep(0.4)
+    assert first.error == 'Health probe timed out after 0.05s'
+    assert second.error == 'Previous health probe still running'
+    assert len(probes) == 1
+    assert client.calls['get_llms'] == 2
+    assert third.error == 'Health probe timed out after 0.05s'
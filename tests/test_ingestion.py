@@ -0,0 +1,106 @@
+"""
+Tests for shared ingestion sessions (offline, against the fake client).
+"""
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from procurement.services import ingestion
+from procurement.services.collection_pool import CollectionPool
+from procurement.services.database import init_db
+from procurement.services.extraction import extract_document_with_llm
+from procurement.services.fake_h2ogpte import FakeH2OGPTE, LatencyModel
+from procurement.services.ingestion import get_active_sessions, ingestion_session, reap_expired_sessions
+from procurement.services.llm_service import verify_procurement_document
+
+
+class _SyncPool(CollectionPool):
+    def release(self, collection_id, client=None, wait=True):
+        super().release(collection_id, client, wait=True)
+
+
+@pytest.fixture
+def client(tmp_path):
+    """A fake client used by every service, an empty session table, pool and database."""
+    fake = FakeH2OGPTE(seed=1, latency={'ingest': LatencyModel('fixed', 0.05)})
+    with patch.dict(ingestion._sessions, clear=True), \
+            patch('procurement.services.ingestion.collection_pool', _SyncPool(warm=0)), \
+            patch('procurement.services.ingestion.get_h2ogpte_client', return_value=fake), \
+            patch('procurement.services.llm_service.get_h2ogpte_client', return_value=fake), \
+            patch('procurement.services.llm_service.get_best_llm', return_value='fake-model'), \
+            patch('procurement.services.extraction.get_best_llm', return_value='fake-model'), \
+            patch('procurement.services.database.DATABASE_PATH', tmp_path / 'test.db'), \
+            patch('procurement.services.validation._pdf_fallback_lookup', return_value=None):
+        init_db()
+        yield fake
+
+
+@pytest.fixture
+def quote(tmp_path):
+    pdf = tmp_path / 'quote.pdf'
+    pdf.write_bytes(b'%PDF-1.4\n<< /Type /Page >>\n')
+    return pdf
+
+
+def test_verify_then_extract_ingests_once(client, quote):
+    assert verify_procurement_document(str(quote), 'quote.pdf')
+    assert [s['in_use'] for s in get_active_sessions()] == [0]
+    records = extract_document_with_llm(str(quote), llm_client=client)
+    assert len(records) == client.items_per_document
+    assert (client.calls['upload'], client.calls['ingest']) == (1, 1)
+    # Both chat sessions were deleted after their query
+    assert client.calls['chat_session'] == 2 and client._chat_sessions == {}
+    # Extraction released the session and handed the collection back emptied
+    assert get_active_sessions() == []
+    assert [c.document_count for c in client.list_recent_collections()] == [0]
+
+
+def test_concurrent_sessions_for_the_same_content_share_a_collection(client, quote, tmp_path):
+    copy = tmp_path / 'renamed.pdf'
+    copy.write_bytes(quote.read_bytes())
+    barrier = threading.Barrier(2)
+    seen = []
+
+    def use(path):
+        with ingestion_session(str(path), path.name, llm_client=client) as session:
+            seen.append(session.collection_id)
+            barrier.wait(5)
+
+    threads = [threading.Thread(target=use, args=(p,)) for p in (quote, copy)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(set(seen)) == 1 and len(seen) == 2
+    assert client.calls['ingest'] == 1
+
+    other = tmp_path / 'other.pdf'
+    other.write_bytes(b'%PDF-1.4\n% different\n')
+    with ingestion_session(str(other), 'other.pdf', llm_client=client) as session:
+        assert session.collection_id != seen[0]
+
+
+def test_reaper_releases_idle_sessions_only(client, quote, tmp_path):
+    other = tmp_path / 'other.pdf'
+    other.write_bytes(b'%PDF-1.4\n% different\n')
+    with patch('procurement.services.ingestion.INGESTION_LEASE_SECONDS', 0):
+        with ingestion_session(str(quote), 'quote.pdf', llm_client=client):
+            pass
+        with ingestion_session(str(other), 'other.pdf', llm_client=client):
+            # Expired lease but still in use: kept
+            assert reap_expired_sessions() == 1
+            assert [s['filename'] for s in get_active_sessions()] == ['other.pdf']
+        assert reap_expired_sessions() == 1
+    assert get_active_sessions() == []
+    assert all(c.document_count == 0 for c in client.list_recent_collections())
+
+
+def test_failed_ingest_is_not_cached(client, quote):
+    with patch.object(client, 'ingest_uploads', side_effect=ConnectionError('down')):
+        with pytest.raises(ConnectionError):
+            with ingestion_session(str(quote), 'quote.pdf', llm_client=client):
+                pass
+    assert get_active_sessions() == []
+    with ingestion_session(str(quote), 'quote.pdf', llm_client=client) as session:
+        assert session.collection_id
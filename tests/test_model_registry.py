@@ -0,0 +1,101 @@
+"""
+Tests for cached, single-flight model discovery.
+"""
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from procurement.services.model_registry import ModelRegistry, pick_best_model
+
+
+class _GatedClient:
+    """get_llms() that counts calls and blocks until released."""
+
+    def __init__(self, models):
+        self.models = models
+        self.calls = 0
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def get_llms(self):
+        self.calls += 1
+        self.gate.wait(5)
+        return [{'name': m} for m in self.models]
+
+
+def test_pick_best_model_prefers_the_preference_list():
+    assert pick_best_model(['llama-3', 'gpt-4o-2024', 'claude-sonnet-4-20250514']) == 'claude-sonnet-4-20250514'
+    assert pick_best_model(['llama-3']) == 'llama-3'
+    assert pick_best_model([]) == 'auto'
+
+
+def test_concurrent_callers_share_one_listing():
+    client = _GatedClient(['gpt-4o', 'claude-opus-4-1'])
+    client.gate.clear()
+    registry = ModelRegistry(ttl=60)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.best_model(client))) for _ in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    # Nobody waits on the listing: 'auto' until the first one completes
+    assert results == ['auto'] * 20
+
+    client.gate.set()
+    assert registry.refresh(client, timeout=5) == ['gpt-4o', 'claude-opus-4-1']
+    assert client.calls == 1
+    assert registry.best_model(client) == 'claude-opus-4-1'
+    assert client.calls == 1
+
+
+def test_stale_entry_is_served_while_refreshing():
+    client = _GatedClient(['gpt-4o'])
+    registry = ModelRegistry(ttl=0.05)
+    registry.refresh(client)
+    assert registry.best_model(client) == 'gpt-4o'
+
+    time.sleep(0.06)
+    client.models = ['claude-opus-4-1']
+    client.gate.clear()
+    assert registry.best_model(client) == 'gpt-4o'
+    assert registry.best_model(client) == 'gpt-4o'
+    assert client.calls == 2
+
+    client.gate.set()
+    registry.refresh(client, timeout=5)
+    assert registry.best_model(client) == 'claude-opus-4-1'
+
+
+def test_failed_listing_keeps_the_last_good_model():
+    client = _GatedClient(['gpt-4o'])
+    registry = ModelRegistry(ttl=0)
+    registry.refresh(client)
+    with patch.object(client, 'get_llms', side_effect=ConnectionError('down')):
+        registry.refresh(client)
+        assert registry.snapshot()['last_error'] == 'down'
+        # Backs off instead of retrying on every call
+        assert registry.best_model(client) == 'gpt-4o'
+        assert client.get_llms.call_count == 1
+
+
+def test_override_wins():
+    client = _GatedClient(['claude-opus-4-1'])
+    registry = ModelRegistry(ttl=60)
+    with patch.dict('procurement.services.model_registry.MODEL_OVERRIDES', {'extraction': 'gpt-4.1'}):
+        assert registry.best_model(client, task='extraction') == 'gpt-4.1'
+    assert client.calls == 0
+
+
+def test_joining_a_hung_refresh_times_out():
+    client = _GatedClient(['gpt-4o'])
+    client.gate.clear()
+    registry = ModelRegistry(ttl=60)
+    registry.refresh_async(client)
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        registry.refresh(client, timeout=0.05)
+    assert time.monotonic() - started < 1
+    client.gate.set()
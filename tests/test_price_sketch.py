@@ -0,0 +1,53 @@
+"""
+Tests for the t-digest price sketches.
+"""
+import random
+
+import pytest
+
+from procurement.services.price_sketch import TDigest
+
+
+def _exact_quantile(values, q):
+    ordered = sorted(values)
+    pos = q * (len(ordered) - 1)
+    low = int(pos)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (pos - low)
+
+
+class TestTDigest:
+    def test_small_sets_are_exact(self):
+        digest = TDigest()
+        for value in (4, 1, 3, 2):
+            digest.add(value)
+        assert digest.quantile(0.5) == 2.5
+        assert digest.mad() == 1.0
+        assert (digest.quantile(0), digest.quantile(1)) == (1, 4)
+
+    def test_empty_digest(self):
+        assert TDigest().quantile(0.5) is None and TDigest().mad() is None
+
+    @pytest.mark.parametrize('q', [0.1, 0.5, 0.9])
+    def test_large_set_accuracy(self, q):
+        rng = random.Random(q)
+        values = [rng.lognormvariate(4, 0.5) for _ in range(20000)]
+        digest = TDigest()
+        for value in values:
+            digest.add(value)
+        assert digest.quantile(q) == pytest.approx(_exact_quantile(values, q), rel=0.01)
+        assert len(digest.centroids()) < 200
+
+    def test_merge_and_round_trip(self):
+        rng = random.Random(3)
+        values = [rng.uniform(10, 20) for _ in range(5000)]
+        left, right = TDigest(), TDigest()
+        for value in values[:2000]:
+            left.add(value)
+        for value in values[2000:]:
+            right.add(value)
+        left.merge(right)
+        restored = TDigest.from_bytes(left.to_bytes())
+        assert restored.count == 5000
+        assert restored.quantile(0.5) == pytest.approx(_exact_quantile(values, 0.5), rel=0.01)
+        assert (restored.min, restored.max) == (min(values), max(values))
@@ -0,0 +1,129 @@
+"""
+Tests for the H2OGPTE resilience layer (limits, retries, circuit breaker).
+"""
+import io
+
+import pytest
+from procurement.services.fake_h2ogpte import FakeH2OGPTE, FakeH2OGPTEError, PartialChatMessage
+from procurement.services.resilience import (
+    CircuitBreaker, CircuitOpenError, ResilientH2OGPTE, ThrottledError, is_transient,
+)
+
+
+class _Flaky:
+    """Fails with the given error a fixed number of times, then succeeds."""
+
+    def __init__(self, failures: int, error=ConnectionError):
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+
+    def get_llms(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error("boom")
+        return ['gpt-4o']
+
+
+def _client(inner, **kwargs):
+    kwargs.setdefault('op_concurrency', {})
+    return ResilientH2OGPTE(inner, sleep=lambda _: None, **kwargs)
+
+
+class TestRetries:
+    def test_retries_transient_errors(self):
+        inner = _Flaky(failures=2)
+        client = _client(inner, retry_attempts=3)
+        assert client.get_llms() == ['gpt-4o']
+        stats = client.metrics()['operations']['get_llms']
+        assert inner.calls == 3
+        assert stats['retries'] == 2 and stats['successes'] == 1
+
+    def test_does_not_retry_other_errors(self):
+        inner = _Flaky(failures=1, error=ValueError)
+        client = _client(inner, retry_attempts=3)
+        with pytest.raises(ValueError):
+            client.get_llms()
+        assert inner.calls == 1
+
+    def test_is_transient(self):
+        assert is_transient(TimeoutError())
+        assert is_transient(FakeH2OGPTEError())
+        assert not is_transient(KeyError())
+
+    def test_streaming_query_not_retried_after_output(self):
+        class _FailsMidStream:
+            calls = 0
+
+            def query(self, message, callback=None, **kwargs):
+                self.calls += 1
+                callback(PartialChatMessage(id='1', content='{"items": ['))
+                raise ConnectionError("stream dropped")
+
+        inner_session = _FailsMidStream()
+        client = _client(FakeH2OGPTE(), retry_attempts=3)
+        session = client.connect(client.create_chat_session(None))
+        session._session = inner_session
+        with pytest.raises(ConnectionError):
+            session.query('hi', callback=lambda m: None)
+        assert inner_session.calls == 1
+
+    def test_streaming_query_retried_before_output(self):
+        fake = FakeH2OGPTE(failure_rate={'query': 1.0})
+        client = _client(fake, retry_attempts=3)
+        chat_id = client.create_chat_session(None)
+        with client.connect(chat_id) as session, pytest.raises(FakeH2OGPTEError):
+            session.query('hi', callback=lambda m: None)
+        assert fake.calls['query'] == 3
+
+    def test_streaming_query_passes_callback(self):
+        client = _client(FakeH2OGPTE())
+        chat_id = client.create_chat_session(None)
+        partials = []
+        with client.connect(chat_id) as session:
+            reply = session.query('hi', callback=lambda m: partials.append(m))
+        assert any(isinstance(m, PartialChatMessage) for m in partials)
+        assert reply.content
+
+    def test_upload_rewinds_file_on_retry(self):
+        fake = FakeH2OGPTE(failure_rate={'upload': 1.0})
+        client = _client(fake, retry_attempts=2)
+        data = io.BytesIO(b'abc')
+        with pytest.raises(FakeH2OGPTEError):
+            client.upload('a.pdf', data)
+        assert fake.calls['upload'] == 2
+
+
+class TestCircuitBreaker:
+    def test_opens_and_fails_fast(self):
+        inner = _Flaky(failures=100)
+        client = _client(inner, retry_attempts=1, breaker=CircuitBreaker(threshold=2, reset_timeout=60))
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                client.get_llms()
+        with pytest.raises(CircuitOpenError):
+            client.get_llms()
+        assert inner.calls == 2
+        metrics = client.metrics()
+        assert metrics['circuit']['state'] == 'open'
+        assert metrics['operations']['get_llms']['rejected'] == 1
+
+    def test_half_open_trial_closes_on_success(self):
+        breaker = CircuitBreaker(threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        assert breaker.allow()
+        assert not breaker.allow()  # only one trial call
+        breaker.record_success()
+        assert breaker.state == 'closed'
+
+
+class TestLimiter:
+    def test_throttles_when_saturated(self):
+        client = _client(_Flaky(failures=0), max_concurrency=1, acquire_timeout=0.01)
+        client._global.acquire()
+        try:
+            with pytest.raises(ThrottledError):
+                client.get_llms()
+        finally:
+            client._global.release()
+        assert client.metrics()['operations']['get_llms']['throttled'] == 1
@@ -0,0 +1,121 @@
+"""
+Tests for the streaming extraction endpoint (extraction itself is stubbed).
+"""
+import json
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+pytest.importorskip('httpx')
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.routers import upload
+from procurement.services.database import init_db
+
+
+def _events(body: str) -> list[tuple[str, dict]]:
+    events = []
+    for frame in body.strip().split('\n\n'):
+        lines = dict(line.split(': ', 1) for line in frame.splitlines())
+        events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+
+def test_items_from_concurrent_chunks_get_unique_ordered_indexes(tmp_path):
+    def extract(file_path, filename=None, on_item=None):
+        # Chunk threads reporting items at the same time
+        barrier = threading.Barrier(8)
+
+        def chunk(c):
+            barrier.wait()
+            for i in range(25):
+                on_item({'sku': f"C{c}-{i}"})
+
+        threads = [threading.Thread(target=chunk, args=(c,)) for c in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return [{'sku': 'FINAL'}]
+
+    app = FastAPI()
+    app.include_router(upload.router)
+    with patch('procurement.services.database.DATABASE_PATH', tmp_path / 'test.db'), \
+            patch('backend.routers.upload.UPLOAD_DIR', str(tmp_path / 'uploads')), \
+            patch('backend.routers.upload.extract_document_with_llm', side_effect=extract), \
+            patch('backend.routers.upload.generate_historical_for_skus'):
+        init_db()
+        response = TestClient(app).post('/api/upload/extract/stream',
+                                        files={'file': ('quote.pdf', b'%PDF-1.4', 'application/pdf')})
+    events = _events(response.text)
+    items = [data for event, data in events if event == 'item']
+    assert [item['index'] for item in items] == list(range(200))
+    assert len({item['record']['sku'] for item in items}) == 200
+    assert events[-1][0] == 'complete'
+
+
+def test_producer_stops_after_client_disconnects():
+    import asyncio
+
+    from backend import sse
+
+    emitted = []
+    stopped = threading.Event()
+
+    def produce(emit):
+        try:
+            for i in range(1000):
+                emit('item', {'index': i})
+                emitted.append(i)
+                time.sleep(0.01)
+        finally:
+            stopped.set()
+
+    class _Request:
+        def __init__(self):
+            self.checks = 0
+
+        async def is_disconnected(self):
+            self.checks += 1
+            return self.checks > 1
+
+    async def consume():
+        frames = []
+        with patch.object(sse, 'DISCONNECT_POLL_SECONDS', 0.05):
+            async for frame in sse.stream_from_thread(produce, _Request()):
+                frames.append(frame)
+                await asyncio.sleep(0.1)  # slow client, so the stream goes idle and polls
+        return frames
+
+    frames = asyncio.run(consume())
+    assert stopped.wait(2)
+    assert len(emitted) < 1000
+    assert not any(frame.startswith('event: error') for frame in frames)
+
+
+def test_extract_and_stream_share_upload_and_draft_save(tmp_path):
+    app = FastAPI()
+    app.include_router(upload.router)
+    with patch('procurement.services.database.DATABASE_PATH', tmp_path / 'test.db'), \
+            patch('backend.routers.upload.UPLOAD_DIR', str(tmp_path / 'uploads')), \
+            patch('backend.routers.upload.extract_document_with_llm', return_value=[{'sku': 'A1'}]), \
+            patch('backend.routers.upload.generate_historical_for_skus'):
+        init_db()
+        client = TestClient(app)
+        plain = client.post('/api/upload/extract', data={'eu_company': 'ACME'},
+                            files={'file': ('quote.pdf', b'%PDF-1.4', 'application/pdf')}).json()
+        streamed = _events(client.post('/api/upload/extract/stream', data={'eu_company': 'ACME'},
+                                       files={'file': ('quote.pdf', b'%PDF-1.4', 'application/pdf')}).text)
+        files = client.get('/api/upload/history').json()
+        rejected = client.post('/api/upload/extract/stream',
+                               files={'file': ('quote.exe', b'MZ', 'application/octet-stream')})
+
+    complete = streamed[-1][1]
+    assert [r['eu_company'] for r in plain['records']] == [r['eu_company'] for r in complete['records']] == ['ACME']
+    assert plain['records'][0]['id'] and complete['records'][0]['id']
+    assert [f['upload_status'] for f in files] == ['uploaded', 'uploaded']
+    assert rejected.status_code == 400
@@ -2,11 +2,12 @@
 Tests for the per-field validation engine.
 """
 import pytest
+from unittest.mock import patch
 from procurement.services.validation import (
     FieldStatus, FieldValidationResult, RecordValidationResult,
     validate_record_fields, validate_record, validate_records,
     is_empty_value, parse_date, get_missing_fields,
-    check_price_anomaly, get_validation_summary,
+    check_price_anomaly, get_validation_summary, line_fingerprint,
 )
 
 
@@ -49,6 +50,20 @@ class TestParseDate:
         assert parse_date('') is None
         assert parse_date(None) is None
 
+    @pytest.mark.parametrize('value', [
+        '2024-1-5', '2024-02-30', '2024-13-01', '2024-01-15T10:20:30', '2024-01-15  1:2:3',
+        '2024-01-15T23:59:60', '2024-01-15T10:20:30.5', '01/15/2024', '15/01/2024', '13/13/2024',
+        '15-jan-24', '15-Foo-24', '15-Jan-2024', '20240115', '20241301', '2024115', 'Jan  5, 2024',
+        '15 Jan 2024', '15 Sept 2024', '2024-01- 5', '31/04/2024', '2024-01-15t10:20:30', '29-Feb-23',
+    ])
+    def test_matches_format_precedence(self, value):
+        from procurement.services.validation import _parse_date_slow
+        assert parse_date(value) == _parse_date_slow(value)
+
+    def test_day_month_fallback(self):
+        assert parse_date('02/03/2024').month == 2
+        assert parse_date('15/01/2024').month == 1
+
 
 class TestValidateRecordFields:
     def _make_valid_record(self):
@@ -190,6 +205,43 @@ class TestValidateRecords:
         assert has_dup_warning
 
 
+class TestLineFingerprint:
+    LINE = {'sku': 'FP-1', 'unit_price': 100, 'quantity': 2, 'quotation_ref_no': 'Q-9', 'distributor': 'Acme'}
+
+    def test_normalizes_case_spacing_and_numbers(self):
+        resubmitted = {'sku': ' fp-1 ', 'unit_price': '100.00', 'quantity': 2.0,
+                       'quotation_ref_no': 'q-9', 'distributor': 'ACME  ', 'comments_notes': 'again'}
+        assert line_fingerprint(resubmitted) == line_fingerprint(self.LINE)
+
+    def test_distinguishes_quote_fields(self):
+        for field_name, value in (('unit_price', 101), ('quantity', 3), ('quotation_ref_no', 'Q-10'),
+                                  ('distributor', 'Other'), ('sku', 'FP-2')):
+            assert line_fingerprint({**self.LINE, field_name: value}) != line_fingerprint(self.LINE)
+
+    def test_flags_archived_lines(self):
+        records = [dict(self.LINE), {**self.LINE, 'quotation_ref_no': 'Q-10'}]
+        with patch('procurement.services.validation._pdf_fallback_lookup', return_value=None):
+            result = validate_records(records, archived_fingerprints={line_fingerprint(self.LINE)})
+        assert result[0]['field_validation']['sku']['status'] == 'warning'
+        assert 'Already approved' in result[0]['validation_message']
+        assert 'Already approved' not in result[1]['validation_message']
+
+
+class TestBatchOutlier:
+    def _validate(self, price, stats):
+        record = {'sku': 'OUT-1', 'unit_price': price, 'quantity': 1}
+        with patch('procurement.services.validation._pdf_fallback_lookup', return_value=None):
+            return validate_records([record], historical_stats={'OUT-1': stats})[0]
+
+    def test_uses_sketch_median_over_mean(self):
+        skewed = {'avg_price': 400, 'median_price': 100}
+        assert 'Batch outlier' not in self._validate(100, skewed)['validation_message']
+        assert 'vs SKU median 100.00' in self._validate(400, skewed)['validation_message']
+
+    def test_falls_back_to_mean(self):
+        assert 'vs SKU median 400.00' in self._validate(100, {'avg_price': 400})['validation_message']
+
+
 class TestCheckPriceAnomaly:
     def test_no_anomaly(self):
         record = {'unit_price': 100}
@@ -0,0 +1,210 @@
+"""
+Equivalence tests for the columnar and parallel validation engines.
+"""
+import copy
+import json
+import random
+from unittest.mock import patch
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from procurement.services import validation, validation_parallel
+from procurement.services.validation_columnar import validate_records_columnar, validate_records_compact
+
+
+def _pdf_lookup(sku, description=None):
+    return {'found': True, 'base_price': 12.5} if sku.endswith('7') else None
+
+
+def _random_batch(n, seed):
+    rng = random.Random(seed)
+    skus = ['ABC-100', 'ABC-101', 'XY', 'ZZZ-997', 'LAPTOP-1', '', None, ' abc-100 ']
+    prices = [100.0, 250.5, 2500.0, 1000, -5, 0, None, 'N/A', '1,234.50', '$99', 'abc', 200]
+    quantities = [1, 2, 0, -1, 20000, None, '3', 'x', 1.5]
+    totals = [100.0, 500, None, -10, 251.0, 2500.0, 'n/a']
+    dates = ['2024-01-15', '01/15/2024', '15-Jan-24', '2019-06-01', '2031-12-31', 'garbage', '', None,
+             'Jan 15, 2024', '31/12/2024', '2024-02-30']
+    currencies = ['USD', 'usd ', 'EUR', 'XYZ', '', None, 'SGD']
+    texts = ['Widget', 'ok', '', None, 'NA', 'Some longer description']
+    records = []
+    for _ in range(n):
+        rec = {
+            'sku': rng.choice(skus), 'unit_price': rng.choice(prices), 'quantity': rng.choice(quantities),
+            'total_price': rng.choice(totals), 'quote_currency': rng.choice(currencies),
+            'item_description': rng.choice(texts), 'distributor': rng.choice(texts),
+            'eu_company': rng.choice(texts), 'serial_no': rng.choice(texts), 'quotation_ref_no': rng.choice(texts),
+            'start_date': rng.choice(dates), 'end_date': rng.choice(dates),
+            'quotation_date': rng.choice(dates), 'quotation_end_date': rng.choice(dates),
+        }
+        if rng.random() < 0.1:
+            rec['field_validation'] = {'sku': {'status': 'warning', 'acknowledged': True},
+                                       'unit_price': {'status': 'error', 'acknowledged': True}}
+        if rng.random() < 0.05:
+            rec['catalog_match'] = True
+        records.append(rec)
+    return records
+
+
+HISTORICAL = {'ABC-100': {'avg_price': 100}, 'ABC-101': {'avg_price': 24.75, 'median_price': 80.0}, 'LAPTOP-1': {'avg_price': 0},
+              'ZZZ-997': {'avg_price': None}, 'XY': {}}
+CATALOG = {'ABC-100': {'max_price': 120}, 'ABC-101': {'max_price': 0}, 'LAPTOP-1': {'max_price': 200.0}}
+KNOWN = ['ABC-1000', 'LAPTOP-2', 'ZZZ-997']
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('kwargs', [
+    {},
+    {'known_skus': KNOWN, 'catalog_entries': CATALOG, 'historical_stats': HISTORICAL},
+])
+def test_matches_per_record_engine(seed, kwargs):
+    records = _random_batch(300, seed)
+    with patch('procurement.services.validation._pdf_fallback_lookup', side_effect=_pdf_lookup), \
+            patch('procurement.services.validation.VALIDATION_ENGINE', 'python'):
+        expected = validation.validate_records(copy.deepcopy(records), **kwargs)
+        actual = validate_records_columnar(copy.deepcopy(records), **kwargs)
+    for exp, act in zip(expected, actual):
+        assert act == exp
+        assert list(act['field_validation']) == list(exp['field_validation'])
+
+
+def test_archived_duplicates_match_per_record_engine():
+    records = _random_batch(300, 11)
+    archived = {validation.line_fingerprint(rec) for rec in records[::7]}
+    kwargs = {'known_skus': KNOWN, 'catalog_entries': CATALOG, 'archived_fingerprints': archived}
+    with patch('procurement.services.validation._pdf_fallback_lookup', side_effect=_pdf_lookup), \
+            patch('procurement.services.validation.VALIDATION_ENGINE', 'python'):
+        expected = validation.validate_records(copy.deepcopy(records), **kwargs)
+        actual = validate_records_columnar(copy.deepcopy(records), **kwargs)
+    assert actual == expected
+    assert sum('Already approved' in rec['validation_message'] for rec in actual) >= len(records[::7])
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 1000])
+def test_compact_json_matches_per_record_engine(chunk_size):
+    records = _random_batch(300, chunk_size)
+    kwargs = {'known_skus': KNOWN, 'catalog_entries': CATALOG, 'historical_stats': HISTORICAL,
+              'archived_fingerprints': {validation.line_fingerprint(rec) for rec in records[::5]}}
+    with patch('procurement.services.validation._pdf_fallback_lookup', side_effect=_pdf_lookup), \
+            patch('procurement.services.validation.VALIDATION_ENGINE', 'python'):
+        expected = validation.validate_records(copy.deepcopy(records), **kwargs)
+        batch = copy.deepcopy(records)
+        chunks = validate_records_compact(batch, **kwargs).iter_json(batch, chunk_size=chunk_size)
+        actual = json.loads(''.join(chunks))
+    assert actual == json.loads(json.dumps(expected))
+
+
+def test_compact_json_of_empty_batch():
+    assert validate_records_compact([]).dumps([]) == '[]'
+    batch = [{}]
+    (record,) = json.loads(validate_records_compact(batch).dumps(batch))
+    assert record['validation_status'] == 'error' and record['field_validation']['sku']['status'] == 'error'
+
+
+def test_large_batches_dispatch_to_columnar():
+    records = _random_batch(5, 0)
+    with patch('procurement.services.validation._pdf_fallback_lookup', return_value=None), \
+            patch('procurement.services.validation.VALIDATION_COLUMNAR_MIN_BATCH', 5), \
+            patch('procurement.services.validation_columnar.validate_records_columnar',
+                  return_value='columnar') as columnar:
+        assert validation.validate_records(records) == 'columnar'
+    columnar.assert_called_once()
+
+
+def test_multi_core_hosts_keep_the_coded_path():
+    records = _random_batch(5, 0)
+    with patch('procurement.services.validation.os.cpu_count', return_value=16), \
+            patch('procurement.services.validation.VALIDATION_ENGINE', 'auto'), \
+            patch('procurement.services.validation.VALIDATION_COLUMNAR_MIN_BATCH', 5), \
+            patch('procurement.services.validation_columnar.validate_records_compact') as compact:
+        compact.return_value.iter_json.return_value = iter(['[]'])
+        assert validation._use_columnar(50000)
+        assert ''.join(validation.validate_records_json(records)) == '[]'
+    compact.assert_called_once()
+
+
+def test_parallel_matches_in_process():
+    records = _random_batch(400, 7)
+    kwargs = {'known_skus': KNOWN, 'catalog_entries': CATALOG, 'historical_stats': HISTORICAL}
+    with patch('procurement.services.validation._pdf_fallback_lookup', side_effect=_pdf_lookup):
+        with patch('procurement.services.validation.VALIDATION_ENGINE', 'python'):
+            expected = validation.validate_records(copy.deepcopy(records), **kwargs)
+        with patch('procurement.services.validation.VALIDATION_ENGINE', 'parallel'), \
+                patch('procurement.services.validation.VALIDATION_PARALLEL_MIN_BATCH', 100), \
+                patch('procurement.services.validation.VALIDATION_WORKERS', 2), \
+                patch('procurement.services.validation_parallel.logger') as logger:
+            try:
+                actual = validation.validate_records(copy.deepcopy(records), **kwargs)
+                assert validation_parallel._pool is not None
+            finally:
+                validation_parallel.shutdown_pool()
+    assert actual == expected
+    logger.warning.assert_not_called()
+
+
+def test_auto_shards_large_batches_only_without_numpy():
+    with patch('procurement.services.validation.VALIDATION_ENGINE', 'auto'), \
+            patch('procurement.services.validation.VALIDATION_PARALLEL_MIN_BATCH', 5000), \
+            patch('procurement.services.validation.os.cpu_count', return_value=16):
+        assert validation._parallel_workers(10 ** 6) == 1
+        with patch('procurement.services.validation.columnar_available', return_value=False):
+            assert validation._parallel_workers(10 ** 6) == 16
+            assert validation._parallel_workers(4999) == 1
+            with patch('procurement.services.validation.os.cpu_count', return_value=1):
+                assert validation._parallel_workers(10 ** 6) == 1
+
+
+def _entries_in_process(records, known_skus, catalog_entries, historical_stats, workers):
+    return [validation._validate_record_entry(r, known_skus, [], catalog_entries, historical_stats) for r in records]
+
+
+def test_auto_without_numpy_validates_large_batches_in_the_pool():
+    records = _random_batch(30, 4)
+    with patch('procurement.services.validation._pdf_fallback_lookup', return_value=None), \
+            patch('procurement.services.validation.VALIDATION_ENGINE', 'auto'), \
+            patch('procurement.services.validation.VALIDATION_COLUMNAR_MIN_BATCH', 10), \
+            patch('procurement.services.validation.VALIDATION_PARALLEL_MIN_BATCH', 10), \
+            patch('procurement.services.validation.VALIDATION_WORKERS', 2), \
+            patch('procurement.services.validation.columnar_available', return_value=False), \
+            patch.dict('sys.modules', {'procurement.services.validation_columnar': None}), \
+            patch('procurement.services.validation_parallel.validate_record_entries_parallel',
+                  side_effect=_entries_in_process) as parallel:
+        validation.validate_records(records)
+    parallel.assert_called_once()
+
+
+class _InlinePool:
+    """Runs pool.map in process, recording the arguments that would be pickled to workers."""
+
+    def __init__(self):
+        self.args = []
+
+    def map(self, fn, *iterables):
+        calls = list(zip(*iterables))
+        self.args += calls
+        return [fn(*call) for call in calls]
+
+
+def test_references_are_not_sent_with_each_shard():
+    records = _random_batch(50, 5)
+    pool = _InlinePool()
+    with patch('procurement.services.validation_parallel.start_pool', return_value=pool), \
+            patch('procurement.services.validation_parallel._pool_workers', 2):
+        entries = validation_parallel.validate_record_entries_parallel(records, KNOWN, CATALOG, HISTORICAL)
+    assert entries == [validation._validate_record_entry(r, KNOWN, [s.upper() for s in KNOWN], CATALOG, HISTORICAL)
+                       for r in records]
+    assert len(pool.args) == 8
+    # Each shard carries only the name and size of the shared block, never the references
+    assert {(block, size) for block, size, _ in pool.args} == {pool.args[0][:2]}
+    assert all(isinstance(block, str) and isinstance(size, int) for block, size, _ in pool.args)
+
+
+def test_broken_pool_falls_back_and_logs():
+    records = _random_batch(20, 3)
+    with patch('procurement.services.validation_parallel.start_pool', side_effect=OSError('no processes')), \
+            patch('procurement.services.validation_parallel.logger') as logger:
+        entries = validation_parallel.validate_record_entries_parallel(records, KNOWN, CATALOG, HISTORICAL)
+    assert entries == [validation._validate_record_entry(r, KNOWN, [s.upper() for s in KNOWN], CATALOG, HISTORICAL)
+                       for r in records]
+    logger.warning.assert_called_once()